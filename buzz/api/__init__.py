@@ -1,5 +1,11 @@
+import gzip
+import hashlib
+import json
 import os
+import socket
 from base64 import b32encode
+from contextlib import contextmanager
+from copy import deepcopy
 
 import frappe
 import pyotp
@@ -9,6 +15,7 @@ from frappe.core.doctype.sms_settings.sms_settings import send_sms
 from frappe.rate_limiter import rate_limit
 from frappe.translate import get_all_translations
 from frappe.utils import (
+	cint,
 	days_diff,
 	format_date,
 	format_time,
@@ -19,16 +26,37 @@ from frappe.utils import (
 	today,
 	validate_email_address,
 )
+from rq import Retry, get_current_job
+from werkzeug.wrappers import Response
 
 from buzz.payments import (
 	get_payment_gateways_for_event,
 	get_payment_link_for_booking,
 	get_payment_link_for_sponsorship,
 )
+from buzz.ticketing.doctype.event_ticket.event_ticket import enqueue_ticket_pdf
 from buzz.utils import is_app_installed
 
 OFFLINE_PAYMENT_METHOD = "Offline"
 
+BOOKING_PAYLOAD_VERSION = 1
+BOOKING_PAYLOAD_CACHE_TTL = 24 * 60 * 60
+
+GUEST_OTP_DELIVERY_ATTEMPTS = 3
+# seconds between attempts, failed attempts are retried by RQ instead of sleeping in the worker
+GUEST_OTP_RETRY_INTERVALS = [2, 5]
+# socket timeout of the SMTP or SMS calls of one attempt, a stalled provider fails the attempt
+GUEST_OTP_SEND_TIMEOUT = 10
+# job timeout of one attempt, well above the send timeout so the job can still report a failure
+GUEST_OTP_DELIVERY_TIMEOUT = 60
+GUEST_OTP_SINK_KEY = "buzz:guest_otp_sink"
+GUEST_OTP_SINK_SIZE = 1000
+
+# serialized translations and their content hashes per language, cleared with the translation cache
+TRANSLATION_BUNDLES_KEY = "buzz:translation_bundles"
+TRANSLATION_BUNDLE_HASHES_KEY = "buzz:translation_bundle_hashes"
+TRANSLATION_BUNDLE_MAX_AGE = 365 * 24 * 60 * 60
+
 
 @frappe.whitelist(allow_guest=True)  # nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
 @rate_limit(key="identifier", limit=5, seconds=3600)
@@ -59,25 +87,100 @@ def send_guest_booking_otp(event: int, identifier: str) -> dict:
 		frappe.cache.set_value(cache_key, otp_secret, expires_in_sec=600)
 		return {"otp": otp_code}
 
+	# the code is valid right away, delivery happens on the short queue so a slow SMTP or SMS
+	# provider doesn't hold up a web worker
+	delivery_id = frappe.generate_hash(length=20)
+	frappe.cache.set_value(cache_key, otp_secret, expires_in_sec=600)
+	frappe.cache.set_value(
+		f"guest_booking_otp_delivery:{channel}:{identifier}", delivery_id, expires_in_sec=600
+	)
+	set_guest_otp_delivery_status(delivery_id, "Queued")
+
+	frappe.enqueue(
+		deliver_guest_booking_otp,
+		queue="short",
+		timeout=GUEST_OTP_DELIVERY_TIMEOUT,
+		retry=Retry(max=GUEST_OTP_DELIVERY_ATTEMPTS - 1, interval=GUEST_OTP_RETRY_INTERVALS),
+		channel=channel,
+		identifier=identifier,
+		delivery_id=delivery_id,
+	)
+	return {"delivery_id": delivery_id}
+
+
+@frappe.whitelist(allow_guest=True)  # nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
+def get_guest_booking_otp_status(delivery_id: str) -> dict:
+	"""Delivery status of a code sent by `send_guest_booking_otp`: Queued, Sent or Failed."""
+	return {"status": frappe.cache.get_value(f"guest_booking_otp_status:{delivery_id}") or "Expired"}
+
+
+def deliver_guest_booking_otp(channel: str, identifier: str, delivery_id: str):
+	# a code requested again in the meantime replaces this one, only the latest is sent
+	if frappe.cache.get_value(f"guest_booking_otp_delivery:{channel}:{identifier}") != delivery_id:
+		return
+
+	otp_secret = frappe.cache.get_value(f"guest_booking_otp:{channel}:{identifier}")
+	if not otp_secret:
+		return
+
+	otp_code = pyotp.HOTP(otp_secret).at(0)
 	try:
-		if channel == "email":
-			frappe.sendmail(
-				recipients=[identifier],
-				subject=_("Your Booking Verification Code"),
-				message=_(
-					"Your verification code is: <b>{0}</b><br><br>This code expires in 10 minutes."
-				).format(otp_code),
-				now=True,
-			)
-		else:
-			send_sms(
-				receiver_list=[identifier],
-				msg=_("Your booking verification code is: {0}. It expires in 10 minutes.").format(otp_code),
-			)
+		with socket_timeout(GUEST_OTP_SEND_TIMEOUT):
+			send_guest_otp_message(channel, identifier, otp_code)
 	except Exception:
-		frappe.throw(_("Failed to send verification code. Please try again."))
+		if has_retries_left():
+			# RQ runs the job again after the next retry interval
+			raise
+		frappe.log_error(title="Guest booking OTP delivery failed")
+		set_guest_otp_delivery_status(delivery_id, "Failed")
+		return
 
-	frappe.cache.set_value(cache_key, otp_secret, expires_in_sec=600)
+	set_guest_otp_delivery_status(delivery_id, "Sent")
+
+
+def has_retries_left() -> bool:
+	job = get_current_job()
+	return bool(job and job.retries_left)
+
+
+@contextmanager
+def socket_timeout(seconds: int):
+	# SMTP and SMS (requests) connections without their own timeout use the socket default
+	previous = socket.getdefaulttimeout()
+	socket.setdefaulttimeout(seconds)
+	try:
+		yield
+	finally:
+		socket.setdefaulttimeout(previous)
+
+
+def send_guest_otp_message(channel: str, identifier: str, otp_code: str):
+	if frappe.conf.get("buzz_otp_sink"):
+		# stand-in for the email and SMS providers in load tests, the latest codes are kept in Redis
+		frappe.cache.lpush(
+			GUEST_OTP_SINK_KEY, json.dumps({"channel": channel, "to": identifier, "otp": otp_code})
+		)
+		frappe.cache.ltrim(GUEST_OTP_SINK_KEY, 0, GUEST_OTP_SINK_SIZE - 1)
+		return
+
+	if channel == "email":
+		frappe.sendmail(
+			recipients=[identifier],
+			subject=_("Your Booking Verification Code"),
+			message=_("Your verification code is: <b>{0}</b><br><br>This code expires in 10 minutes.").format(
+				otp_code
+			),
+			now=True,
+		)
+	else:
+		send_sms(
+			receiver_list=[identifier],
+			msg=_("Your booking verification code is: {0}. It expires in 10 minutes.").format(otp_code),
+		)
+
+
+def set_guest_otp_delivery_status(delivery_id: str, status: str):
+	frappe.cache.set_value(f"guest_booking_otp_status:{delivery_id}", status, expires_in_sec=600)
 
 
 def verify_guest_otp(channel: str, identifier: str, otp: str):
@@ -209,17 +312,47 @@ def can_request_cancellation(event_id: str | int) -> dict:
 
 @frappe.whitelist(allow_guest=True)  # nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
 def get_event_booking_data(event_route: str) -> dict:
-	data = frappe._dict()
-	event_doc = frappe.get_cached_doc("Buzz Event", {"route": event_route})
-
-	if not event_doc.is_published:
+	payload = get_booking_payload(event_route)
+	if not payload:
 		frappe.throw(_("Event not found"), frappe.DoesNotExistError)
 
-	data.registrations_closed = are_registrations_closed(event_doc)
+	data = frappe._dict(payload)
+	data.registrations_closed = are_registrations_closed(frappe._dict(data.pop("registration_window")))
 
-	is_guest = frappe.session.user == "Guest"
-	if is_guest:
-		data.event_details = {
+	if frappe.session.user != "Guest":
+		data.event_details = frappe.get_cached_doc("Buzz Event", data.event_details["name"])
+
+	data.available_ticket_types = get_ticket_types_with_live_availability(data.available_ticket_types)
+	return data
+
+
+def get_booking_payload(event_route: str) -> dict | None:
+	"""Static part of the booking page data for an event, served from cache.
+
+	Cleared by `clear_booking_payload_cache` whenever the event or anything hanging off it changes.
+	Returns None if there is no published event at the route.
+	"""
+	cache_key = get_booking_payload_cache_key(event_route)
+	payload = frappe.cache.get_value(cache_key)
+	if payload is None:
+		event_name = frappe.db.get_value("Buzz Event", {"route": event_route, "is_published": 1})
+		# unpublished or missing events are cached too, so bots can't hammer the database with them
+		payload = build_booking_payload(event_name) if event_name else {}
+		frappe.cache.set_value(cache_key, payload, expires_in_sec=BOOKING_PAYLOAD_CACHE_TTL)
+
+	return deepcopy(payload) or None
+
+
+def get_booking_payload_cache_key(event_route: str) -> str:
+	# bump the version whenever the payload shape changes, so stale entries are never read
+	return f"buzz:booking_payload:v{BOOKING_PAYLOAD_VERSION}:{event_route}"
+
+
+def build_booking_payload(event_name: str) -> dict:
+	event_doc = frappe.get_doc("Buzz Event", event_name)
+
+	payload = {
+		"event_details": {
 			"name": event_doc.name,
 			"title": event_doc.title,
 			"route": event_doc.route,
@@ -238,36 +371,30 @@ def get_event_booking_data(event_route: str) -> dict:
 			"allow_guest_booking": event_doc.allow_guest_booking,
 			"guest_verification_method": event_doc.guest_verification_method,
 			"default_ticket_type": event_doc.default_ticket_type,
-		}
-	else:
-		data.event_details = event_doc
+		},
+		"registration_window": {
+			"registrations_close_at": event_doc.registrations_close_at,
+			"time_zone": event_doc.time_zone,
+		},
+		"tax_settings": {
+			"apply_tax": event_doc.apply_tax,
+			"tax_inclusive": event_doc.tax_inclusive,
+			"tax_label": event_doc.tax_label or "Tax",
+			"tax_percentage": event_doc.tax_percentage or 0,
+		},
+	}
 
-	available_ticket_types = []
-	published_ticket_types = frappe.db.get_all(
-		"Event Ticket Type", filters={"is_published": True, "event": event_doc.name}, pluck="name"
+	payload["available_ticket_types"] = frappe.get_all(
+		"Event Ticket Type", filters={"is_published": True, "event": event_doc.name}, fields=["*"]
 	)
-	for ticket_type in published_ticket_types:
-		tt = frappe.get_cached_doc("Event Ticket Type", ticket_type)
-		if tt.are_tickets_available(1):
-			available_ticket_types.append(tt)
-	data.available_ticket_types = available_ticket_types
 
 	add_ons = frappe.db.get_all(
 		"Ticket Add-on", filters={"event": event_doc.name, "enabled": 1}, fields=["*"], order_by="title"
 	)
-
 	for add_on in add_ons:
 		if add_on.user_selects_option:
 			add_on.options = add_on.options.split("\n")
-
-	data.available_add_ons = add_ons
-
-	data.tax_settings = {
-		"apply_tax": event_doc.apply_tax,
-		"tax_inclusive": event_doc.tax_inclusive,
-		"tax_label": event_doc.tax_label or "Tax",
-		"tax_percentage": event_doc.tax_percentage or 0,
-	}
+	payload["available_add_ons"] = add_ons
 
 	custom_fields = frappe.db.get_all(
 		"Buzz Custom Field",
@@ -275,46 +402,94 @@ def get_event_booking_data(event_route: str) -> dict:
 		fields=["*"],
 		order_by="order",
 	)
-	data.custom_fields = custom_fields
+	payload["custom_fields"] = custom_fields
 
-	payment_gateways = get_payment_gateways_for_event(event_doc.name)
+	offline_method_fields = {}
+	for field in custom_fields:
+		if field.applied_to == "Offline Payment Form" and field.offline_payment_method:
+			offline_method_fields.setdefault(field.offline_payment_method, []).append(field)
 
-	offline_methods_raw = frappe.get_all(
+	payment_gateways = get_payment_gateways_for_event(event_doc.name)
+	offline_methods = []
+	for method in frappe.get_all(
 		"Offline Payment Method",
 		filters={"event": event_doc.name, "enabled": 1},
 		fields=["name", "title", "description", "collect_payment_proof"],
 		order_by="creation",
-	)
-
-	offline_methods = []
-	for method in offline_methods_raw:
-		method_custom_fields = frappe.get_all(
-			"Buzz Custom Field",
-			filters={
-				"event": event_doc.name,
-				"enabled": 1,
-				"applied_to": "Offline Payment Form",
-				"offline_payment_method": method.name,
-			},
-			fields=["*"],
-			order_by="order",
-		)
+	):
 		offline_methods.append(
 			{
 				"name": method.name,
 				"title": method.title,
 				"description": method.description,
 				"collect_payment_proof": method.collect_payment_proof,
-				"custom_fields": method_custom_fields,
+				"custom_fields": offline_method_fields.get(method.name, []),
 			}
 		)
 		payment_gateways.append(method.title)
 
-	data.payment_gateways = payment_gateways
-	data.offline_payment_enabled = len(offline_methods) > 0
-	data.offline_methods = offline_methods
+	payload["payment_gateways"] = payment_gateways
+	payload["offline_payment_enabled"] = len(offline_methods) > 0
+	payload["offline_methods"] = offline_methods
 
-	return data
+	return payload
+
+
+def get_ticket_types_with_live_availability(ticket_types: list[dict]) -> list[dict]:
+	"""Overlay the current inventory counters on cached ticket types and drop the sold out ones."""
+	limited = [ticket_type["name"] for ticket_type in ticket_types if ticket_type["max_tickets_available"]]
+	if not limited:
+		return ticket_types
+
+	counters = {
+		row.name: row
+		for row in frappe.get_all(
+			"Event Ticket Type",
+			filters={"name": ("in", limited)},
+			fields=["name", "tickets_sold", "tickets_reserved"],
+		)
+	}
+
+	available = []
+	for ticket_type in ticket_types:
+		if ticket_type["max_tickets_available"]:
+			live = counters.get(ticket_type["name"])
+			if not live:
+				continue
+			ticket_type["tickets_sold"] = cint(live.tickets_sold)
+			ticket_type["tickets_reserved"] = cint(live.tickets_reserved)
+			remaining = (
+				ticket_type["max_tickets_available"]
+				- ticket_type["tickets_sold"]
+				- ticket_type["tickets_reserved"]
+			)
+			if remaining < 1:
+				continue
+		available.append(ticket_type)
+
+	return available
+
+
+def clear_booking_payload_cache(doc, method=None):
+	"""Hooked on every doctype that feeds the booking page payload of an event."""
+	doc_before_save = doc.get_doc_before_save()
+
+	if doc.doctype == "Buzz Event":
+		routes = {doc.route, doc_before_save and doc_before_save.route}
+		for route in routes - {None}:
+			frappe.cache.delete_value(get_booking_payload_cache_key(route))
+	else:
+		clear_booking_payload_cache_for_events({doc.event, doc_before_save and doc_before_save.event})
+
+
+def clear_booking_payload_cache_for_events(events) -> None:
+	events = [event for event in events if event]
+	if not events:
+		return
+
+	for route in frappe.get_all("Buzz Event", filters={"name": ("in", events)}, pluck="route"):
+		if route:
+			frappe.cache.delete_value(get_booking_payload_cache_key(route))
 
 
 def validate_custom_fields(custom_fields_data: dict, phone_field_map: dict) -> None:
@@ -489,6 +664,8 @@ def process_booking(
 
 		booking.payment_method = OFFLINE_PAYMENT_METHOD
 		booking.offline_payment_method = method_doc.title
+		# verification can take days, hold the tickets until the booking is approved or rejected
+		booking.reserved_until = None
 
 		booking.status = "Approval Pending"
 		booking.payment_status = "Verification Pending"
@@ -649,6 +826,11 @@ def get_booking_details(booking_id: str) -> dict:
 		],
 	)
 
+	for ticket in tickets:
+		if ticket.docstatus == 1 and not ticket.qr_code:
+			# rendered on first view, see Buzz Settings > Render Ticket QR Code on First View
+			ticket.qr_code = frappe.get_doc("Event Ticket", ticket.name).get_qr_code_for_view()
+
 	add_ons = frappe.db.get_all(
 		"Ticket Add-on Value",
 		filters={"parent": ("in", [ticket.name for ticket in tickets])},
@@ -745,6 +927,8 @@ def change_add_on_preference(add_on_id: str, new_value: str):
 		"value",
 		new_value,
 	)
+	# the ticket PDF lists the add-on preferences
+	ticket.clear_ticket_pdf()
 
 
 @frappe.whitelist()
@@ -871,6 +1055,45 @@ def withdraw_sponsorship_enquiry(enquiry_id: str):
 	enquiry.save(ignore_permissions=True)
 
 
+@frappe.whitelist()
+def download_ticket(ticket_id: str):
+	"""The stored ticket PDF, a missing one is rendered by a background job."""
+	ticket_doc = frappe.get_doc("Event Ticket", ticket_id)
+
+	if not can_download_ticket(ticket_doc):
+		frappe.throw(frappe._("Not permitted to view this ticket"), frappe.PermissionError)
+
+	if ticket_doc.docstatus != 1:
+		frappe.throw(frappe._("Only confirmed tickets can be downloaded"))
+
+	ticket_pdf_file = ticket_doc.get_ticket_pdf_file()
+	if not ticket_pdf_file:
+		enqueue_ticket_pdf(ticket_doc.name)
+		frappe.respond_as_web_page(
+			frappe._("Preparing your ticket"),
+			frappe._("Your ticket PDF is being prepared, please try again in a minute."),
+			http_status_code=202,
+			indicator_color="blue",
+		)
+		return
+
+	ticket_pdf_file = frappe.get_doc("File", ticket_pdf_file)
+	frappe.response.filename = f"ticket-{ticket_doc.name}.pdf"
+	frappe.response.filecontent = ticket_pdf_file.get_content()
+	frappe.response.type = "pdf"
+
+
+def can_download_ticket(ticket_doc) -> bool:
+	# the attendee, the buyer and whoever can read the ticket, e.g. Event Managers
+	if frappe.session.user == ticket_doc.attendee_email:
+		return True
+	if ticket_doc.booking and frappe.session.user == frappe.db.get_value(
+		"Event Booking", ticket_doc.booking, "user"
+	):
+		return True
+	return ticket_doc.has_permission("read")
+
+
 @frappe.whitelist()
 def get_ticket_details(ticket_id: str) -> dict:
 	details = frappe._dict()
@@ -880,7 +1103,9 @@ def get_ticket_details(ticket_id: str) -> dict:
 		if ticket_doc.attendee_email != frappe.session.user:
 			frappe.throw(frappe._("Not permitted to view this ticket"))
 
-	details.doc = ticket_doc
+	details.doc = ticket_doc.as_dict()
+	# rendered on first view, see Buzz Settings > Render Ticket QR Code on First View
+	details.doc.qr_code = ticket_doc.get_qr_code_for_view()
 
 	add_ons = frappe.db.get_all(
 		"Ticket Add-on Value",
@@ -1115,7 +1340,12 @@ def checkin_ticket(ticket_id: str) -> dict:
 	checkin_doc.ticket = ticket_id
 	checkin_doc.date = checkin_date
 	checkin_doc.insert(ignore_permissions=True)
-	checkin_doc.submit()
+	try:
+		checkin_doc.submit()
+	except frappe.UniqueValidationError:
+		# another device checked the ticket in since it was validated, drop frappe's duplicate entry message
+		frappe.clear_messages()
+		frappe.throw(_("This ticket was already checked in today."))
 
 	return {
 		"message": _("Successfully checked in {attendee_name} for {checkin_date}").format(
@@ -1150,14 +1380,62 @@ def update_user_language(language_code: str):
 	frappe.db.set_value("User", frappe.session.user, "language", language_code)
 
 
-@frappe.whitelist(allow_guest=True)  # nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
-def get_translations():
+# nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
+@frappe.whitelist(allow_guest=True, methods=["GET"])
+def translations(lang: str, v: str | None = None) -> Response:
+	"""Translations of a language for the dashboard, cacheable for good when requested with their hash.
+
+	The dashboard gets the URL parameters from its boot, see `buzz.www.dashboard.get_boot`.
+	"""
+	if not frappe.db.exists("Language", lang):
+		frappe.throw(_("Invalid language"), frappe.DoesNotExistError)
+
+	bundle = get_translation_bundle(lang)
+	response = Response(bundle["content"], mimetype="application/json")
+	if v == bundle["hash"]:
+		response.cache_control.public = True
+		response.cache_control.max_age = TRANSLATION_BUNDLE_MAX_AGE
+		response.cache_control.immutable = True
+	else:
+		# requested by a page with an outdated hash, its URL must not pin the current translations
+		response.cache_control.no_cache = True
+
+	response.vary.add("Accept-Encoding")
+	if "gzip" in (frappe.get_request_header("Accept-Encoding") or ""):
+		response.set_data(gzip.compress(bundle["content"]))
+		response.content_encoding = "gzip"
+		# the compressed body is a different representation, caches must not mix the two up
+		response.set_etag(f"{bundle['hash']}-gz")
+	else:
+		response.set_etag(bundle["hash"])
+
+	return response.make_conditional(frappe.request)
+
+
+def get_translation_language() -> str:
+	language = None
 	if frappe.session.user != "Guest":
 		language = frappe.db.get_value("User", frappe.session.user, "language")
-	else:
-		language = frappe.db.get_single_value("System Settings", "language")
+	return language or frappe.db.get_single_value("System Settings", "language") or "en"
 
-	return get_all_translations(language)
+
+def get_translation_hash(lang: str) -> str:
+	return frappe.cache.hget(TRANSLATION_BUNDLE_HASHES_KEY, lang) or get_translation_bundle(lang)["hash"]
+
+
+def get_translation_bundle(lang: str) -> dict:
+	bundle = frappe.cache.hget(TRANSLATION_BUNDLES_KEY, lang)
+	if bundle is None:
+		content = json.dumps(get_all_translations(lang), sort_keys=True, separators=(",", ":")).encode()
+		bundle = {"hash": hashlib.sha256(content).hexdigest()[:16], "content": content}
+		frappe.cache.hset(TRANSLATION_BUNDLES_KEY, lang, bundle)
+		frappe.cache.hset(TRANSLATION_BUNDLE_HASHES_KEY, lang, bundle["hash"])
+	return bundle
+
+
+def clear_translation_bundles(doc=None, method=None):
+	"""Hooked on `clear_cache` (migrate, bench clear-cache) and on Translation changes."""
+	frappe.cache.delete_value([TRANSLATION_BUNDLES_KEY, TRANSLATION_BUNDLE_HASHES_KEY])
 
 
 def has_app_permission():
@@ -1166,11 +1444,13 @@ def has_app_permission():
 
 @frappe.whitelist(allow_guest=True)  # nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
 def validate_coupon(coupon_code: str, event: str, user_email: str | None = None) -> dict:
-	if not frappe.db.exists("Buzz Coupon Code", coupon_code):
+	try:
+		# usage counters are stored on the coupon, the cached document is enough to validate it
+		coupon = frappe.get_cached_doc("Buzz Coupon Code", coupon_code)
+	except frappe.DoesNotExistError:
+		frappe.clear_last_message()
 		return {"valid": False, "error": _("Invalid coupon code")}
 
-	coupon = frappe.get_doc("Buzz Coupon Code", coupon_code)
-
 	is_valid, error = coupon.is_valid_for_event(event)
 	if not is_valid:
 		return {"valid": False, "error": error}
@@ -0,0 +1,72 @@
+import hashlib
+import hmac
+from urllib.parse import urlencode
+
+import frappe
+from frappe import _
+from frappe.utils import get_url
+from frappe.utils.password import get_encryption_key
+
+from buzz.utils import build_ics_calendar, build_ics_event
+
+
+@frappe.whitelist(allow_guest=True)  # nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
+def event_calendar(event_route: str):
+	"""Subscribable `.ics` feed of a published event."""
+	event = frappe.db.get_value("Buzz Event", {"route": event_route, "is_published": 1})
+	if not event:
+		frappe.throw(_("Event not found"), frappe.DoesNotExistError)
+
+	event_doc = frappe.get_cached_doc("Buzz Event", event)
+	# a stable UID lets calendar apps update the entry when the event changes
+	send_calendar(build_ics_calendar([build_ics_event(event_doc, uid=event_doc.name)]), event_route)
+
+
+@frappe.whitelist()
+def get_calendar_feed_url() -> str:
+	"""Private feed URL with all events the user has tickets for, for calendar apps that can't log in."""
+	if frappe.session.user == "Guest":
+		frappe.throw(_("Please login to subscribe to your events"), frappe.PermissionError)
+
+	query = urlencode({"user": frappe.session.user, "token": get_calendar_token(frappe.session.user)})
+	return get_url(f"/api/method/buzz.api.calendar.user_calendar?{query}")
+
+
+@frappe.whitelist(allow_guest=True)  # nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
+def user_calendar(user: str, token: str):
+	if not token or not hmac.compare_digest(get_calendar_token(user), token):
+		frappe.throw(_("Invalid calendar link"), frappe.PermissionError)
+
+	events = [
+		build_ics_event(frappe.get_cached_doc("Buzz Event", event), uid=event)
+		for event in get_ticket_events(user)
+	]
+	send_calendar(build_ics_calendar(events), "my-events")
+
+
+def get_ticket_events(user: str) -> list[str]:
+	"""Events the user booked or holds a valid ticket for."""
+	EventTicket = frappe.qb.DocType("Event Ticket")
+	EventBooking = frappe.qb.DocType("Event Booking")
+
+	return (
+		frappe.qb.from_(EventTicket)
+		.left_join(EventBooking)
+		.on(EventBooking.name == EventTicket.booking)
+		.select(EventTicket.event)
+		.distinct()
+		.where(EventTicket.docstatus == 1)
+		.where(EventTicket.event.isnotnull())
+		.where((EventTicket.attendee_email == user) | (EventBooking.user == user))
+	).run(pluck=True)
+
+
+def get_calendar_token(user: str) -> str:
+	return hmac.new(get_encryption_key().encode(), f"calendar:{user}".encode(), hashlib.sha256).hexdigest()
+
+
+def send_calendar(content: str, filename: str) -> None:
+	frappe.response.filename = f"{filename}.ics"
+	frappe.response.filecontent = content
+	frappe.response.type = "download"
+	frappe.response.display_content_as = "inline"
@@ -0,0 +1,306 @@
+import base64
+import hashlib
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import get_datetime, getdate, now_datetime, today
+from frappe.utils.password import get_encryption_key
+
+from buzz.events.doctype.event_check_in.event_check_in import (
+	get_checkin_counts,
+	get_checkin_key,
+	update_checkin_counts,
+)
+
+MANIFEST_FIELDS = ("id", "attendee_name", "ticket_type", "add_ons", "cancelled", "checked_in_on")
+
+
+@frappe.whitelist()
+def get_checkin_manifest(event: str, since: str | None = None) -> dict:
+	"""Everything a scanner needs to validate tickets of an event without a connection.
+
+	Tickets are compact rows in the order of `fields`. With `since` (the `generated_at` of an
+	earlier manifest) only tickets that changed, or whose check-ins were added, cancelled or deleted
+	after that are returned, each with its complete current state; `deleted` lists tickets that no
+	longer exist.
+
+	`digest` is the SHA-256 of `{"deleted": ..., "tickets": ...}` as compact JSON with sorted keys,
+	`signature` an Ed25519 signature of `"<event>:<generated_at>:<digest>"`. Scanners verify it
+	offline with the key from `get_checkin_manifest_public_key`, fetched once when they are set up.
+	"""
+	frappe.only_for("Frontdesk Manager", True)
+
+	generated_at = str(now_datetime())
+	since = get_datetime(since) if since else None
+	tickets = get_manifest_rows(event, since=since)
+	deleted = [doc["name"] for doc in get_deleted_documents("Event Ticket", event, since)] if since else []
+	digest = get_manifest_digest(tickets, deleted)
+
+	return {
+		"event": event,
+		"generated_at": generated_at,
+		"since": str(since) if since else None,
+		"fields": MANIFEST_FIELDS,
+		"tickets": tickets,
+		"deleted": deleted,
+		"digest": digest,
+		"signature": sign_manifest(event, generated_at, digest),
+	}
+
+
+@frappe.whitelist()
+def get_checkin_manifest_public_key() -> str:
+	"""Base64 encoded raw Ed25519 public key that verifies manifest signatures of this site."""
+	frappe.only_for("Frontdesk Manager", True)
+
+	from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+	public_key = get_manifest_signing_key().public_key()
+	return base64.b64encode(public_key.public_bytes(Encoding.Raw, PublicFormat.Raw)).decode()
+
+
+@frappe.whitelist(methods=["POST"])
+def sync_checkins(event: str, checkins: list[dict], since: str | None = None) -> dict:
+	"""Upload check-ins queued by a scanner while it was offline.
+
+	`checkins` are `{"ticket": ..., "scanned_at": ...}` dicts, `since` the `generated_at` of the
+	scanner's manifest. Every ticket and day is checked in once, however many devices scanned it; the
+	response holds one result per ticket and day plus the manifest changes since the scanner's copy.
+	"""
+	frappe.only_for("Frontdesk Manager", True)
+
+	if isinstance(checkins, str):
+		checkins = json.loads(checkins)
+
+	results = record_checkins(checkins, event=event)
+	return {
+		"results": results,
+		"updates": get_checkin_manifest(event, since=since),
+	}
+
+
+@frappe.whitelist(methods=["POST"])
+def checkin_tickets(checkins: list[dict | str], event: str | None = None) -> list[dict]:
+	"""Check in many scanned tickets at once, e.g. from several gate devices.
+
+	`checkins` are ticket ids or `{"ticket": ..., "scanned_at": ...}` dicts. Scanning the same ticket
+	twice on a day, in one batch or from different devices, results in a single check in.
+	"""
+	frappe.only_for("Frontdesk Manager", True)
+
+	if isinstance(checkins, str):
+		checkins = json.loads(checkins)
+
+	return record_checkins(
+		[checkin if isinstance(checkin, dict) else {"ticket": checkin} for checkin in checkins], event=event
+	)
+
+
+def record_checkins(checkins: list[dict], event: str | None = None) -> list[dict]:
+	"""Check in tickets with one bulk insert, returns one result per ticket and day.
+
+	Duplicates are resolved by the unique `checkin_key` of `Event Check In`, not by reading first,
+	so concurrent batches with the same ticket can't both check it in.
+	"""
+	# a ticket is checked in once per day, the earliest scan of the day wins
+	scans = {}
+	for checkin in checkins:
+		scanned_at = get_datetime(checkin.get("scanned_at")) if checkin.get("scanned_at") else now_datetime()
+		key = (checkin["ticket"], str(min(getdate(scanned_at), getdate(today()))))
+		if key not in scans or scanned_at < scans[key]:
+			scans[key] = scanned_at
+
+	if not scans:
+		return []
+
+	ticket_ids = list({ticket for ticket, _date in scans})
+	tickets = {
+		ticket.name: ticket
+		for ticket in frappe.get_all(
+			"Event Ticket",
+			filters={"name": ("in", ticket_ids)},
+			fields=["name", "event", "docstatus", "attendee_name", "ticket_type"],
+		)
+	}
+
+	results = []
+	new_checkins = []
+	for ticket_id, checkin_date in scans:
+		ticket = tickets.get(ticket_id)
+		result = {"ticket": ticket_id, "date": checkin_date}
+		results.append(result)
+
+		if not ticket or ticket.docstatus == 0 or (event and str(ticket.event) != str(event)):
+			result["status"] = "Invalid"
+			result["message"] = _("Ticket not found")
+		elif ticket.docstatus == 2:
+			result["status"] = "Cancelled"
+			result["message"] = _("This ticket has been cancelled and cannot be checked in")
+		else:
+			checkin_doc = frappe.new_doc("Event Check In")
+			checkin_doc.ticket = ticket_id
+			checkin_doc.event = ticket.event
+			checkin_doc.date = checkin_date
+			checkin_doc.checkin_key = get_checkin_key(ticket_id, checkin_date)
+			checkin_doc.docstatus = 1
+			checkin_doc.set_new_name()
+			checkin_doc.set_user_and_timestamp()
+			new_checkins.append((result, checkin_doc))
+
+	if new_checkins:
+		rows = [
+			checkin_doc.get_valid_dict(convert_dates_to_str=True) for _result, checkin_doc in new_checkins
+		]
+		fields = list(rows[0])
+		frappe.db.bulk_insert(
+			"Event Check In",
+			fields,
+			[[row.get(field) for field in fields] for row in rows],
+			ignore_duplicates=True,
+		)
+
+		# rows that lost against an existing check in (unique checkin_key) were skipped by the insert
+		inserted = set(
+			frappe.get_all(
+				"Event Check In",
+				filters={"name": ("in", [checkin_doc.name for _result, checkin_doc in new_checkins])},
+				pluck="name",
+			)
+		)
+		new_counts = {}
+		for result, checkin_doc in new_checkins:
+			if checkin_doc.name in inserted:
+				ticket = tickets[result["ticket"]]
+				result["status"] = "Checked In"
+				result["attendee_name"] = ticket.attendee_name
+				counts = new_counts.setdefault((ticket.event, checkin_doc.date), {})
+				counts[ticket.ticket_type] = counts.get(ticket.ticket_type, 0) + 1
+			else:
+				result["status"] = "Duplicate"
+				result["message"] = _("This ticket was already checked in on {0}").format(
+					frappe.format(result["date"], {"fieldtype": "Date"})
+				)
+
+		for (checkin_event, checkin_date), counts in new_counts.items():
+			update_checkin_counts(checkin_event, checkin_date, counts)
+
+	return results
+
+
+@frappe.whitelist()
+def get_live_checkin_counts(event: str, date: str | None = None) -> dict:
+	"""Check in totals by ticket type for a lobby screen, served from Redis.
+
+	Updates are pushed as `checkin_counts_updated` to clients subscribed to the Buzz Event.
+	"""
+	frappe.only_for(["Frontdesk Manager", "Event Manager"], True)
+	return get_checkin_counts(event, date or today())
+
+
+def get_manifest_rows(event: str, since=None) -> list[list]:
+	EventTicket = frappe.qb.DocType("Event Ticket")
+	EventTicketType = frappe.qb.DocType("Event Ticket Type")
+	EventCheckIn = frappe.qb.DocType("Event Check In")
+	TicketAddOnValue = frappe.qb.DocType("Ticket Add-on Value")
+	TicketAddOn = frappe.qb.DocType("Ticket Add-on")
+
+	ticket_query = (
+		frappe.qb.from_(EventTicket)
+		.left_join(EventTicketType)
+		.on(EventTicketType.name == EventTicket.ticket_type)
+		.select(EventTicket.name, EventTicket.attendee_name, EventTicketType.title, EventTicket.docstatus)
+		.where(EventTicket.event == event)
+		.where(EventTicket.docstatus > 0)
+		.orderby(EventTicket.name)
+	)
+	if since:
+		# cancelling a check in updates it, deleting one leaves a Deleted Document
+		checkins_changed_since = (
+			frappe.qb.from_(EventCheckIn)
+			.select(EventCheckIn.ticket)
+			.where(EventCheckIn.event == event)
+			.where(EventCheckIn.modified > since)
+		)
+		changed = (EventTicket.modified > since) | EventTicket.name.isin(checkins_changed_since)
+
+		checkins_deleted_since = [
+			doc["ticket"] for doc in get_deleted_documents("Event Check In", event, since)
+		]
+		if checkins_deleted_since:
+			changed |= EventTicket.name.isin(checkins_deleted_since)
+
+		ticket_query = ticket_query.where(changed)
+
+	tickets = ticket_query.run()
+	if not tickets:
+		return []
+
+	ticket_ids = [ticket[0] for ticket in tickets]
+
+	add_ons = {}
+	for parent, title, value in (
+		frappe.qb.from_(TicketAddOnValue)
+		.join(TicketAddOn)
+		.on(TicketAddOn.name == TicketAddOnValue.add_on)
+		.select(TicketAddOnValue.parent, TicketAddOn.title, TicketAddOnValue.value)
+		.where(TicketAddOnValue.parenttype == "Event Ticket")
+		.where(TicketAddOnValue.parent.isin(ticket_ids))
+		.orderby(TicketAddOnValue.idx)
+	).run():
+		add_ons.setdefault(parent, []).append([title, value])
+
+	checked_in_on = {}
+	for ticket, date in (
+		frappe.qb.from_(EventCheckIn)
+		.select(EventCheckIn.ticket, EventCheckIn.date)
+		.where(EventCheckIn.ticket.isin(ticket_ids))
+		.where(EventCheckIn.docstatus == 1)
+		.orderby(EventCheckIn.date)
+	).run():
+		checked_in_on.setdefault(ticket, []).append(str(date))
+
+	return [
+		[
+			name,
+			attendee_name,
+			ticket_type,
+			add_ons.get(name, []),
+			int(docstatus == 2),
+			checked_in_on.get(name, []),
+		]
+		for name, attendee_name, ticket_type, docstatus in tickets
+	]
+
+
+def get_deleted_documents(doctype: str, event: str, since) -> list[dict]:
+	deleted = []
+	for data in frappe.get_all(
+		"Deleted Document",
+		filters={"deleted_doctype": doctype, "creation": (">", since)},
+		pluck="data",
+	):
+		doc = json.loads(data)
+		if str(doc.get("event")) == str(event):
+			deleted.append(doc)
+	return deleted
+
+
+def get_manifest_digest(tickets: list[list], deleted: list[str]) -> str:
+	payload = json.dumps(
+		{"deleted": deleted, "tickets": tickets}, separators=(",", ":"), sort_keys=True, default=str
+	)
+	return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_manifest_signing_key():
+	from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+	# derived from the site secret, so every worker signs with the same key without storing another one
+	seed = hashlib.sha256(f"buzz:checkin_manifest:{get_encryption_key()}".encode()).digest()
+	return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+def sign_manifest(event: str, generated_at: str, digest: str) -> str:
+	message = f"{event}:{generated_at}:{digest}".encode()
+	return base64.b64encode(get_manifest_signing_key().sign(message)).decode()
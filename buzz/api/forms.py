@@ -1,15 +1,33 @@
+import json
+import time
 from functools import lru_cache
 
 import frappe
 from frappe import _
 from frappe.geo.country_info import get_all as get_all_countries
 from frappe.model import DEFAULT_FIELDS, display_fieldtypes
-from frappe.utils import get_datetime, now_datetime, today
+from frappe.utils import add_to_date, cint, get_datetime, now_datetime, today
 from frappe.utils.data import cstr, sbool
 
 LAYOUT_FIELDTYPES = set(display_fieldtypes)
 LAYOUT_BREAK_FIELDTYPES = {"Column Break", "Section Break"}
 
+# Link fields ship one page of options with the form, the rest is found with `search_link_options`
+LINK_OPTIONS_PAGE_LENGTH = 50
+# link targets with more rows than this don't ship any options, not even a first page
+LINK_OPTIONS_INLINE_LIMIT = 1000
+LINK_OPTIONS_CACHE_TTL = 5 * 60
+
+# bump the version whenever the schema shape changes, so stale entries are never read
+FORM_SCHEMA_VERSION = 2
+FORM_SCHEMA_CACHE_TTL = 24 * 60 * 60
+
+# forms with "Buffer Submissions" queue submissions in a Redis stream, see `buffer_form_submission`
+FORM_INTAKE_BATCH_SIZE = 200
+# submissions are refused past this backlog, so a stalled worker can't grow the stream unbounded
+FORM_INTAKE_MAX_PENDING = 20000
+FORM_INTAKE_METRICS_TTL = 60 * 60
+
 EVENT_PROPOSAL_EXCLUDE_FIELDS = DEFAULT_FIELDS | {
 	"naming_series",
 	"amended_from",
@@ -63,6 +81,8 @@ def get_form_fields(
 	exclude_fields: set,
 	with_layout_breaks: bool = False,
 	event: str | None = None,
+	with_link_options: bool = True,
+	raw_defaults: bool = False,
 ) -> list:
 	meta = frappe.get_meta(doctype)
 	fields = []
@@ -82,13 +102,8 @@ def get_form_fields(
 				)
 			continue
 		default_value = df.default
-		if default_value:
-			if default_value == "Today":
-				default_value = today()
-			elif default_value == "Now":
-				default_value = cstr(now_datetime())
-			elif default_value.startswith("eval:") or default_value.startswith("%"):
-				default_value = None
+		if default_value and (default_value.startswith("eval:") or default_value.startswith("%")):
+			default_value = None
 
 		field_data = {
 			"fieldname": df.fieldname,
@@ -96,11 +111,11 @@ def get_form_fields(
 			"label": df.label or df.fieldname,
 			"options": df.options,
 			"reqd": df.reqd,
-			"default": default_value,
+			"default": default_value if raw_defaults else resolve_field_default(default_value),
 			"description": df.description,
 		}
-		if df.fieldtype == "Link" and df.options:
-			field_data["link_options"] = get_link_field_options(df.options, event)
+		if df.fieldtype == "Link" and df.options and with_link_options:
+			field_data.update(get_link_field_data(df.options, event))
 		if df.fieldtype == "Table" and df.options:
 			child_meta = frappe.get_meta(df.options)
 			child_fields = []
@@ -123,19 +138,121 @@ def get_form_fields(
 	return fields
 
 
-def get_link_field_options(doctype: str, event: str | None = None) -> list[dict]:
+def get_link_field_data(doctype: str, event: str | None = None) -> dict:
+	count = get_link_options_count(doctype, event)
+	options = get_link_field_options(doctype, event) if count <= LINK_OPTIONS_INLINE_LIMIT else []
+	return {"link_options": options, "link_search": count > len(options)}
+
+
+def resolve_field_default(default_value: str | None) -> str | None:
+	if default_value == "Today":
+		return today()
+	if default_value == "Now":
+		return cstr(now_datetime())
+	return default_value
+
+
+def add_request_field_data(form_fields: list, event: str) -> list:
+	# link options change with their target doctype and "Today"/"Now" defaults with the clock,
+	# both are added to the cached schema per request
+	fields = []
+	for field in form_fields:
+		field = {**field}
+		if "default" in field:
+			field["default"] = resolve_field_default(field["default"])
+		if field["fieldtype"] == "Link" and field.get("options"):
+			field.update(get_link_field_data(field["options"], event))
+		fields.append(field)
+	return fields
+
+
+def get_link_field_options(
+	doctype: str,
+	event: str | None = None,
+	txt: str | None = None,
+	start: int = 0,
+	page_length: int = LINK_OPTIONS_PAGE_LENGTH,
+) -> list[dict]:
 	meta = frappe.get_meta(doctype)
 	title_field = meta.get_title_field()
 
-	filters = {}
-	if event and meta.has_field("event"):
-		filters["event"] = event
+	or_filters = None
+	if txt:
+		txt = txt.replace("%", "").replace("_", "\\_")
+		or_filters = {"name": ("like", f"{txt}%")}
+		if title_field != "name":
+			or_filters[title_field] = ("like", f"{txt}%")
 
 	fields = ["name"] if title_field == "name" else ["name", title_field]
-	rows = frappe.get_all(doctype, filters=filters, fields=fields, limit_page_length=0, order_by="name asc")
+	rows = frappe.get_all(
+		doctype,
+		filters=get_link_options_filters(doctype, event),
+		or_filters=or_filters,
+		fields=fields,
+		order_by="name asc",
+		limit_start=start,
+		limit_page_length=page_length,
+	)
 	return [{"value": row.name, "label": row.get(title_field) or row.name} for row in rows]
 
 
+def get_link_options_filters(doctype: str, event: str | None = None) -> dict:
+	if event and frappe.get_meta(doctype).has_field("event"):
+		return {"event": event}
+	return {}
+
+
+def get_link_options_count(doctype: str, event: str | None = None) -> int:
+	cache_key = f"buzz:link_options_count:{doctype}:{event or ''}"
+	count = frappe.cache.get_value(cache_key)
+	if count is None:
+		count = frappe.db.count(doctype, get_link_options_filters(doctype, event))
+		frappe.cache.set_value(cache_key, count, expires_in_sec=LINK_OPTIONS_CACHE_TTL)
+	return count
+
+
+@frappe.whitelist(allow_guest=True)  # nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
+def search_link_options(
+	fieldname: str,
+	txt: str | None = None,
+	start: int = 0,
+	event_route: str | None = None,
+	form_route: str | None = None,
+) -> list[dict]:
+	"""Options of a Link field on a custom form (or the event proposal form) whose name or title
+	starts with `txt`, one page at a time.
+
+	Only fields the form renders can be searched, scoped to the event like the inlined options.
+	"""
+	if event_route and form_route:
+		event_doc, form_row = validate_custom_form(event_route, form_route)
+		if sbool(form_row.login_required) and frappe.session.user == "Guest":
+			frappe.throw(_("Please log in to submit this form"), frappe.AuthenticationError)
+
+		form_doctype, event = form_row.form_doctype, event_doc.name
+		exclude_fields = (
+			STANDARD_EXCLUDE_FIELDS
+			| set(get_auto_set_fields(form_doctype).keys())
+			| (parse_excluded_fields(form_row.excluded_fields) or set())
+		)
+	else:
+		validate_event_proposal_settings()
+		form_doctype, event, exclude_fields = "Event Proposal", None, EVENT_PROPOSAL_EXCLUDE_FIELDS
+
+	df = get_renderable_fields(form_doctype, exclude_fields).get(fieldname)
+	if not df or df.fieldtype != "Link" or not df.options:
+		frappe.throw(_("Field {0} cannot be searched").format(fieldname), frappe.PermissionError)
+
+	txt = (txt or "").strip()[:140]
+	start = cint(start)
+	cache_key = f"buzz:link_options:{df.options}:{event or ''}:{start}:{txt.lower()}"
+	options = frappe.cache.get_value(cache_key)
+	if options is None:
+		options = get_link_field_options(df.options, event, txt=txt, start=start)
+		frappe.cache.set_value(cache_key, options, expires_in_sec=LINK_OPTIONS_CACHE_TTL)
+	return options
+
+
 def validate_custom_form(event_route: str, form_route: str):
 	event_name = frappe.get_cached_value("Buzz Event", {"route": event_route}, "name")
 	if not event_name:
@@ -211,6 +328,108 @@ def validate_excluded_fields(form_doctype: str, excluded_fields: str | None) ->
 		)
 
 
+def get_form_schema(event: str, form_row) -> dict:
+	"""Everything a custom form derives from its doctype meta and the event's `Buzz Custom Field`s,
+	compiled once per event and form route and shared by rendering and submission.
+
+	Cleared by `clear_form_schema_cache` when the event's forms, its custom fields or the form
+	doctype's meta change.
+	"""
+	cache_key = get_form_schema_cache_key(event, form_row.route)
+	schema = frappe.cache.get_value(cache_key)
+	if schema is None:
+		schema = build_form_schema(event, form_row)
+		frappe.cache.set_value(cache_key, schema, expires_in_sec=FORM_SCHEMA_CACHE_TTL)
+	return schema
+
+
+def get_form_schema_cache_key(event: str, form_route: str) -> str:
+	return f"buzz:form_schema:v{FORM_SCHEMA_VERSION}:{event}:{form_route}"
+
+
+def build_form_schema(event: str, form_row) -> dict:
+	form_doctype = form_row.form_doctype
+	meta = frappe.get_meta(form_doctype)
+
+	auto_set = get_auto_set_fields(form_doctype)
+	excluded_fields = parse_excluded_fields(form_row.excluded_fields) or set()
+	exclude_fields = STANDARD_EXCLUDE_FIELDS | set(auto_set.keys()) | excluded_fields
+	renderable = get_renderable_fields(form_doctype, exclude_fields)
+
+	has_additional_fields = meta.has_field("additional_fields")
+	custom_fields = []
+	if has_additional_fields:
+		custom_fields = frappe.get_all(
+			"Buzz Custom Field",
+			filters={
+				"event": event,
+				"applied_to": "Custom Form",
+				"custom_form_doctype": form_doctype,
+				"enabled": 1,
+			},
+			fields=[
+				"label",
+				"fieldname",
+				"fieldtype",
+				"options",
+				"mandatory",
+				"placeholder",
+				"default_value",
+				"order",
+			],
+			order_by="order asc",
+		)
+
+	return {
+		"form_doctype": form_doctype,
+		"form_title": meta.name,
+		"form_fields": get_form_fields(
+			form_doctype,
+			exclude_fields,
+			with_layout_breaks=True,
+			event=event,
+			with_link_options=False,
+			raw_defaults=True,
+		),
+		"custom_fields": custom_fields,
+		"has_additional_fields": has_additional_fields,
+		"auto_set": auto_set,
+		"allowed_fieldnames": list(renderable),
+		"table_fieldnames": [fieldname for fieldname, df in renderable.items() if df.fieldtype == "Table"],
+	}
+
+
+def clear_form_schema_cache(doc, method=None):
+	"""Hooked on Buzz Event and Buzz Custom Field, and on DocType, Custom Field and Property Setter
+	for changes to a form doctype's meta."""
+	if doc.doctype == "Buzz Event":
+		doc_before_save = doc.get_doc_before_save()
+		routes = {row.route for row in doc.custom_forms}
+		if doc_before_save:
+			routes |= {row.route for row in doc_before_save.custom_forms}
+		for route in routes - {None}:
+			frappe.cache.delete_value(get_form_schema_cache_key(doc.name, route))
+		return
+
+	if doc.doctype == "Buzz Custom Field":
+		doc_before_save = doc.get_doc_before_save()
+		events = {doc.event, doc_before_save.event if doc_before_save else None} - {None}
+		filters = {"parent": ("in", list(events))}
+	elif doc.doctype == "DocType":
+		filters = {"form_doctype": doc.name}
+	else:
+		filters = {"form_doctype": doc.get("dt") or doc.get("doc_type")}
+
+	for event, route in frappe.get_all(
+		"Buzz Event Form",
+		filters={"parenttype": "Buzz Event", **filters},
+		fields=["parent", "route"],
+		as_list=True,
+	):
+		if route:
+			frappe.cache.delete_value(get_form_schema_cache_key(event, route))
+
+
 @frappe.whitelist(allow_guest=True)  # nosemgrep: frappe-semgrep-rules.rules.security.guest-whitelisted-method
 def get_custom_form_data(event_route: str, form_route: str) -> dict:
 	event_doc, form_row = validate_custom_form(event_route, form_route)
@@ -251,39 +470,12 @@ def get_custom_form_data(event_route: str, form_route: str) -> dict:
 			"success_message": "",
 		}
 
-	auto_set = get_auto_set_fields(form_doctype)
-	excluded_fields = parse_excluded_fields(form_row.excluded_fields) or set()
-	exclude_fields = STANDARD_EXCLUDE_FIELDS | set(auto_set.keys()) | excluded_fields
-	form_fields = get_form_fields(form_doctype, exclude_fields, with_layout_breaks=True, event=event_doc.name)
-
-	form_doctype_meta = frappe.get_meta(form_doctype)
-	custom_fields = []
-	if form_doctype_meta.has_field("additional_fields"):
-		custom_fields = frappe.get_all(
-			"Buzz Custom Field",
-			filters={
-				"event": event_doc.name,
-				"applied_to": "Custom Form",
-				"custom_form_doctype": form_doctype,
-				"enabled": 1,
-			},
-			fields=[
-				"label",
-				"fieldname",
-				"fieldtype",
-				"options",
-				"mandatory",
-				"placeholder",
-				"default_value",
-				"order",
-			],
-			order_by="order asc",
-		)
+	schema = get_form_schema(event_doc.name, form_row)
 
 	return {
-		"form_fields": form_fields,
-		"custom_fields": custom_fields,
-		"form_title": form_doctype_meta.name,
+		"form_fields": add_request_field_data(schema["form_fields"], event_doc.name),
+		"custom_fields": schema["custom_fields"],
+		"form_title": schema["form_title"],
 		"event": event_data,
 		"closed": False,
 		"closed_title": form_row.closed_title or _("Submissions Closed"),
@@ -298,7 +490,6 @@ def submit_custom_form(
 	event_route: str, form_route: str, data: dict | str, custom_fields_data: dict | str | None = None
 ) -> None:
 	event_doc, form_row = validate_custom_form(event_route, form_route)
-	form_doctype = form_row.form_doctype
 
 	if sbool(form_row.login_required) and frappe.session.user == "Guest":
 		frappe.throw(_("Please login to submit this form"), frappe.AuthenticationError)
@@ -309,58 +500,186 @@ def submit_custom_form(
 	data = frappe.parse_json(data) or {}
 	custom_fields_data = frappe.parse_json(custom_fields_data) or {}
 
-	auto_set = get_auto_set_fields(form_doctype)
-	excluded_fields = parse_excluded_fields(form_row.excluded_fields) or set()
-	exclude_fields = STANDARD_EXCLUDE_FIELDS | set(auto_set.keys()) | excluded_fields
+	schema = get_form_schema(event_doc.name, form_row)
+	doc_data = {"doctype": schema["form_doctype"]}
 
-	doc_data = {"doctype": form_doctype}
-
-	for field, source in auto_set.items():
+	for field, source in schema["auto_set"].items():
 		if source == "from_route":
 			doc_data[field] = event_doc.name
 		elif source == "session_user":
 			doc_data[field] = frappe.session.user
 
-	allowed_fieldnames = set(get_renderable_fields(form_doctype, exclude_fields))
+	allowed_fieldnames = set(schema["allowed_fieldnames"])
+	table_fieldnames = set(schema["table_fieldnames"])
 	for fieldname, value in data.items():
-		if fieldname in allowed_fieldnames:
-			doc_data[fieldname] = value
+		if fieldname not in allowed_fieldnames:
+			continue
+		if fieldname in table_fieldnames and not isinstance(value, list):
+			continue
+		doc_data[fieldname] = value
+
+	if custom_fields_data and schema["has_additional_fields"]:
+		allowed_custom = {cf["fieldname"]: cf for cf in schema["custom_fields"]}
+		doc_data["additional_fields"] = [
+			{
+				"label": allowed_custom[fieldname]["label"],
+				"fieldname": fieldname,
+				"fieldtype": allowed_custom[fieldname]["fieldtype"],
+				"value": cstr(value),
+			}
+			for fieldname, value in custom_fields_data.items()
+			if fieldname in allowed_custom and value not in (None, "")
+		]
+
+	if sbool(form_row.buffered_intake):
+		validate_form_submission(schema, doc_data, custom_fields_data)
+		buffer_form_submission(event_doc.name, form_row.route, doc_data)
+		return
 
-	meta = frappe.get_meta(form_doctype)
-	for df in meta.fields:
-		if df.fieldtype == "Table" and df.fieldname in allowed_fieldnames:
-			if df.fieldname in data and isinstance(data[df.fieldname], list):
-				doc_data[df.fieldname] = data[df.fieldname]
+	frappe.get_doc(doc_data).insert(ignore_permissions=True)
 
-	doc = frappe.get_doc(doc_data)
 
-	if custom_fields_data and meta.has_field("additional_fields"):
-		custom_field_definitions = frappe.get_all(
-			"Buzz Custom Field",
-			filters={
-				"event": event_doc.name,
-				"applied_to": "Custom Form",
-				"custom_form_doctype": form_doctype,
-				"enabled": 1,
-			},
-			fields=["fieldname", "label", "fieldtype"],
+def validate_form_submission(schema: dict, doc_data: dict, custom_fields_data: dict) -> None:
+	# buffered submissions are inserted after the request returns, catch what the submitter can fix now
+	missing = [
+		field["label"]
+		for field in schema["form_fields"]
+		if field.get("reqd") and not doc_data.get(field["fieldname"])
+	]
+	missing += [
+		cf["label"]
+		for cf in schema["custom_fields"]
+		if cf["mandatory"] and custom_fields_data.get(cf["fieldname"]) in (None, "")
+	]
+	if missing:
+		frappe.throw(
+			_("Please fill in the mandatory fields: {0}").format(", ".join(_(label) for label in missing)),
+			frappe.MandatoryError,
 		)
-		allowed_custom = {cf["fieldname"]: cf for cf in custom_field_definitions}
 
-		for fieldname, value in custom_fields_data.items():
-			if fieldname in allowed_custom and value not in (None, ""):
-				cf = allowed_custom[fieldname]
-				doc.append(
-					"additional_fields",
-					{
-						"label": cf["label"],
-						"fieldname": fieldname,
-						"fieldtype": cf["fieldtype"],
-						"value": cstr(value),
-					},
-				)
 
-	doc.insert(ignore_permissions=True)
+def buffer_form_submission(event: str, form_route: str, doc_data: dict) -> None:
+	"""Queue a validated submission for `drain_form_intake` instead of inserting it in the request."""
+	stream = get_form_intake_stream(event, form_route)
+	if frappe.cache.xlen(stream) >= FORM_INTAKE_MAX_PENDING:
+		frappe.throw(
+			_("This form is receiving a lot of submissions right now, please try again in a minute."),
+			frappe.TooManyRequestsError,
+		)
+
+	frappe.cache.xadd(stream, {"doc": json.dumps(doc_data, default=str), "user": frappe.session.user})
+	record_form_intake_metric(event, form_route, "received")
+	enqueue_form_intake_drain(event, form_route)
+
+
+def get_form_intake_stream(event: str, form_route: str) -> str:
+	# streams aren't wrapped by frappe's cache, the site prefix is added here
+	return frappe.cache.make_key(f"buzz:form_intake:{event}:{form_route}")
+
+
+def enqueue_form_intake_drain(event: str, form_route: str) -> None:
+	frappe.enqueue(
+		drain_form_intake,
+		queue="long",
+		job_id=f"buzz:drain_form_intake:{event}:{form_route}",
+		deduplicate=True,
+		event=event,
+		form_route=form_route,
+	)
+
+
+def drain_form_intake(event: str, form_route: str) -> dict:
+	"""Insert the buffered submissions of a form, one transaction per batch.
+
+	Entries are removed from the stream after their batch is committed, so a worker lost mid-batch
+	inserts that batch again on the next run. Submissions that fail to insert are logged with their
+	data and dropped. Entries queued while the last batch commits are picked up by the next job or
+	`drain_buffered_form_submissions`.
+	"""
+	stream = get_form_intake_stream(event, form_route)
+	started = time.monotonic()
+	summary = frappe._dict(inserted=0, failed=0)
+
+	while entries := frappe.cache.xrange(stream, count=FORM_INTAKE_BATCH_SIZE):
+		inserted, failed = insert_form_submissions(entries)
+		frappe.db.commit()
+		frappe.cache.xdel(stream, *[entry_id for entry_id, _fields in entries])
+
+		record_form_intake_metric(event, form_route, "inserted", inserted)
+		record_form_intake_metric(event, form_route, "failed", failed)
+		summary.inserted += inserted
+		summary.failed += failed
+
+	summary.seconds = round(time.monotonic() - started, 3)
+	if summary.inserted or summary.failed:
+		frappe.logger("buzz").info(f"Form intake {event}/{form_route}: {summary}")
+	return summary
+
+
+def insert_form_submissions(entries: list) -> tuple[int, int]:
+	inserted = failed = 0
+	for _entry_id, fields in entries:
+		doc_data = json.loads(fields[b"doc"])
+		frappe.db.savepoint("form_intake")
+		try:
+			doc = frappe.get_doc(doc_data)
+			doc.owner = fields[b"user"].decode()
+			doc.insert(ignore_permissions=True)
+		except Exception:
+			frappe.db.rollback(save_point="form_intake")
+			frappe.log_error(
+				title="Buffered form submission failed",
+				message=f"{frappe.get_traceback()}\n\n{frappe.as_json(doc_data)}",
+			)
+			failed += 1
+		else:
+			inserted += 1
+	return inserted, failed
+
+
+def record_form_intake_metric(event: str, form_route: str, metric: str, count: int = 1) -> None:
+	if not count:
+		return
+	key = get_form_intake_metrics_key(event, form_route, now_datetime().strftime("%Y-%m-%d %H:%M"))
+	pipeline = frappe.cache.pipeline()
+	pipeline.hincrby(key, metric, count)
+	pipeline.expire(key, FORM_INTAKE_METRICS_TTL)
+	pipeline.execute()
+
+
+def get_form_intake_metrics_key(event: str, form_route: str, minute: str) -> str:
+	return frappe.cache.make_key(f"buzz:form_intake_metrics:{event}:{form_route}:{minute}")
+
+
+def get_form_intake_stats(event: str, form_route: str, minutes: int = 15) -> dict:
+	"""Pending submissions and per-minute received/inserted/failed counts of a buffered form."""
+	now = now_datetime()
+	pipeline = frappe.cache.pipeline()
+	labels = []
+	for offset in range(minutes - 1, -1, -1):
+		minute = add_to_date(now, minutes=-offset).strftime("%Y-%m-%d %H:%M")
+		labels.append(minute)
+		pipeline.hgetall(get_form_intake_metrics_key(event, form_route, minute))
+
+	throughput = [
+		{"minute": minute, **{key.decode(): int(value) for key, value in counts.items()}}
+		for minute, counts in zip(labels, pipeline.execute(), strict=True)
+	]
+	return {
+		"pending": frappe.cache.xlen(get_form_intake_stream(event, form_route)),
+		"throughput": throughput,
+	}
+
+
+@frappe.whitelist()
+def get_buffered_intake_stats(event: str) -> dict:
+	frappe.has_permission("Buzz Event", "read", event, throw=True)
+	routes = frappe.get_all(
+		"Buzz Event Form",
+		filters={"parenttype": "Buzz Event", "parent": event, "buffered_intake": 1},
+		pluck="route",
+	)
+	return {route: get_form_intake_stats(event, route) for route in routes}
 
 
 def validate_event_proposal_settings():
@@ -0,0 +1,65 @@
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from buzz.api import get_booking_payload_cache_key, get_event_booking_data
+from buzz.ticketing.doctype.event_ticket_type.event_ticket_type import update_tickets_sold
+
+
+class TestEventBookingData(IntegrationTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		self.test_event.is_published = True
+		self.test_event.save()
+		self.ticket_type = frappe.get_doc(
+			{
+				"doctype": "Event Ticket Type",
+				"event": self.test_event.name,
+				"title": "Booking Data (Test)",
+				"price": 100,
+				"is_published": True,
+				"max_tickets_available": 2,
+			}
+		).insert()
+
+	def tearDown(self):
+		frappe.set_user("Administrator")
+		frappe.cache.delete_value(get_booking_payload_cache_key(self.test_event.route))
+
+	def get_ticket_type_titles(self):
+		return {tt["title"] for tt in get_event_booking_data(self.test_event.route).available_ticket_types}
+
+	def test_payload_is_cached(self):
+		get_event_booking_data(self.test_event.route)
+		self.assertTrue(frappe.cache.get_value(get_booking_payload_cache_key(self.test_event.route)))
+
+	def test_saving_ticket_type_clears_cache(self):
+		self.assertIn("Booking Data (Test)", self.get_ticket_type_titles())
+
+		self.ticket_type.title = "Booking Data (Renamed)"
+		self.ticket_type.save()
+
+		self.assertIn("Booking Data (Renamed)", self.get_ticket_type_titles())
+
+	def test_live_availability_overlay(self):
+		self.assertIn("Booking Data (Test)", self.get_ticket_type_titles())
+
+		# counters move without invalidating the cached payload
+		update_tickets_sold(self.ticket_type.name, 2)
+
+		self.assertNotIn("Booking Data (Test)", self.get_ticket_type_titles())
+
+	def test_unpublished_event_not_found(self):
+		self.test_event.is_published = False
+		self.test_event.save()
+
+		frappe.set_user("Guest")
+		with self.assertRaises(frappe.DoesNotExistError):
+			get_event_booking_data(self.test_event.route)
+
+	def test_guest_gets_limited_event_details(self):
+		frappe.set_user("Guest")
+		data = get_event_booking_data(self.test_event.route)
+
+		self.assertIsInstance(data.event_details, dict)
+		self.assertNotIn("payment_gateway", data.event_details)
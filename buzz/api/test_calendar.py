@@ -0,0 +1,53 @@
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from buzz.api.calendar import event_calendar, get_calendar_token, user_calendar
+from buzz.utils import generate_ics_file, get_ics_cache_key
+
+
+class TestEventCalendar(IntegrationTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		self.test_event.is_published = True
+		self.test_event.save()
+
+	def tearDown(self):
+		frappe.local.response = frappe._dict()
+
+	def test_ics_file_for_attendee(self):
+		ics = generate_ics_file(self.test_event, "attendee@example.com")
+
+		self.assertTrue(ics.startswith("BEGIN:VCALENDAR"))
+		self.assertTrue(ics.endswith("END:VCALENDAR"))
+		self.assertIn(f"SUMMARY:{self.test_event.title}", ics)
+		self.assertIn("mailto:attendee@example.com", ics)
+		self.assertTrue(frappe.cache.get_value(get_ics_cache_key(self.test_event.name)))
+
+	def test_saving_event_clears_cached_lines(self):
+		generate_ics_file(self.test_event, "attendee@example.com")
+
+		title = self.test_event.title
+		self.test_event.title = "Renamed Calendar Event"
+		self.test_event.save()
+		try:
+			self.assertIn(
+				"SUMMARY:Renamed Calendar Event", generate_ics_file(self.test_event, "a@example.com")
+			)
+		finally:
+			self.test_event.title = title
+			self.test_event.save()
+
+	def test_public_event_feed(self):
+		event_calendar(self.test_event.route)
+
+		self.assertEqual(frappe.response.filename, "test-route.ics")
+		self.assertIn(f"UID:{self.test_event.name}@buzz", frappe.response.filecontent)
+		self.assertNotIn("ATTENDEE", frappe.response.filecontent)
+
+	def test_user_feed_requires_valid_token(self):
+		with self.assertRaises(frappe.PermissionError):
+			user_calendar("Administrator", "not-the-token")
+
+		user_calendar("Administrator", get_calendar_token("Administrator"))
+		self.assertIn("BEGIN:VCALENDAR", frappe.response.filecontent)
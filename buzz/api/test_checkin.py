@@ -0,0 +1,227 @@
+from base64 import b64decode
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import getdate, today
+
+from buzz.api import checkin_ticket
+from buzz.api.checkin import (
+	checkin_tickets,
+	get_checkin_manifest,
+	get_checkin_manifest_public_key,
+	get_live_checkin_counts,
+	get_manifest_digest,
+	sync_checkins,
+)
+from buzz.events.doctype.event_check_in.event_check_in import (
+	apply_checkin_counts,
+	get_checkin_counts_key,
+	get_pending_checkin_counts_key,
+	publish_pending_checkin_counts,
+	run_redis_command,
+)
+
+
+class CheckinTestCase(IntegrationTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		self.ticket_type = frappe.get_doc(
+			{
+				"doctype": "Event Ticket Type",
+				"event": self.test_event.name,
+				"title": "Manifest (Test)",
+				"price": 0,
+			}
+		).insert()
+		self.tickets = [self.make_ticket(f"Gate {i}") for i in range(3)]
+
+	def make_ticket(self, attendee_name):
+		return (
+			frappe.get_doc(
+				{
+					"doctype": "Event Ticket",
+					"event": self.test_event.name,
+					"ticket_type": self.ticket_type.name,
+					"attendee_name": attendee_name,
+					"attendee_email": "gate@example.com",
+				}
+			)
+			.insert()
+			.submit()
+		)
+
+	def get_rows(self, manifest):
+		return {row[0]: dict(zip(manifest["fields"], row, strict=True)) for row in manifest["tickets"]}
+
+
+class TestCheckinManifest(CheckinTestCase):
+	def test_manifest_lists_tickets_of_event(self):
+		self.tickets[2].cancel()
+
+		rows = self.get_rows(get_checkin_manifest(self.test_event.name))
+
+		self.assertTrue({ticket.name for ticket in self.tickets} <= set(rows))
+		self.assertEqual(rows[self.tickets[0].name]["ticket_type"], "Manifest (Test)")
+		self.assertEqual(rows[self.tickets[2].name]["cancelled"], 1)
+
+	def test_sync_resolves_duplicate_scans(self):
+		manifest = get_checkin_manifest(self.test_event.name)
+		ticket = self.tickets[0].name
+		scans = [
+			{"ticket": ticket, "scanned_at": f"{today()} 09:00:00"},
+			# same ticket scanned at another gate
+			{"ticket": ticket, "scanned_at": f"{today()} 09:00:05"},
+			{"ticket": "does-not-exist"},
+		]
+
+		response = sync_checkins(self.test_event.name, scans, since=manifest["generated_at"])
+		statuses = {result["ticket"]: result["status"] for result in response["results"]}
+
+		self.assertEqual(statuses, {ticket: "Checked In", "does-not-exist": "Invalid"})
+		self.assertEqual(frappe.db.count("Event Check In", {"ticket": ticket, "docstatus": 1}), 1)
+		self.assertEqual(self.get_rows(response["updates"])[ticket]["checked_in_on"], [today()])
+
+		# a second device syncing the same scan later
+		response = sync_checkins(self.test_event.name, scans[:1], since=manifest["generated_at"])
+		self.assertEqual(response["results"][0]["status"], "Duplicate")
+
+	def test_manifest_signature_verifies_with_public_key(self):
+		from cryptography.exceptions import InvalidSignature
+		from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+		manifest = get_checkin_manifest(self.test_event.name)
+		public_key = Ed25519PublicKey.from_public_bytes(b64decode(get_checkin_manifest_public_key()))
+
+		def verify(manifest):
+			digest = get_manifest_digest(manifest["tickets"], manifest["deleted"])
+			message = f"{manifest['event']}:{manifest['generated_at']}:{digest}".encode()
+			public_key.verify(b64decode(manifest["signature"]), message)
+
+		verify(manifest)
+
+		manifest["tickets"][0][4] = 1
+		with self.assertRaises(InvalidSignature):
+			verify(manifest)
+
+	def test_updates_include_cancelled_and_deleted_check_ins(self):
+		checkin_tickets([ticket.name for ticket in self.tickets[:2]])
+		since = get_checkin_manifest(self.test_event.name)["generated_at"]
+
+		cancelled = frappe.get_doc("Event Check In", {"ticket": self.tickets[0].name})
+		cancelled.cancel()
+		deleted = frappe.get_doc("Event Check In", {"ticket": self.tickets[1].name})
+		deleted.cancel()
+		deleted.delete()
+
+		rows = self.get_rows(get_checkin_manifest(self.test_event.name, since=since))
+
+		self.assertEqual(rows[self.tickets[0].name]["checked_in_on"], [])
+		self.assertEqual(rows[self.tickets[1].name]["checked_in_on"], [])
+		self.assertNotIn(self.tickets[2].name, rows)
+
+	def test_updates_list_deleted_tickets(self):
+		since = get_checkin_manifest(self.test_event.name)["generated_at"]
+		self.tickets[2].cancel()
+		self.tickets[2].delete()
+
+		manifest = get_checkin_manifest(self.test_event.name, since=since)
+
+		self.assertEqual(manifest["deleted"], [self.tickets[2].name])
+
+
+class TestBatchCheckin(CheckinTestCase):
+	def test_batch_checks_in_each_ticket_once(self):
+		ticket_ids = [ticket.name for ticket in self.tickets]
+
+		results = checkin_tickets([*ticket_ids, ticket_ids[0]])
+		self.assertEqual([result["status"] for result in results], ["Checked In"] * 3)
+
+		# the same tickets scanned again by another device
+		results = checkin_tickets(ticket_ids[:2])
+		self.assertEqual([result["status"] for result in results], ["Duplicate"] * 2)
+		self.assertEqual(frappe.db.count("Event Check In", {"ticket": ("in", ticket_ids)}), 3)
+
+	def test_checkin_key_is_unique(self):
+		checkin_tickets([self.tickets[0].name])
+
+		checkin_doc = frappe.get_doc(
+			{"doctype": "Event Check In", "ticket": self.tickets[0].name, "date": today()}
+		).insert()
+		with self.assertRaises(frappe.UniqueValidationError):
+			checkin_doc.submit()
+
+	def test_concurrent_checkin_reports_a_single_message(self):
+		ticket = self.tickets[0]
+		with patch(
+			"buzz.api.validate_ticket_for_checkin",
+			return_value={"ticket": {"attendee_name": ticket.attendee_name}},
+		):
+			checkin_ticket(ticket.name)
+			frappe.clear_messages()
+
+			# the second scan was validated before the first one was committed
+			with self.assertRaises(frappe.ValidationError):
+				checkin_ticket(ticket.name)
+
+		self.assertEqual(len(frappe.local.message_log), 1)
+		self.assertIn("already checked in", frappe.local.message_log[0]["message"])
+
+	def test_cancelled_checkin_frees_the_day(self):
+		checkin_tickets([self.tickets[0].name])
+		frappe.get_doc("Event Check In", {"ticket": self.tickets[0].name}).cancel()
+
+		self.assertEqual(checkin_tickets([self.tickets[0].name])[0]["status"], "Checked In")
+
+
+class TestLiveCheckinCounts(CheckinTestCase):
+	def setUp(self):
+		super().setUp()
+		run_redis_command("delete", get_checkin_counts_key(self.test_event.name, today()))
+		run_redis_command(
+			"delete",
+			frappe.cache.make_key(f"buzz:checkin_counts_published:{self.test_event.name}:{getdate(today())}"),
+			get_pending_checkin_counts_key(),
+		)
+
+	def get_count(self, counts):
+		for row in counts["by_ticket_type"]:
+			if row["ticket_type"] == str(self.ticket_type.name):
+				return row["count"]
+		return 0
+
+	def test_counts_are_rebuilt_from_database(self):
+		checkin_tickets([ticket.name for ticket in self.tickets])
+
+		counts = get_live_checkin_counts(self.test_event.name)
+		self.assertEqual(self.get_count(counts), 3)
+		self.assertEqual(counts["by_ticket_type"][0]["title"], "Manifest (Test)")
+
+	@patch("frappe.publish_realtime")
+	def test_committed_checkins_increment_counters(self, mock_publish):
+		before = get_live_checkin_counts(self.test_event.name)
+
+		apply_checkin_counts(self.test_event.name, today(), {str(self.ticket_type.name): 2})
+
+		after = get_live_checkin_counts(self.test_event.name)
+		self.assertEqual(after["total"], before["total"] + 2)
+		self.assertEqual(self.get_count(after), 2)
+		self.assertGreater(after["version"], before["version"])
+		mock_publish.assert_called_once()
+
+	@patch("frappe.publish_realtime")
+	def test_burst_of_checkins_is_throttled(self, mock_publish):
+		event, ticket_type = self.test_event.name, str(self.ticket_type.name)
+
+		for _i in range(3):
+			apply_checkin_counts(event, today(), {ticket_type: 1})
+		mock_publish.assert_called_once()
+
+		# the skipped updates go out with the next scheduled run, with the latest counters
+		publish_pending_checkin_counts()
+		self.assertEqual(mock_publish.call_count, 2)
+		self.assertEqual(self.get_count(mock_publish.call_args.args[1]), 3)
+
+		publish_pending_checkin_counts()
+		self.assertEqual(mock_publish.call_count, 2)
@@ -1,15 +1,23 @@
+from unittest.mock import patch
+
 import frappe
 from frappe.tests import IntegrationTestCase
 
 from buzz.api.forms import (
 	STANDARD_EXCLUDE_FIELDS,
+	add_request_field_data,
+	drain_form_intake,
 	get_custom_form_data,
 	get_form_fields,
+	get_form_intake_stats,
+	get_form_schema_cache_key,
 	get_link_field_options,
 	parse_excluded_fields,
+	search_link_options,
 	submit_custom_form,
 	validate_excluded_fields,
 )
+from buzz.tasks import drain_buffered_form_submissions
 
 # Renderable Talk Proposal fields (after STANDARD_EXCLUDE_FIELDS + auto-set event/submitted_by):
 #   title (reqd, Data), description (Text Editor), speakers (reqd, Table), phone (Phone)
@@ -100,13 +108,17 @@ class TestGetLinkFieldOptions(IntegrationTestCase):
 
 	def test_no_title_field_label_falls_back_to_name(self):
 		# Event Host has no title field -> label mirrors the name.
-		match = next(o for o in get_link_field_options("Event Host") if o["value"] == self.host)
+		match = next(
+			o for o in get_link_field_options("Event Host", txt=self.host) if o["value"] == self.host
+		)
 		self.assertEqual(match["label"], self.host)
 
 	def test_title_field_used_as_label(self):
 		# Sponsorship Tier names are hashes; its title field is the readable label.
 		tier = self.make_tier(title="Gold Tier")
-		match = next(o for o in get_link_field_options("Sponsorship Tier") if o["value"] == tier.name)
+		match = next(
+			o for o in get_link_field_options("Sponsorship Tier", tier.event) if o["value"] == tier.name
+		)
 		self.assertEqual(match["label"], "Gold Tier")
 		self.assertNotEqual(match["value"], match["label"])
 
@@ -114,18 +126,20 @@ class TestGetLinkFieldOptions(IntegrationTestCase):
 		tier = self.make_tier()
 		# Blank the title directly (bypasses the reqd validation) to exercise the fallback.
 		frappe.db.set_value("Sponsorship Tier", tier.name, "title", "")
-		match = next(o for o in get_link_field_options("Sponsorship Tier") if o["value"] == tier.name)
+		match = next(
+			o for o in get_link_field_options("Sponsorship Tier", tier.event) if o["value"] == tier.name
+		)
 		self.assertEqual(match["label"], tier.name)
 
 
-class TestCustomFormExcludedFields(IntegrationTestCase):
+class CustomFormTestCase(IntegrationTestCase):
 	@classmethod
 	def setUpClass(cls):
 		super().setUpClass()
 		cls.category = ensure_prompt_named_record("Event Category", "Test Forms Category")
 		cls.host = ensure_prompt_named_record("Event Host", "Test Forms Host")
 
-	def make_event(self, excluded_fields, form_route=None, publish=1):
+	def make_event(self, excluded_fields, form_route=None, publish=1, buffered_intake=0):
 		form_route = form_route or f"propose-{frappe.generate_hash(length=6)}"
 		event = frappe.new_doc("Buzz Event")
 		event.update(
@@ -149,12 +163,15 @@ class TestCustomFormExcludedFields(IntegrationTestCase):
 				"route": form_route,
 				"publish": publish,
 				"excluded_fields": excluded_fields,
+				"buffered_intake": buffered_intake,
 			},
 		)
 		event.insert(ignore_permissions=True)
 		event.reload()
 		return event, form_route
 
+
+class TestCustomFormExcludedFields(CustomFormTestCase):
 	def test_get_custom_form_data_hides_excluded_fields(self):
 		event, form_route = self.make_event("phone")
 		data = get_custom_form_data(event.route, form_route)
@@ -192,6 +209,159 @@ class TestCustomFormExcludedFields(IntegrationTestCase):
 		self.assertEqual(created.speakers[0].email, "jane@example.com")
 
 
+class TestCustomFormSchemaCache(CustomFormTestCase):
+	def get_rendered_fieldnames(self, event, form_route):
+		data = get_custom_form_data(event.route, form_route)
+		return {f["fieldname"] for f in data["form_fields"]}, {f["fieldname"] for f in data["custom_fields"]}
+
+	def test_schema_is_cached_per_event_and_form(self):
+		event, form_route = self.make_event("phone")
+		cache_key = get_form_schema_cache_key(event.name, form_route)
+		frappe.cache.delete_value(cache_key)
+
+		get_custom_form_data(event.route, form_route)
+
+		self.assertEqual(frappe.cache.get_value(cache_key)["form_doctype"], "Talk Proposal")
+
+	def test_editing_form_row_invalidates_schema(self):
+		event, form_route = self.make_event("phone")
+		self.assertNotIn("phone", self.get_rendered_fieldnames(event, form_route)[0])
+
+		event.custom_forms[0].excluded_fields = ""
+		event.save(ignore_permissions=True)
+
+		self.assertIn("phone", self.get_rendered_fieldnames(event, form_route)[0])
+
+	def test_custom_field_change_invalidates_schema(self):
+		event, form_route = self.make_event("")
+		self.assertFalse(self.get_rendered_fieldnames(event, form_route)[1])
+
+		custom_field = frappe.get_doc(
+			{
+				"doctype": "Buzz Custom Field",
+				"event": event.name,
+				"label": "T-Shirt Size",
+				"fieldname": "tshirt_size",
+				"fieldtype": "Data",
+				"applied_to": "Custom Form",
+				"custom_form_doctype": "Talk Proposal",
+				"enabled": 1,
+			}
+		).insert(ignore_permissions=True)
+		self.assertEqual(self.get_rendered_fieldnames(event, form_route)[1], {"tshirt_size"})
+
+		custom_field.enabled = 0
+		custom_field.save(ignore_permissions=True)
+		self.assertFalse(self.get_rendered_fieldnames(event, form_route)[1])
+
+	def test_date_defaults_are_resolved_per_request(self):
+		cached_fields = [{"fieldname": "session_date", "fieldtype": "Date", "default": "Today"}]
+
+		with patch("buzz.api.forms.today", return_value="2030-01-02"):
+			fields = add_request_field_data(cached_fields, event=None)
+
+		self.assertEqual(fields[0]["default"], "2030-01-02")
+		# the cached schema keeps the raw default for the next request
+		self.assertEqual(cached_fields[0]["default"], "Today")
+
+	def test_submit_validates_against_cached_schema(self):
+		event, form_route = self.make_event("phone")
+		get_custom_form_data(event.route, form_route)
+
+		# a stale schema would still drop phone, the event row is the source of truth
+		event.custom_forms[0].excluded_fields = ""
+		event.save(ignore_permissions=True)
+		submit_custom_form(
+			event.route,
+			form_route,
+			data={
+				"title": "Cached Schema Test",
+				"description": "<p>desc</p>",
+				"speakers": [{"first_name": "Jane", "email": "jane@example.com"}],
+				"phone": "+919999999999",
+			},
+		)
+
+		created = frappe.get_last_doc("Talk Proposal", filters={"title": "Cached Schema Test"})
+		self.assertEqual(created.phone, "+919999999999")
+
+
+@patch("frappe.enqueue")
+class TestBufferedFormIntake(CustomFormTestCase):
+	def submit(self, event, form_route, title, **data):
+		submit_custom_form(
+			event.route,
+			form_route,
+			data={
+				"title": title,
+				"speakers": [{"first_name": "Jane", "email": "jane@example.com"}],
+				**data,
+			},
+		)
+
+	def test_submissions_are_inserted_by_the_drain_job(self, mock_enqueue):
+		event, form_route = self.make_event("", buffered_intake=1)
+		title = f"Buffered {frappe.generate_hash(length=6)}"
+
+		self.submit(event, form_route, title, phone="+919999999999")
+
+		self.assertFalse(frappe.db.exists("Talk Proposal", {"title": title}))
+		self.assertEqual(get_form_intake_stats(event.name, form_route)["pending"], 1)
+		mock_enqueue.assert_called_once()
+
+		with patch.object(frappe.db, "commit"):
+			summary = drain_form_intake(event.name, form_route)
+
+		self.assertEqual(summary.inserted, 1)
+		created = frappe.get_last_doc("Talk Proposal", filters={"title": title})
+		self.assertEqual(str(created.event), str(event.name))
+		self.assertEqual(created.phone, "+919999999999")
+		self.assertEqual(created.owner, frappe.session.user)
+
+		stats = get_form_intake_stats(event.name, form_route)
+		self.assertEqual(stats["pending"], 0)
+		self.assertEqual(sum(minute.get("inserted", 0) for minute in stats["throughput"]), 1)
+
+	def test_missing_mandatory_field_is_rejected_before_buffering(self, mock_enqueue):
+		event, form_route = self.make_event("", buffered_intake=1)
+
+		with self.assertRaises(frappe.MandatoryError):
+			submit_custom_form(event.route, form_route, data={"title": "No Speakers"})
+
+		self.assertEqual(get_form_intake_stats(event.name, form_route)["pending"], 0)
+
+	def test_full_buffer_refuses_submissions(self, mock_enqueue):
+		event, form_route = self.make_event("", buffered_intake=1)
+
+		with patch("buzz.api.forms.FORM_INTAKE_MAX_PENDING", 1):
+			self.submit(event, form_route, "First")
+			with self.assertRaises(frappe.TooManyRequestsError):
+				self.submit(event, form_route, "Second")
+
+		with patch.object(frappe.db, "commit"):
+			drain_form_intake(event.name, form_route)
+
+	def test_scheduler_only_drains_forms_with_pending_submissions(self, mock_enqueue):
+		event, form_route = self.make_event("", buffered_intake=1)
+
+		drain_buffered_form_submissions()
+		self.assertNotIn(
+			f"buzz:drain_form_intake:{event.name}:{form_route}",
+			[call.kwargs.get("job_id") for call in mock_enqueue.call_args_list],
+		)
+
+		self.submit(event, form_route, f"Pending {frappe.generate_hash(length=6)}")
+		mock_enqueue.reset_mock()
+		drain_buffered_form_submissions()
+		self.assertIn(
+			f"buzz:drain_form_intake:{event.name}:{form_route}",
+			[call.kwargs.get("job_id") for call in mock_enqueue.call_args_list],
+		)
+
+		with patch.object(frappe.db, "commit"):
+			drain_form_intake(event.name, form_route)
+
+
 class TestCustomFormLinkEventFilter(IntegrationTestCase):
 	@classmethod
 	def setUpClass(cls):
@@ -248,6 +418,26 @@ class TestCustomFormLinkEventFilter(IntegrationTestCase):
 		country_field = next(f for f in data["form_fields"] if f["fieldname"] == "country")
 		self.assertTrue(len(country_field["link_options"]) > 1)
 
+	def test_large_link_targets_are_searched_instead_of_inlined(self):
+		event_a, route_a = self.make_sponsorship_event()
+		event_b, _ = self.make_sponsorship_event()
+		tier_a = self.make_tier(event_a.name, "Platinum A")
+		self.make_tier(event_b.name, "Platinum B")
+
+		with patch("buzz.api.forms.LINK_OPTIONS_INLINE_LIMIT", 0):
+			data = get_custom_form_data(event_a.route, route_a)
+		tier_field = next(f for f in data["form_fields"] if f["fieldname"] == "tier")
+		self.assertEqual(tier_field["link_options"], [])
+		self.assertTrue(tier_field["link_search"])
+
+		options = search_link_options("tier", "plat", event_route=event_a.route, form_route=route_a)
+		self.assertEqual([option["value"] for option in options], [tier_a])
+
+	def test_search_only_covers_rendered_link_fields(self):
+		event_a, route_a = self.make_sponsorship_event()
+		with self.assertRaises(frappe.PermissionError):
+			search_link_options("event", event_route=event_a.route, form_route=route_a)
+
 
 class TestValidateExcludedFields(IntegrationTestCase):
 	def test_hiding_mandatory_field_throws(self):
@@ -0,0 +1,68 @@
+import json
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import set_request
+
+from buzz.api import clear_translation_bundles, get_translation_bundle, get_translation_hash, translations
+
+
+class TestTranslationBundles(IntegrationTestCase):
+	def setUp(self):
+		clear_translation_bundles()
+
+	def tearDown(self):
+		clear_translation_bundles()
+
+	def test_hash_changes_with_translations(self):
+		old_hash = get_translation_hash("de")
+
+		frappe.get_doc(
+			{
+				"doctype": "Translation",
+				"language": "de",
+				"source_text": "Buzz translation bundle test",
+				"translated_text": "Buzz Übersetzungspaket Test",
+			}
+		).insert()
+
+		self.assertNotEqual(get_translation_hash("de"), old_hash)
+		content = json.loads(get_translation_bundle("de")["content"])
+		self.assertEqual(content["Buzz translation bundle test"], "Buzz Übersetzungspaket Test")
+
+	def test_bundle_with_current_hash_is_cached_for_good(self):
+		bundle_hash = get_translation_hash("de")
+		set_request(method="GET", path="/api/method/buzz.api.translations")
+
+		response = translations("de", v=bundle_hash)
+
+		self.assertEqual(response.get_etag()[0], bundle_hash)
+		self.assertTrue(response.cache_control.immutable)
+		self.assertTrue(response.cache_control.public)
+
+		stale = translations("de", v="outdated")
+		self.assertTrue(stale.cache_control.no_cache)
+
+	def test_matching_etag_is_not_modified(self):
+		bundle_hash = get_translation_hash("de")
+		set_request(
+			method="GET",
+			path="/api/method/buzz.api.translations",
+			headers={"If-None-Match": f'"{bundle_hash}"'},
+		)
+
+		self.assertEqual(translations("de", v=bundle_hash).status_code, 304)
+
+	def test_gzip_response_has_its_own_etag(self):
+		bundle_hash = get_translation_hash("de")
+		set_request(
+			method="GET",
+			path="/api/method/buzz.api.translations",
+			headers={"Accept-Encoding": "gzip", "If-None-Match": f'"{bundle_hash}"'},
+		)
+
+		response = translations("de", v=bundle_hash)
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.content_encoding, "gzip")
+		self.assertEqual(response.get_etag()[0], f"{bundle_hash}-gz")
@@ -348,6 +348,20 @@ frappe.ui.form.on("Buzz Event", {
 			);
 		}
 
+		if (!frm.is_new() && frm.doc.send_ticket_email) {
+			frm.add_custom_button(
+				__("Resend Ticket Emails"),
+				function () {
+					frappe.confirm(__("Send the ticket email again to every attendee of this event?"), () => {
+						frm.call("resend_ticket_emails").then(() => {
+							frappe.show_alert(__("Ticket emails are being sent in the background"));
+						});
+					});
+				},
+				__("Actions")
+			);
+		}
+
 		frm.trigger("add_zoom_custom_actions");
 	},
 
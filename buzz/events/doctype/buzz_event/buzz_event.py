@@ -8,7 +8,7 @@ from frappe.model.naming import append_number_if_name_exists
 from frappe.utils.data import get_time, time_diff_in_seconds
 
 from buzz.api.forms import validate_excluded_fields
-from buzz.utils import only_if_app_installed
+from buzz.utils import clear_ics_cache, only_if_app_installed
 
 
 class BuzzEvent(Document):
@@ -203,8 +203,23 @@ class BuzzEvent(Document):
 
 		return zoom_webinar
 
+	@frappe.whitelist()
+	def resend_ticket_emails(self):
+		self.check_permission("write")
+		if not self.send_ticket_email:
+			frappe.throw(frappe._("Ticket emails are disabled for this event"))
+
+		frappe.enqueue(
+			"buzz.ticketing.doctype.event_ticket.event_ticket.send_event_ticket_emails",
+			queue="long",
+			job_id=f"buzz:send_event_ticket_emails:{self.name}",
+			deduplicate=True,
+			event=self.name,
+		)
+
 	def on_update(self):
 		self.update_zoom_webinar()
+		clear_ics_cache([self.name])
 
 	@only_if_app_installed("zoom_integration")
 	def update_zoom_webinar(self):
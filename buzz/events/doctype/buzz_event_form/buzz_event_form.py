@@ -13,6 +13,7 @@ class BuzzEventForm(Document):
 		from frappe.types import DF
 
 		auto_close_at: DF.Datetime | None
+		buffered_intake: DF.Check
 		closed_message: DF.SmallText | None
 		closed_title: DF.Data | None
 		form_doctype: DF.Link
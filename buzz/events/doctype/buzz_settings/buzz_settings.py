@@ -15,6 +15,7 @@ class BuzzSettings(Document):
 	if TYPE_CHECKING:
 		from frappe.types import DF
 
+		abandoned_booking_retention_days: DF.Int
 		accept_event_proposals: DF.Check
 		allow_add_ons_change_before_event_start_days: DF.Int
 		allow_guest_event_proposals: DF.Check
@@ -29,7 +30,10 @@ class BuzzSettings(Document):
 		event_proposal_success_message: DF.MarkdownEditor | None
 		event_proposal_success_title: DF.Data | None
 		login_banner: DF.MarkdownEditor | None
+		qr_code_style: DF.Literal["Styled", "Plain", "SVG"]
+		render_ticket_qr_code_on_view: DF.Check
 		support_email: DF.Data | None
+		ticket_hold_minutes: DF.Int
 	# end: auto-generated types
 
 	def validate(self):
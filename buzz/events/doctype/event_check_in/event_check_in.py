@@ -1,8 +1,19 @@
 # Copyright (c) 2025, BWH Studios and contributors
 # For license information, please see license.txt
 
+import json
+from functools import partial
+
 import frappe
 from frappe.model.document import Document
+from frappe.utils import cint, getdate
+
+# live counters are kept for a few days, they are rebuilt from the database when missing
+CHECKIN_COUNTS_TTL = 3 * 24 * 60 * 60
+# lobby screens get at most one immediate update per event and day in this many seconds
+CHECKIN_COUNTS_PUBLISH_INTERVAL = 2
+TOTAL_FIELD = "total"
+VERSION_FIELD = "version"
 
 
 class EventCheckIn(Document):
@@ -15,6 +26,7 @@ class EventCheckIn(Document):
 		from frappe.types import DF
 
 		amended_from: DF.Link | None
+		checkin_key: DF.Data | None
 		date: DF.Date | None
 		event: DF.Link
 		ticket: DF.Link
@@ -23,3 +35,147 @@ class EventCheckIn(Document):
 	def before_insert(self):
 		if not self.date:
 			self.date = frappe.utils.today()
+
+	def before_submit(self):
+		# unique, submitting a second check in of the same ticket on the same day fails
+		self.checkin_key = get_checkin_key(self.ticket, self.date)
+
+	def on_submit(self):
+		update_checkin_counts(self.event, self.date, {self.get_ticket_type(): 1})
+
+	def on_cancel(self):
+		self.db_set("checkin_key", None)
+		update_checkin_counts(self.event, self.date, {self.get_ticket_type(): -1})
+
+	def get_ticket_type(self) -> str | None:
+		return frappe.get_cached_value("Event Ticket", self.ticket, "ticket_type")
+
+
+def get_checkin_key(ticket: str, date) -> str:
+	return f"{ticket}:{frappe.utils.getdate(date)}"
+
+
+def run_redis_command(command: str, *args, **kwargs):
+	# plain redis command on an already prefixed key, `frappe.cache` overrides some of them to pickle values
+	pipeline = frappe.cache.pipeline()
+	getattr(pipeline, command)(*args, **kwargs)
+	return pipeline.execute()[0]
+
+
+def get_checkin_counts_key(event: str, date) -> str:
+	return frappe.cache.make_key(f"buzz:checkin_counts:{event}:{getdate(date)}")
+
+
+def update_checkin_counts(event: str, date, ticket_types: dict) -> None:
+	"""Adjust the live check in counters of an event day once the current transaction commits.
+
+	`ticket_types` maps ticket type to the change in check ins.
+	"""
+	frappe.db.after_commit.add(partial(apply_checkin_counts, event, str(getdate(date)), ticket_types))
+
+
+def apply_checkin_counts(event: str, date: str, ticket_types: dict) -> None:
+	key = get_checkin_counts_key(event, date)
+
+	if run_redis_command("exists", key):
+		pipeline = frappe.cache.pipeline()
+		for ticket_type, delta in ticket_types.items():
+			pipeline.hincrby(key, str(ticket_type), delta)
+		pipeline.hincrby(key, TOTAL_FIELD, sum(ticket_types.values()))
+		pipeline.hincrby(key, VERSION_FIELD, 1)
+		pipeline.expire(key, CHECKIN_COUNTS_TTL)
+		pipeline.execute()
+	else:
+		# the committed check ins are already part of the recount
+		seed_checkin_counts(event, date)
+
+	throttle_checkin_counts_publish(event, date)
+
+
+def throttle_checkin_counts_publish(event: str, date: str) -> None:
+	"""Push the counters right away unless they were pushed in the last `CHECKIN_COUNTS_PUBLISH_INTERVAL`.
+
+	A skipped update is marked pending, the next check in after the interval or
+	`publish_pending_checkin_counts` sends the latest counters instead.
+	"""
+	published_key = frappe.cache.make_key(f"buzz:checkin_counts_published:{event}:{getdate(date)}")
+	if run_redis_command("set", published_key, 1, nx=True, ex=CHECKIN_COUNTS_PUBLISH_INTERVAL):
+		publish_checkin_counts(event, date)
+	else:
+		run_redis_command("sadd", get_pending_checkin_counts_key(), json.dumps([event, str(getdate(date))]))
+
+
+def seed_checkin_counts(event: str, date) -> dict:
+	from frappe.query_builder.functions import Count
+
+	EventCheckIn = frappe.qb.DocType("Event Check In")
+	EventTicket = frappe.qb.DocType("Event Ticket")
+
+	rows = (
+		frappe.qb.from_(EventCheckIn)
+		.join(EventTicket)
+		.on(EventTicket.name == EventCheckIn.ticket)
+		.select(EventTicket.ticket_type, Count(EventCheckIn.name))
+		.where(EventCheckIn.event == event)
+		.where(EventCheckIn.date == getdate(date))
+		.where(EventCheckIn.docstatus == 1)
+		.groupby(EventTicket.ticket_type)
+	).run()
+
+	counts = {str(ticket_type): count for ticket_type, count in rows}
+	counts[TOTAL_FIELD] = sum(counts.values())
+
+	key = get_checkin_counts_key(event, date)
+	pipeline = frappe.cache.pipeline()
+	pipeline.hset(key, mapping=counts)
+	pipeline.hincrby(key, VERSION_FIELD, 1)
+	pipeline.expire(key, CHECKIN_COUNTS_TTL)
+	pipeline.execute()
+
+	return get_checkin_counts(event, date)
+
+
+def get_checkin_counts(event: str, date) -> dict:
+	"""Check in totals of an event day by ticket type, read from Redis."""
+	raw_counts = run_redis_command("hgetall", get_checkin_counts_key(event, date))
+	if not raw_counts:
+		return seed_checkin_counts(event, date)
+
+	counts = {frappe.safe_decode(field): cint(value) for field, value in raw_counts.items()}
+	version = counts.pop(VERSION_FIELD, 0)
+	total = counts.pop(TOTAL_FIELD, 0)
+
+	return {
+		"event": event,
+		"date": str(getdate(date)),
+		"total": total,
+		"version": version,
+		"by_ticket_type": [
+			{
+				"ticket_type": ticket_type,
+				"title": frappe.get_cached_value("Event Ticket Type", ticket_type, "title") or ticket_type,
+				"count": count,
+			}
+			for ticket_type, count in counts.items()
+			if count
+		],
+	}
+
+
+def publish_checkin_counts(event: str, date: str) -> None:
+	"""Push the counters to everyone subscribed to the event."""
+	run_redis_command("srem", get_pending_checkin_counts_key(), json.dumps([event, str(getdate(date))]))
+	frappe.publish_realtime(
+		"checkin_counts_updated", get_checkin_counts(event, date), doctype="Buzz Event", docname=event
+	)
+
+
+def publish_pending_checkin_counts() -> None:
+	"""Send the updates that were throttled and not followed by another check in."""
+	for member in run_redis_command("spop", get_pending_checkin_counts_key(), 1000) or []:
+		event, date = json.loads(frappe.safe_decode(member))
+		publish_checkin_counts(event, date)
+
+
+def get_pending_checkin_counts_key() -> str:
+	return frappe.cache.make_key("buzz:checkin_counts_pending")
@@ -6,6 +6,8 @@ import re
 import frappe
 from frappe.model.document import Document
 
+from buzz.utils import clear_ics_cache
+
 
 class EventVenue(Document):
 	# begin: auto-generated types
@@ -27,6 +29,10 @@ class EventVenue(Document):
 		self.set_geojson_for_location()
 		self.remove_fixed_dimensions_from_google_map_embed()
 
+	def on_update(self):
+		if self.has_value_changed("address"):
+			clear_ics_cache(frappe.get_all("Buzz Event", filters={"venue": self.name}, pluck="name"))
+
 	def remove_fixed_dimensions_from_google_map_embed(self):
 		if not self.google_maps_embed_code:
 			return
@@ -10,5 +10,10 @@ frappe.query_reports["Event Attendance Summary"] = {
 			options: "Buzz Event",
 			reqd: 1,
 		},
+		{
+			fieldname: "include_no_shows",
+			label: __("Include No Shows"),
+			fieldtype: "Check",
+		},
 	],
 };
@@ -3,6 +3,7 @@
 
 import frappe
 from frappe import _
+from frappe.query_builder.functions import Count
 from frappe.utils import formatdate
 
 
@@ -17,30 +18,35 @@ def execute(filters: dict | None = None):
 	if not event:
 		return [], []
 
-	# Get all unique check-in dates for this event (sorted)
-	check_in_dates = get_check_in_dates(event)
+	include_no_shows = bool(filters.get("include_no_shows"))
+
+	# Attendees per day, also gives the sorted check-in dates
+	daily_counts = get_daily_check_in_counts(event)
+	check_in_dates = [date for date, _count in daily_counts]
+
+	# Days each ticket was checked in as one bitmask per ticket
+	attendance = get_attendance_masks(event, check_in_dates)
 
 	columns = get_columns(check_in_dates)
-	data = get_data(event, check_in_dates)
-	chart = get_chart(data, check_in_dates)
-	report_summary = get_report_summary(data, check_in_dates)
+	data = get_data(event, check_in_dates, include_no_shows, attendance)
+	chart = get_chart(daily_counts)
+	report_summary = get_report_summary(data, daily_counts, attendance)
 
 	return columns, data, None, chart, report_summary
 
 
-def get_check_in_dates(event: str) -> list:
-	"""Get all unique check-in dates for the event, sorted chronologically."""
-	dates = frappe.db.sql(
-		"""
-		SELECT DISTINCT date
-		FROM `tabEvent Check In`
-		WHERE event = %s AND docstatus = 1 AND date IS NOT NULL
-		ORDER BY date ASC
-		""",
-		(event,),
-		as_dict=True,
-	)
-	return [d.date for d in dates]
+def get_daily_check_in_counts(event: str) -> list[tuple]:
+	"""Number of distinct tickets checked in per day, sorted chronologically."""
+	EventCheckIn = frappe.qb.DocType("Event Check In")
+	return (
+		frappe.qb.from_(EventCheckIn)
+		.select(EventCheckIn.date, Count(EventCheckIn.ticket).distinct())
+		.where(EventCheckIn.event == event)
+		.where(EventCheckIn.docstatus == 1)
+		.where(EventCheckIn.date.isnotnull())
+		.groupby(EventCheckIn.date)
+		.orderby(EventCheckIn.date)
+	).run()
 
 
 def get_columns(check_in_dates: list) -> list[dict]:
@@ -92,37 +98,42 @@ def get_columns(check_in_dates: list) -> list[dict]:
 	return columns
 
 
-def get_data(event: str, check_in_dates: list) -> list[dict]:
+def get_data(
+	event: str, check_in_dates: list, include_no_shows: bool = False, attendance: dict | None = None
+) -> list[dict]:
 	"""Return data for the report.
 
-	Shows each ticket with check-in status for each day.
+	Shows each ticket with check-in status for each day, tickets that were never
+	checked in are only included with `include_no_shows`.
 	"""
-	# Get all check-ins for this event
-	check_ins = frappe.get_all(
-		"Event Check In",
-		filters={"event": event, "docstatus": 1},
-		fields=["ticket", "date"],
-	)
+	if attendance is None:
+		attendance = get_attendance_masks(event, check_in_dates)
 
-	if not check_ins:
+	if not attendance and not include_no_shows:
 		return []
 
-	# Build a map of ticket -> set of dates checked in
-	ticket_dates = {}
-	for ci in check_ins:
-		if ci.ticket not in ticket_dates:
-			ticket_dates[ci.ticket] = set()
-		if ci.date:
-			ticket_dates[ci.ticket].add(ci.date)
-
-	# Get ticket details
-	tickets = frappe.get_all(
-		"Event Ticket",
-		filters={"name": ["in", list(ticket_dates.keys())]},
-		fields=["name", "attendee_name", "attendee_email", "ticket_type"],
+	EventTicket = frappe.qb.DocType("Event Ticket")
+	EventCheckIn = frappe.qb.DocType("Event Check In")
+	checked_in_tickets = (
+		frappe.qb.from_(EventCheckIn)
+		.select(EventCheckIn.ticket)
+		.where(EventCheckIn.event == event)
+		.where(EventCheckIn.docstatus == 1)
 	)
+	condition = EventTicket.name.isin(checked_in_tickets)
+	if include_no_shows:
+		condition = ((EventTicket.event == event) & (EventTicket.docstatus == 1)) | condition
+
+	tickets = (
+		frappe.qb.from_(EventTicket)
+		.select(
+			EventTicket.name, EventTicket.attendee_name, EventTicket.attendee_email, EventTicket.ticket_type
+		)
+		.where(condition)
+	).run(as_dict=True)
 
 	# Build the data rows
+	day_columns = [(f"day_{i}", 1 << i) for i in range(len(check_in_dates))]
 	data = []
 	for ticket in tickets:
 		row = {
@@ -133,9 +144,9 @@ def get_data(event: str, check_in_dates: list) -> list[dict]:
 		}
 
 		# Add check-in status for each date (1 or 0 for Check fieldtype)
-		checked_in_dates = ticket_dates.get(ticket.name, set())
-		for i, date in enumerate(check_in_dates):
-			row[f"day_{i}"] = 1 if date in checked_in_dates else 0
+		mask = attendance.get(ticket.name, 0)
+		for fieldname, bit in day_columns:
+			row[fieldname] = 1 if mask & bit else 0
 
 		data.append(row)
 
@@ -145,50 +156,56 @@ def get_data(event: str, check_in_dates: list) -> list[dict]:
 	return data
 
 
-def get_chart(data: list[dict], check_in_dates: list) -> dict:
-	"""Return chart data showing attendance per day."""
-	if not data or not check_in_dates:
-		return {}
+def get_attendance_masks(event: str, check_in_dates: list) -> dict[str, int]:
+	"""Map of ticket to a bitmask of the days it was checked in, bit i is `check_in_dates[i]`."""
+	day_bits = {date: 1 << i for i, date in enumerate(check_in_dates)}
 
-	labels = []
-	values = []
+	EventCheckIn = frappe.qb.DocType("Event Check In")
+	attendance = {}
+	for ticket, date in (
+		frappe.qb.from_(EventCheckIn)
+		.select(EventCheckIn.ticket, EventCheckIn.date)
+		.distinct()
+		.where(EventCheckIn.event == event)
+		.where(EventCheckIn.docstatus == 1)
+	).run():
+		attendance[ticket] = attendance.get(ticket, 0) | day_bits.get(date, 0)
 
-	for i, date in enumerate(check_in_dates):
-		labels.append(formatdate(date, "d MMM"))
-		day_count = sum(1 for row in data if row.get(f"day_{i}") == 1)
-		values.append(day_count)
+	return attendance
+
+
+def get_chart(daily_counts: list[tuple]) -> dict:
+	"""Return chart data showing attendance per day."""
+	if not daily_counts:
+		return {}
 
 	return {
 		"data": {
-			"labels": labels,
-			"datasets": [{"name": _("Attendees"), "values": values}],
+			"labels": [formatdate(date, "d MMM") for date, _count in daily_counts],
+			"datasets": [{"name": _("Attendees"), "values": [count for _date, count in daily_counts]}],
 		},
 		"type": "bar",
 		"colors": ["#4F46E5"],
 	}
 
 
-def get_report_summary(data: list[dict], check_in_dates: list) -> list[dict]:
+def get_report_summary(data: list[dict], daily_counts: list[tuple], attendance: dict) -> list[dict]:
 	"""Return report summary with attendance counts per day and total unique attendees."""
 	if not data:
 		return []
 
-	summary = []
-
-	# Count attendance for each day
-	for i, date in enumerate(check_in_dates):
-		day_count = sum(1 for row in data if row.get(f"day_{i}") == 1)
-		summary.append(
-			{
-				"value": day_count,
-				"label": formatdate(date, "d MMM YYYY"),
-				"datatype": "Int",
-				"indicator": "blue",
-			}
-		)
+	summary = [
+		{
+			"value": count,
+			"label": formatdate(date, "d MMM YYYY"),
+			"datatype": "Int",
+			"indicator": "blue",
+		}
+		for date, count in daily_counts
+	]
 
 	# Total unique attendees (anyone who attended at least one day)
-	total_unique = len(data)
+	total_unique = sum(1 for row in data if row["ticket"] in attendance)
 	summary.append(
 		{
 			"value": total_unique,
@@ -198,4 +215,14 @@ def get_report_summary(data: list[dict], check_in_dates: list) -> list[dict]:
 		}
 	)
 
+	if total_unique < len(data):
+		summary.append(
+			{
+				"value": len(data) - total_unique,
+				"label": _("No Shows"),
+				"datatype": "Int",
+				"indicator": "red",
+			}
+		)
+
 	return summary
@@ -0,0 +1,120 @@
+# Copyright (c) 2025, BWH Studios and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, getdate, today
+
+from buzz.events.report.event_attendance_summary.event_attendance_summary import execute
+
+
+class TestEventAttendanceSummary(IntegrationTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.event = self.make_event()
+		self.ticket_type = frappe.get_doc(
+			{
+				"doctype": "Event Ticket Type",
+				"event": self.event.name,
+				"title": "Attendance (Test)",
+				"price": 0,
+			}
+		).insert()
+		self.day_1 = getdate(add_days(today(), -1))
+		self.day_2 = getdate(today())
+
+	def make_event(self):
+		if not frappe.db.exists("Event Category", "Test Category"):
+			frappe.get_doc({"doctype": "Event Category", "category_name": "Test Category"}).insert()
+
+		if not frappe.db.exists("Event Host", "Test Host"):
+			frappe.get_doc({"doctype": "Event Host", "host_name": "Test Host"}).insert()
+
+		return frappe.get_doc(
+			{
+				"doctype": "Buzz Event",
+				"title": "Attendance Summary Test Event",
+				"route": f"attendance-summary-{frappe.generate_hash(length=6)}",
+				"category": "Test Category",
+				"host": "Test Host",
+				"start_date": add_days(today(), -1),
+				"end_date": today(),
+				"start_time": "10:00:00",
+				"end_time": "18:00:00",
+				"medium": "Online",
+				"apply_tax": False,
+			}
+		).insert()
+
+	def make_ticket(self, attendee_name):
+		return (
+			frappe.get_doc(
+				{
+					"doctype": "Event Ticket",
+					"event": self.event.name,
+					"ticket_type": self.ticket_type.name,
+					"attendee_name": attendee_name,
+					"attendee_email": f"{frappe.scrub(attendee_name)}@example.com",
+				}
+			)
+			.insert()
+			.submit()
+		)
+
+	def check_in(self, ticket, date):
+		return (
+			frappe.get_doc({"doctype": "Event Check In", "ticket": ticket.name, "date": date})
+			.insert()
+			.submit()
+		)
+
+	def get_rows(self, include_no_shows=False):
+		columns, data, _message, chart, summary = execute(
+			{"event": self.event.name, "include_no_shows": include_no_shows}
+		)
+		return columns, {row["ticket"]: row for row in data}, chart, summary
+
+	def test_rows_show_check_ins_per_day(self):
+		both_days = self.make_ticket("Both Days")
+		second_day = self.make_ticket("Second Day")
+		self.check_in(both_days, self.day_1)
+		self.check_in(both_days, self.day_2)
+		self.check_in(second_day, self.day_2)
+
+		columns, rows, chart, summary = self.get_rows()
+
+		self.assertEqual([column["fieldname"] for column in columns[-2:]], ["day_0", "day_1"])
+		self.assertEqual(set(rows), {both_days.name, second_day.name})
+		self.assertEqual((rows[both_days.name]["day_0"], rows[both_days.name]["day_1"]), (1, 1))
+		self.assertEqual((rows[second_day.name]["day_0"], rows[second_day.name]["day_1"]), (0, 1))
+		self.assertEqual(chart["data"]["datasets"][0]["values"], [1, 2])
+
+		totals = {row["label"]: row["value"] for row in summary}
+		self.assertEqual(totals[frappe._("Total Unique Attendees")], 2)
+		self.assertNotIn(frappe._("No Shows"), totals)
+
+	def test_no_shows_are_listed_on_request(self):
+		attended = self.make_ticket("Attended")
+		no_show = self.make_ticket("No Show")
+		cancelled = self.make_ticket("Cancelled Ticket")
+		cancelled.cancel()
+		self.check_in(attended, self.day_1)
+
+		_columns, rows, _chart, _summary = self.get_rows()
+		self.assertEqual(set(rows), {attended.name})
+
+		_columns, rows, _chart, summary = self.get_rows(include_no_shows=True)
+		self.assertEqual(set(rows), {attended.name, no_show.name})
+		self.assertEqual(rows[no_show.name]["day_0"], 0)
+
+		totals = {row["label"]: row["value"] for row in summary}
+		self.assertEqual(totals[frappe._("No Shows")], 1)
+
+	def test_cancelled_check_ins_are_ignored(self):
+		ticket = self.make_ticket("Cancelled Check In")
+		self.check_in(ticket, self.day_1).cancel()
+
+		_columns, rows, chart, _summary = self.get_rows()
+
+		self.assertEqual(rows, {})
+		self.assertEqual(chart, {})
@@ -3,6 +3,8 @@
 
 import frappe
 from frappe import _
+from frappe.query_builder.functions import Count, Sum
+from frappe.utils import cint
 
 
 def execute(filters: dict | None = None):
@@ -47,45 +49,65 @@ def get_data(filters: dict) -> list[dict]:
 	The report data is a list of rows, with each row being a list of cell values.
 	"""
 	event = filters.get("event")
+	events = [event] if event else frappe.db.get_all("Buzz Event", pluck="name")
 
-	if event:
-		return [get_summary_for_event(event)]
+	num_tickets_sold = get_tickets_sold_by_event(event)
+	num_add_ons_sold = get_add_ons_sold_by_event(event)
+	sales = get_sales_by_event(event)
+
+	return [
+		{
+			"event": event,
+			"num_tickets_sold": num_tickets_sold.get(str(event), 0),
+			"num_add_ons_sold": num_add_ons_sold.get(str(event), 0),
+			"sales": sales.get(str(event)),
+		}
+		for event in events
+	]
 
-	data = []
-	events = frappe.db.get_all("Buzz Event", pluck="name")
-	for event in events:
-		summary = get_summary_for_event(event)
-		summary["event"] = event
-		data.append(summary)
 
-	return data
+def get_tickets_sold_by_event(event: str | None = None) -> dict:
+	# materialized on the ticket types, kept up to date as tickets are submitted and cancelled
+	EventTicketType = frappe.qb.DocType("Event Ticket Type")
+	query = (
+		frappe.qb.from_(EventTicketType)
+		.select(EventTicketType.event, Sum(EventTicketType.tickets_sold))
+		.groupby(EventTicketType.event)
+	)
+	if event:
+		query = query.where(EventTicketType.event == event)
+
+	return {str(row[0]): cint(row[1]) for row in query.run()}
+
+
+def get_add_ons_sold_by_event(event: str | None = None) -> dict:
+	EventTicket = frappe.qb.DocType("Event Ticket")
+	TicketAddOnValue = frappe.qb.DocType("Ticket Add-on Value")
+	query = (
+		frappe.qb.from_(TicketAddOnValue)
+		.join(EventTicket)
+		.on(EventTicket.name == TicketAddOnValue.parent)
+		.select(EventTicket.event, Count("*"))
+		.where(TicketAddOnValue.parenttype == "Event Ticket")
+		.where(TicketAddOnValue.parentfield == "add_ons")
+		.where(EventTicket.docstatus == 1)
+		.groupby(EventTicket.event)
+	)
+	if event:
+		query = query.where(EventTicket.event == event)
 
+	return {str(row[0]): row[1] for row in query.run()}
 
-def get_summary_for_event(event: str) -> dict:
-	"""Return summary data for the event.
 
-	This function is used to get a summary of the event, such as total tickets sold,
-	total add-ons sold, and total sales.
-	"""
-	event_tickets = frappe.db.get_all("Event Ticket", filters={"event": event, "docstatus": 1}, pluck="name")
-	num_tickets_sold = len(event_tickets)
-	sales = frappe.db.get_all(
-		"Event Booking",
-		filters={"docstatus": 1, "event": event},
-		fields=[{"SUM": "total_amount", "as": "sales"}],
-		pluck="sales",
-	)[0]
-
-	num_add_ons_sold = frappe.db.get_all(
-		"Ticket Add-on Value",
-		filters={"parenttype": "Event Ticket", "parentfield": "add_ons", "parent": ["in", event_tickets]},
-		fields=[{"COUNT": "*", "as": "num_add_ons_sold"}],
-		pluck="num_add_ons_sold",
-	)[0]
-
-	return {
-		"event": event,
-		"num_tickets_sold": num_tickets_sold,
-		"num_add_ons_sold": num_add_ons_sold,
-		"sales": sales,
-	}
+def get_sales_by_event(event: str | None = None) -> dict:
+	EventBooking = frappe.qb.DocType("Event Booking")
+	query = (
+		frappe.qb.from_(EventBooking)
+		.select(EventBooking.event, Sum(EventBooking.total_amount))
+		.where(EventBooking.docstatus == 1)
+		.groupby(EventBooking.event)
+	)
+	if event:
+		query = query.where(EventBooking.event == event)
+
+	return {str(row[0]): row[1] for row in query.run()}
@@ -0,0 +1,85 @@
+# Copyright (c) 2025, BWH Studios and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import today
+
+from buzz.events.report.event_overview.event_overview import execute
+
+
+class TestEventOverview(IntegrationTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.event = self.make_event()
+		self.standard = self.make_ticket_type("Standard (Overview Test)")
+		self.vip = self.make_ticket_type("VIP (Overview Test)")
+
+	def make_event(self):
+		if not frappe.db.exists("Event Category", "Test Category"):
+			frappe.get_doc({"doctype": "Event Category", "category_name": "Test Category"}).insert()
+
+		if not frappe.db.exists("Event Host", "Test Host"):
+			frappe.get_doc({"doctype": "Event Host", "host_name": "Test Host"}).insert()
+
+		return frappe.get_doc(
+			{
+				"doctype": "Buzz Event",
+				"title": "Overview Test Event",
+				"route": f"overview-{frappe.generate_hash(length=6)}",
+				"category": "Test Category",
+				"host": "Test Host",
+				"start_date": today(),
+				"start_time": "10:00:00",
+				"end_time": "18:00:00",
+				"medium": "Online",
+				"apply_tax": False,
+			}
+		).insert()
+
+	def make_ticket_type(self, title):
+		return frappe.get_doc(
+			{"doctype": "Event Ticket Type", "event": self.event.name, "title": title, "price": 0}
+		).insert()
+
+	def make_ticket(self, ticket_type, submit=True):
+		ticket = frappe.get_doc(
+			{
+				"doctype": "Event Ticket",
+				"event": self.event.name,
+				"ticket_type": ticket_type.name,
+				"attendee_name": "Overview Attendee",
+				"attendee_email": "overview@example.com",
+			}
+		).insert()
+		return ticket.submit() if submit else ticket
+
+	def get_tickets_sold(self):
+		_columns, data = execute({"event": self.event.name})
+		self.assertEqual(len(data), 1)
+		return data[0]["num_tickets_sold"]
+
+	def test_tickets_sold_match_submitted_tickets(self):
+		self.assertEqual(self.get_tickets_sold(), 0)
+
+		for _i in range(3):
+			self.make_ticket(self.standard)
+		self.make_ticket(self.vip)
+		self.make_ticket(self.vip).cancel()
+		self.make_ticket(self.standard, submit=False)
+
+		submitted = frappe.db.count("Event Ticket", {"event": self.event.name, "docstatus": 1})
+		self.assertEqual(submitted, 4)
+		self.assertEqual(self.get_tickets_sold(), submitted)
+
+	def test_cancelling_tickets_lowers_the_count(self):
+		tickets = [self.make_ticket(self.standard) for _i in range(2)]
+		self.assertEqual(self.get_tickets_sold(), 2)
+
+		tickets[0].cancel()
+
+		self.assertEqual(self.get_tickets_sold(), 1)
+		self.assertEqual(
+			self.get_tickets_sold(),
+			frappe.db.count("Event Ticket", {"event": self.event.name, "docstatus": 1}),
+		)
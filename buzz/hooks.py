@@ -24,7 +24,28 @@ website_route_rules = [
 # Scheduled Tasks
 # ---------------
 
-scheduler_events = {"daily": ["buzz.tasks.unpublish_ticket_types_after_last_date"]}
+scheduler_events = {
+	"daily": [
+		"buzz.tasks.unpublish_ticket_types_after_last_date",
+		"buzz.tasks.reconcile_ticket_type_counters",
+		"buzz.tasks.reconcile_coupon_usage_counters",
+		"buzz.tasks.clean_up_abandoned_bookings",
+	],
+	"cron": {
+		"* * * * *": [
+			"buzz.tasks.publish_throttled_checkin_counts",
+		],
+		"*/5 * * * *": [
+			"buzz.tasks.release_expired_ticket_holds",
+			"buzz.tasks.retry_pending_ticket_fulfillment",
+			"buzz.tasks.retry_pending_payment_processing",
+			"buzz.tasks.drain_buffered_form_submissions",
+		],
+		"*/15 * * * *": [
+			"buzz.tasks.reconcile_pending_payments",
+		],
+	},
+}
 
 # Testing
 # -------
@@ -37,6 +58,37 @@ doc_events = {
 		"after_insert": "buzz.utils.add_buzz_user_role",
 		"on_update": "buzz.events.doctype.speaker_profile.speaker_profile.update_speaker_display_name",
 	},
+	# event payment gateways are a child table of Buzz Event and are covered by its hook
+	**{
+		doctype: {
+			"on_change": "buzz.api.clear_booking_payload_cache",
+			"on_trash": "buzz.api.clear_booking_payload_cache",
+		}
+		for doctype in (
+			"Event Ticket Type",
+			"Ticket Add-on",
+			"Offline Payment Method",
+		)
+	},
+	**{
+		doctype: {
+			"on_change": ["buzz.api.clear_booking_payload_cache", "buzz.api.forms.clear_form_schema_cache"],
+			"on_trash": ["buzz.api.clear_booking_payload_cache", "buzz.api.forms.clear_form_schema_cache"],
+		}
+		for doctype in ("Buzz Event", "Buzz Custom Field")
+	},
+	"Translation": {
+		"on_change": "buzz.api.clear_translation_bundles",
+		"on_trash": "buzz.api.clear_translation_bundles",
+	},
+	# custom form doctypes can be any doctype, their compiled schemas depend on its meta
+	**{
+		doctype: {
+			"on_change": "buzz.api.forms.clear_form_schema_cache",
+			"on_trash": "buzz.api.forms.clear_form_schema_cache",
+		}
+		for doctype in ("DocType", "Custom Field", "Property Setter")
+	},
 }
 
 fixtures = [{"dt": "Role", "filters": {"name": ["in", ["Buzz User", "Frontdesk Manager"]]}}]
@@ -48,6 +100,8 @@ ignore_links_on_delete = ["Ticket Cancellation Request", "Ticket Add-on Value"]
 
 after_app_install = "buzz.install.after_app_install"
 
+clear_cache = "buzz.api.clear_translation_bundles"
+
 # Each item in the list will be shown as an app in the apps page
 add_to_apps_screen = [
 	{
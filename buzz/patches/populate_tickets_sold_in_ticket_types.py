@@ -0,0 +1,6 @@
+from buzz.ticketing.doctype.event_ticket_type.event_ticket_type import reconcile_tickets_sold
+
+
+def execute():
+	# `tickets_sold` used to be a virtual field computed with COUNT(*), backfill the stored counter
+	reconcile_tickets_sold()
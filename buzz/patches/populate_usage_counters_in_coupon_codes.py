@@ -0,0 +1,6 @@
+from buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code import reconcile_coupon_usage
+
+
+def execute():
+	# `times_used` and `free_tickets_claimed` used to be virtual fields, backfill the stored counters
+	reconcile_coupon_usage()
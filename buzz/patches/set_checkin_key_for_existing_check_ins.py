@@ -0,0 +1,22 @@
+import frappe
+
+from buzz.events.doctype.event_check_in.event_check_in import get_checkin_key
+
+
+def execute():
+	# earlier check ins were deduplicated with an exists check, keep the key on the first one per ticket and day
+	checkins = frappe.get_all(
+		"Event Check In",
+		filters={"docstatus": 1, "checkin_key": ("is", "not set")},
+		fields=["name", "ticket", "date"],
+		order_by="creation asc",
+	)
+
+	seen = set(frappe.get_all("Event Check In", filters={"checkin_key": ("is", "set")}, pluck="checkin_key"))
+	for checkin in checkins:
+		checkin_key = get_checkin_key(checkin.ticket, checkin.date)
+		if checkin_key in seen:
+			continue
+
+		seen.add(checkin_key)
+		frappe.db.set_value("Event Check In", checkin.name, "checkin_key", checkin_key, update_modified=False)
@@ -1,4 +1,7 @@
+import json
+
 import frappe
+from frappe import _
 from payments.utils import get_payment_gateway_controller
 
 
@@ -29,6 +32,8 @@ def get_payment_link_for_booking(
 	booking_id: str, redirect_to: str = "/events", payment_gateway: str | None = None
 ) -> str:
 	booking_doc = frappe.get_cached_doc("Event Booking", booking_id)
+	if booking_doc.status == "Expired":
+		frappe.throw(_("This booking has expired, please book your tickets again"))
 	event_title = frappe.get_cached_value("Buzz Event", booking_doc.event, "title")
 	if not payment_gateway:
 		gateways = get_payment_gateways_for_event(booking_doc.event)
@@ -136,8 +141,55 @@ def mark_payment_as_received(reference_doctype: str, reference_docname: str):
 	if frappe.in_test:
 		return
 
-	import json
+	record_payment_authorization(reference_doctype, reference_docname)
+	frappe.db.commit()
+
+
+def record_payment_authorization(reference_doctype: str, reference_docname: str) -> str | None:
+	"""Mark the latest payment of a document as received and return its `Event Payment` name.
+
+	Gateways repeat their callbacks, so None is returned when the payment was already marked received
+	(or when another `Event Payment` already holds the gateway's payment id, the idempotency key).
+	"""
+	data = get_integration_request_data(reference_doctype, reference_docname)
+	payment = data.get("payment") or frappe.db.get_value(
+		"Event Payment",
+		{"reference_doctype": reference_doctype, "reference_docname": reference_docname},
+		"name",
+		order_by="creation desc",
+	)
+	if not payment:
+		frappe.log_error(
+			title="Payment not found",
+			message=f"No Event Payment to mark as received for {reference_doctype} {reference_docname}",
+		)
+		return None
+
+	# the row lock makes concurrent callbacks for the same payment wait for the first one
+	if frappe.db.get_value("Event Payment", payment, "payment_received", for_update=True):
+		return None
+
+	payment_id = get_gateway_payment_id(data)
+	try:
+		frappe.db.set_value(
+			"Event Payment",
+			payment,
+			{
+				"payment_received": 1,
+				"payment_id": payment_id,
+				"order_id": data.get("order_id"),
+				"idempotency_key": f"{data.payment_gateway}:{payment_id}" if payment_id else None,
+			},
+		)
+	except Exception as e:
+		if not frappe.db.is_unique_key_violation(e):
+			raise
+		return None
+
+	return payment
 
+
+def get_integration_request_data(reference_doctype: str, reference_docname: str) -> frappe._dict:
 	request = frappe.get_all(
 		"Integration Request",
 		{
@@ -147,37 +199,30 @@ def mark_payment_as_received(reference_doctype: str, reference_docname: str):
 		order_by="creation desc",
 		limit=1,
 	)
+	if not request:
+		return frappe._dict()
 
-	if len(request):
-		data = frappe.db.get_value("Integration Request", request[0].name, "data")
-		data = frappe._dict(json.loads(data))
+	data = frappe.db.get_value("Integration Request", request[0].name, "data")
+	return frappe._dict(json.loads(data or "{}"))
 
-		payment_gateway = data.get("payment_gateway")
-		if payment_gateway == "Razorpay":
-			payment_id = "razorpay_payment_id"
 
-		elif payment_gateway == "Paymob":
-			payment_id = "paymob_payment_id"
+def get_gateway_payment_id(data: dict) -> str | None:
+	payment_gateway = data.get("payment_gateway") or ""
+	if payment_gateway == "Razorpay":
+		payment_id = "razorpay_payment_id"
 
-		elif payment_gateway == "PayPal":
-			payment_id = "transaction_id"
+	elif payment_gateway == "Paymob":
+		payment_id = "paymob_payment_id"
 
-		elif "Stripe" in payment_gateway:
-			payment_id = "stripe_token_id"
-		else:
-			payment_id = "order_id"
+	elif payment_gateway == "PayPal":
+		payment_id = "transaction_id"
 
-		frappe.db.set_value(
-			"Event Payment",
-			data.payment,
-			{
-				"payment_received": 1,
-				"payment_id": data.get(payment_id),
-				"order_id": data.get("order_id"),
-			},
-		)
+	elif "Stripe" in payment_gateway:
+		payment_id = "stripe_token_id"
+	else:
+		payment_id = "order_id"
 
-		frappe.db.commit()
+	return data.get(payment_id)
 
 
 # TODO: use it later!
@@ -1,12 +1,126 @@
 import frappe
-from frappe.utils import today
+from frappe.utils import cint, now_datetime, today
+
+from buzz.api import clear_booking_payload_cache_for_events
+from buzz.api.forms import enqueue_form_intake_drain, get_form_intake_stream
+from buzz.events.doctype.event_check_in.event_check_in import publish_pending_checkin_counts
+from buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code import reconcile_coupon_usage
+from buzz.ticketing.doctype.event_booking.event_booking import (
+	DEFAULT_ABANDONED_BOOKING_RETENTION_DAYS,
+	delete_abandoned_bookings,
+)
+from buzz.ticketing.doctype.event_payment.event_payment import (
+	get_received_payments_query,
+	reconcile_payments,
+	retry_payment_processing,
+)
+from buzz.ticketing.doctype.event_ticket.event_ticket import retry_ticket_fulfillment
+from buzz.ticketing.doctype.event_ticket_type.event_ticket_type import (
+	reconcile_tickets_reserved,
+	reconcile_tickets_sold,
+)
+
+EXPIRED_HOLDS_BATCH_SIZE = 500
 
 
 def unpublish_ticket_types_after_last_date():
-	frappe.db.set_value(
+	ticket_types = frappe.get_all(
 		"Event Ticket Type",
-		{"is_published": True, "auto_unpublish_after": ("<", today())},
-		"is_published",
-		False,
+		filters={"is_published": True, "auto_unpublish_after": ("<", today())},
+		fields=["name", "event"],
 	)
+	if not ticket_types:
+		return
+
+	frappe.db.set_value(
+		"Event Ticket Type", {"name": ("in", [tt.name for tt in ticket_types])}, "is_published", False
+	)
+	frappe.db.commit()
+
+	clear_booking_payload_cache_for_events({tt.event for tt in ticket_types})
+
+
+def reconcile_ticket_type_counters():
+	repaired = reconcile_tickets_sold() + reconcile_tickets_reserved()
+	frappe.db.commit()
+
+	if repaired:
+		frappe.log_error(
+			title="Ticket type counters repaired",
+			message=f"Inventory counters drifted and were recounted for ticket types: {repaired}",
+		)
+
+
+def reconcile_coupon_usage_counters():
+	repaired = reconcile_coupon_usage()
 	frappe.db.commit()
+
+	if repaired:
+		frappe.log_error(
+			title="Coupon usage counters repaired",
+			message=f"Usage counters drifted and were recounted for coupons: {repaired}",
+		)
+
+
+def release_expired_ticket_holds():
+	# a paid booking waiting for its processing job keeps its tickets, it is left out of the batch so
+	# payments stuck in processing never crowd out the holds that did expire
+	EventBooking = frappe.qb.DocType("Event Booking")
+	expired_bookings = (
+		frappe.qb.from_(EventBooking)
+		.select(EventBooking.name)
+		.where(EventBooking.docstatus == 0)
+		.where(EventBooking.holds_tickets == 1)
+		.where(EventBooking.reserved_until < now_datetime())
+		.where(EventBooking.name.notin(get_received_payments_query()))
+		.orderby(EventBooking.reserved_until)
+		.limit(EXPIRED_HOLDS_BATCH_SIZE)
+	).run(pluck=True)
+
+	for booking_name in expired_bookings:
+		# lock the booking, a payment callback may be submitting it right now
+		booking = frappe.get_doc("Event Booking", booking_name, for_update=True)
+		if booking.docstatus == 0 and booking.holds_tickets:
+			booking.release_reserved_tickets()
+		frappe.db.commit()
+
+
+def retry_pending_ticket_fulfillment():
+	retry_ticket_fulfillment()
+	frappe.db.commit()
+
+
+def retry_pending_payment_processing():
+	retry_payment_processing()
+	frappe.db.commit()
+
+
+def reconcile_pending_payments():
+	summary = reconcile_payments()
+	frappe.db.commit()
+	frappe.logger("buzz").info(f"Payment reconciliation: {summary}")
+
+
+def clean_up_abandoned_bookings():
+	retention_days = (
+		cint(frappe.get_cached_doc("Buzz Settings").abandoned_booking_retention_days)
+		or DEFAULT_ABANDONED_BOOKING_RETENTION_DAYS
+	)
+	deleted = delete_abandoned_bookings(retention_days)
+	frappe.logger("buzz").info(f"Abandoned booking cleanup: {deleted}")
+
+
+def drain_buffered_form_submissions():
+	# submissions are drained as they arrive, this picks up what a lost or finishing job left behind
+	forms = frappe.get_all(
+		"Buzz Event Form",
+		filters={"parenttype": "Buzz Event", "buffered_intake": 1},
+		fields=["parent", "route"],
+	)
+	for form in forms:
+		if frappe.cache.xlen(get_form_intake_stream(form.parent, form.route)):
+			enqueue_form_intake_drain(form.parent, form.route)
+
+
+def publish_throttled_checkin_counts():
+	publish_pending_checkin_counts()
@@ -21,6 +21,99 @@ frappe.ui.form.on("Buzz Coupon Code", {
 
 		frm.trigger("coupon_type");
 		frm.trigger("applies_to");
+
+		if (!frm.is_new()) {
+			frm.trigger("add_bulk_code_buttons");
+		}
+	},
+
+	add_bulk_code_buttons(frm) {
+		const group = __("Bulk Codes");
+
+		frm.add_custom_button(
+			__("Generate"),
+			() => {
+				frappe.prompt(
+					[
+						{
+							fieldname: "count",
+							label: __("Number of Codes"),
+							fieldtype: "Int",
+							reqd: 1,
+						},
+						{
+							fieldname: "prefix",
+							label: __("Prefix"),
+							fieldtype: "Data",
+						},
+						{
+							fieldname: "length",
+							label: __("Random Characters"),
+							fieldtype: "Int",
+							default: 8,
+							reqd: 1,
+						},
+					],
+					(values) => {
+						frm.call("generate_codes", values).then(() => {
+							frappe.show_alert(__("Generating coupon codes in the background"));
+						});
+					},
+					__("Generate Coupon Codes"),
+					__("Generate"),
+				);
+			},
+			group,
+		);
+
+		frm.add_custom_button(
+			__("Import"),
+			() => {
+				new frappe.ui.FileUploader({
+					restrictions: { allowed_file_types: [".csv"] },
+					make_attachments_public: false,
+					on_success(file) {
+						frm.call("import_codes", { file_url: file.file_url }).then(() => {
+							frappe.show_alert(__("Importing coupon codes in the background"));
+						});
+					},
+				});
+			},
+			group,
+		);
+
+		frm.add_custom_button(
+			__("Export"),
+			() => {
+				frm.call("export_codes").then(() => {
+					frappe.show_alert(__("Exporting coupon codes in the background"));
+				});
+			},
+			group,
+		);
+
+		frappe.realtime.off("bulk_coupon_codes_progress");
+		frappe.realtime.on("bulk_coupon_codes_progress", (data) => {
+			if (data.coupon !== frm.doc.name) return;
+
+			if (data.progress < 100) {
+				frappe.show_progress(__("Coupon Codes"), data.progress, 100);
+				return;
+			}
+
+			frappe.hide_progress();
+			if (data.failed) {
+				frappe.msgprint({ title: __("Coupon Codes"), indicator: "red", message: data.message });
+				return;
+			}
+
+			if (data.file_url) {
+				window.open(data.file_url);
+			} else if (data.message) {
+				frappe.msgprint(data.message);
+			}
+			frm.reload_doc();
+		});
 	},
 
 	coupon_type(frm) {
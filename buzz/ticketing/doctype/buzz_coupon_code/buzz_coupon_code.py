@@ -1,9 +1,24 @@
 # Copyright (c) 2025, BWH Studios and contributors
 # For license information, please see license.txt
 
+import csv
+import inspect
+import os
+import re
+import secrets
+from functools import wraps
+
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.utils import cint, create_batch, now
+from frappe.utils.background_jobs import is_job_enqueued
+
+# no 0/O and 1/I, generated codes get read out and typed in by hand
+CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+CODE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{4,140}$")
+MAX_BULK_CODES = 50000
+BULK_CODES_CHUNK_SIZE = 1000
 
 
 class BuzzCouponCode(Document):
@@ -25,6 +40,8 @@ class BuzzCouponCode(Document):
 		event: DF.Link | None
 		event_category: DF.Link | None
 		free_add_ons: DF.Table[CouponFreeAddon]
+		free_tickets_claimed: DF.Int
+		generated_from: DF.Link | None
 		is_active: DF.Check
 		max_usage_count: DF.Int
 		max_usage_per_user: DF.Int
@@ -32,6 +49,7 @@ class BuzzCouponCode(Document):
 		minimum_order_value: DF.Float
 		number_of_free_tickets: DF.Int
 		ticket_type: DF.Link | None
+		times_used: DF.Int
 		valid_from: DF.Date | None
 		valid_till: DF.Date | None
 	# end: auto-generated types
@@ -41,11 +59,26 @@ class BuzzCouponCode(Document):
 			self.code = frappe.generate_hash(length=8).upper()
 
 	def validate(self):
+		self.load_usage_counters()
 		self.validate_discount_value()
 		self.validate_scope()
 		self.validate_free_tickets_event()
 		self.validate_validity_dates()
 
+	def load_usage_counters(self):
+		"""Counters are maintained by bookings, never trust the (possibly stale) value from the form."""
+		if self.is_new():
+			self.times_used = 0
+			self.free_tickets_claimed = 0
+			return
+
+		# lock the row so that concurrent bookings using this coupon wait for this save
+		times_used, free_tickets_claimed = frappe.db.get_value(
+			self.doctype, self.name, ["times_used", "free_tickets_claimed"], for_update=True
+		)
+		self.times_used = cint(times_used)
+		self.free_tickets_claimed = cint(free_tickets_claimed)
+
 	def validate_validity_dates(self):
 		if self.valid_from and self.valid_till:
 			if self.valid_from > self.valid_till:
@@ -140,26 +173,361 @@ class BuzzCouponCode(Document):
 
 		return False, ""
 
-	@property
-	def times_used(self):
-		return frappe.db.count("Event Booking", {"coupon_code": self.name, "docstatus": 1})
-
-	@property
-	def free_tickets_claimed(self):
-		"""Calculate total attendees from all submitted bookings using this coupon"""
-		from frappe.query_builder.functions import Count
-
-		EventBooking = frappe.qb.DocType("Event Booking")
-		EventBookingAttendee = frappe.qb.DocType("Event Booking Attendee")
-
-		count = (
-			frappe.qb.from_(EventBookingAttendee)
-			.join(EventBooking)
-			.on(EventBooking.name == EventBookingAttendee.parent)
-			.where(EventBooking.coupon_code == self.name)
-			.where(EventBooking.docstatus == 1)
-			.where(EventBookingAttendee.ticket_type == self.ticket_type)
-			.select(Count(EventBookingAttendee.name))
-		).run()[0][0]
-
-		return count or 0
+	@frappe.whitelist()
+	def generate_codes(self, count: int, prefix: str | None = None, length: int = 8):
+		"""Create `count` coupons with the settings of this one in a background job."""
+		self.check_permission("create")
+
+		count, length, prefix = cint(count), cint(length), (prefix or "").strip().upper()
+		if not 0 < count <= MAX_BULK_CODES:
+			frappe.throw(_("Number of codes must be between 1 and {0}").format(MAX_BULK_CODES))
+		if not 6 <= length <= 32:
+			frappe.throw(_("Code length must be between 6 and 32 characters"))
+		if prefix and not CODE_PATTERN.match(f"{prefix}AAAA"):
+			frappe.throw(_("Prefix can only contain letters, numbers, dashes and underscores"))
+
+		self.enqueue_bulk_codes_job(
+			"generate", generate_coupon_codes, count=count, prefix=prefix, length=length
+		)
+
+	@frappe.whitelist()
+	def import_codes(self, file_url: str):
+		"""Create coupons with the settings of this one for the codes in the first column of a CSV."""
+		self.check_permission("create")
+		# the job reads the file as Administrator, it may only get files the user can read
+		frappe.get_doc("File", {"file_url": file_url}).check_permission("read")
+		self.enqueue_bulk_codes_job("import", import_coupon_codes, file_url=file_url)
+
+	@frappe.whitelist()
+	def export_codes(self):
+		"""Write the coupons generated from this one to a private CSV file attached to it."""
+		self.check_permission("read")
+		self.enqueue_bulk_codes_job("export", export_coupon_codes)
+
+	def enqueue_bulk_codes_job(self, action: str, method, **kwargs):
+		# one job per coupon and action, an export can run while codes are being imported
+		job_id = f"buzz:bulk_coupon_codes:{self.name}:{action}"
+		if is_job_enqueued(job_id):
+			frappe.throw(
+				_("This action is already running for {0}, please wait until it finishes").format(self.name)
+			)
+
+		frappe.enqueue(
+			method,
+			queue="long",
+			job_id=job_id,
+			deduplicate=True,
+			enqueue_after_commit=True,
+			template=self.name,
+			user=frappe.session.user,
+			**kwargs,
+		)
+
+
+def update_coupon_usage(coupon: str, times_used: int, free_tickets_claimed: int = 0):
+	"""Atomically adjust the materialized usage counters of a coupon."""
+	frappe.db.sql(
+		"""
+		UPDATE `tabBuzz Coupon Code`
+		SET times_used = GREATEST(times_used + %(times_used)s, 0),
+			free_tickets_claimed = GREATEST(free_tickets_claimed + %(free_tickets_claimed)s, 0)
+		WHERE name = %(coupon)s
+		""",
+		{"coupon": coupon, "times_used": times_used, "free_tickets_claimed": free_tickets_claimed},
+	)
+	frappe.clear_document_cache("Buzz Coupon Code", coupon)
+
+
+def get_coupon_usage_counts(coupon: str | None = None) -> dict[str, tuple[int, int]]:
+	"""Submitted bookings and free tickets claimed per coupon, straight from the bookings."""
+	from frappe.query_builder.functions import Count
+
+	EventBooking = frappe.qb.DocType("Event Booking")
+	EventBookingAttendee = frappe.qb.DocType("Event Booking Attendee")
+	BuzzCouponCode = frappe.qb.DocType("Buzz Coupon Code")
+
+	bookings_query = (
+		frappe.qb.from_(EventBooking)
+		.select(EventBooking.coupon_code, Count(EventBooking.name))
+		.where(EventBooking.docstatus == 1)
+		.where(EventBooking.coupon_code.isnotnull())
+		.groupby(EventBooking.coupon_code)
+	)
+	# attendees of the coupon's ticket type, like the check on booking submit
+	free_tickets_query = (
+		frappe.qb.from_(EventBookingAttendee)
+		.join(EventBooking)
+		.on(EventBooking.name == EventBookingAttendee.parent)
+		.join(BuzzCouponCode)
+		.on(BuzzCouponCode.name == EventBooking.coupon_code)
+		.select(EventBooking.coupon_code, Count(EventBookingAttendee.name))
+		.where(EventBooking.docstatus == 1)
+		.where(BuzzCouponCode.coupon_type == "Free Tickets")
+		.where(EventBookingAttendee.ticket_type == BuzzCouponCode.ticket_type)
+		.groupby(EventBooking.coupon_code)
+	)
+	if coupon:
+		bookings_query = bookings_query.where(EventBooking.coupon_code == coupon)
+		free_tickets_query = free_tickets_query.where(EventBooking.coupon_code == coupon)
+
+	free_tickets = dict(free_tickets_query.run())
+	return {name: (times_used, cint(free_tickets.get(name))) for name, times_used in bookings_query.run()}
+
+
+def reconcile_coupon_usage() -> list[str]:
+	"""Repair drift between the materialized coupon usage counters and the submitted bookings.
+
+	Returns the names of the coupons whose counters had to be corrected.
+	"""
+	actual_counts = get_coupon_usage_counts()
+	coupons = frappe.get_all("Buzz Coupon Code", fields=["name", "times_used", "free_tickets_claimed"])
+
+	repaired = []
+	for coupon in coupons:
+		if (cint(coupon.times_used), cint(coupon.free_tickets_claimed)) == actual_counts.get(
+			coupon.name, (0, 0)
+		):
+			continue
+
+		# recount under a row lock, bookings may have been submitted since the grouped count above
+		frappe.db.get_value("Buzz Coupon Code", coupon.name, "name", for_update=True)
+		times_used, free_tickets_claimed = get_coupon_usage_counts(coupon.name).get(coupon.name, (0, 0))
+		frappe.db.set_value(
+			"Buzz Coupon Code",
+			coupon.name,
+			{"times_used": times_used, "free_tickets_claimed": free_tickets_claimed},
+			update_modified=False,
+		)
+		frappe.clear_document_cache("Buzz Coupon Code", coupon.name)
+		repaired.append(coupon.name)
+
+	return repaired
+
+
+def bulk_codes_job(job):
+	"""Tell the user who started a bulk codes job when it fails, successful jobs report back themselves."""
+
+	signature = inspect.signature(job)
+
+	@wraps(job)
+	def wrapper(*args, **kwargs):
+		arguments = signature.bind(*args, **kwargs).arguments
+		template, user = arguments["template"], arguments["user"]
+		try:
+			return job(*args, **kwargs)
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(
+				title="Bulk coupon codes job failed",
+				reference_doctype="Buzz Coupon Code",
+				reference_name=template,
+			)
+			publish_bulk_codes_progress(
+				user, template, 100, message=_("The coupon codes job failed, please try again"), failed=True
+			)
+
+	return wrapper
+
+
+@bulk_codes_job
+def generate_coupon_codes(template: str, count: int, prefix: str, length: int, user: str):
+	codes = make_unique_codes(count, prefix, length)
+	skipped = insert_coupon_codes(template, codes, user)
+	publish_bulk_codes_progress(
+		user, template, 100, message=_("{0} coupon codes generated").format(len(codes) - len(skipped))
+	)
+
+
+@bulk_codes_job
+def import_coupon_codes(template: str, file_url: str, user: str):
+	from frappe.utils.csvutils import read_csv_content
+
+	content = frappe.get_doc("File", {"file_url": file_url}).get_content()
+	rows = read_csv_content(content)
+	if rows and rows[0] and str(rows[0][0]).strip().lower() == "code":
+		rows = rows[1:]
+
+	codes, skipped = [], []
+	seen = set()
+	for row in rows:
+		code = str(row[0]).strip() if row else ""
+		if not code:
+			continue
+		if not CODE_PATTERN.match(code) or code.upper() in seen:
+			skipped.append(code)
+			continue
+		seen.add(code.upper())
+		codes.append(code)
+
+	existing = insert_coupon_codes(template, codes, user)
+	skipped += existing
+
+	message = _("{0} coupon codes imported").format(len(codes) - len(existing))
+	if skipped:
+		message += ", " + _("{0} skipped as invalid or already existing: {1}").format(
+			len(skipped), ", ".join(skipped[:20])
+		)
+	publish_bulk_codes_progress(user, template, 100, message=message)
+
+
+@bulk_codes_job
+def export_coupon_codes(template: str, user: str):
+	file_name = f"coupon-codes-{frappe.scrub(template)}-{frappe.generate_hash(length=8)}.csv"
+	file_path = frappe.get_site_path("private", "files", file_name)
+
+	try:
+		write_coupon_codes_file(template, file_path)
+	except Exception:
+		# no half written export is left behind
+		if os.path.exists(file_path):
+			os.remove(file_path)
+		raise
+
+	export_file = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": file_name,
+			"file_url": f"/private/files/{file_name}",
+			"is_private": 1,
+			"attached_to_doctype": "Buzz Coupon Code",
+			"attached_to_name": template,
+		}
+	).insert(ignore_permissions=True)
+
+	publish_bulk_codes_progress(user, template, 100, file_url=export_file.file_url)
+
+
+def write_coupon_codes_file(template: str, file_path: str):
+	with open(file_path, "w", newline="", encoding="utf-8") as f:
+		writer = csv.writer(f)
+		writer.writerow(["code", "is_active", "times_used", "free_tickets_claimed"])
+
+		after = None
+		while True:
+			filters = {"generated_from": template}
+			if after:
+				filters["name"] = (">", after)
+			coupons = frappe.get_all(
+				"Buzz Coupon Code",
+				filters=filters,
+				fields=["name", "code", "is_active", "times_used", "free_tickets_claimed"],
+				order_by="name asc",
+				limit=BULK_CODES_CHUNK_SIZE,
+			)
+			writer.writerows(
+				[c.code or c.name, c.is_active, c.times_used, c.free_tickets_claimed] for c in coupons
+			)
+			if len(coupons) < BULK_CODES_CHUNK_SIZE:
+				break
+			after = coupons[-1].name
+
+
+def make_unique_codes(count: int, prefix: str, length: int) -> list[str]:
+	"""Random codes that are unique among themselves and the existing coupons."""
+	codes = set()
+	while len(codes) < count:
+		candidates = {
+			prefix + "".join(secrets.choice(CODE_ALPHABET) for _i in range(length))
+			for _j in range(count - len(codes))
+		}
+		candidates -= codes
+
+		for batch in create_batch(list(candidates), BULK_CODES_CHUNK_SIZE):
+			candidates -= set(
+				frappe.get_all("Buzz Coupon Code", filters={"name": ("in", batch)}, pluck="name")
+			)
+
+		codes |= candidates
+
+	return list(codes)
+
+
+def insert_coupon_codes(template: str, codes: list[str], user: str) -> list[str]:
+	"""Copy the template coupon for every code, written with one batched insert per chunk.
+
+	Codes that already exist, or are taken by someone else while the job runs, are skipped and returned.
+	"""
+	template_doc = frappe.get_doc("Buzz Coupon Code", template)
+	skipped = []
+
+	for i, batch in enumerate(create_batch(codes, BULK_CODES_CHUNK_SIZE)):
+		existing = {
+			name.upper()
+			for name in frappe.get_all("Buzz Coupon Code", filters={"name": ("in", batch)}, pluck="name")
+		}
+		# one timestamp per chunk tells the coupons inserted here apart from ones the database ignored
+		timestamp = now()
+		coupons = []
+		for code in batch:
+			if code.upper() in existing:
+				skipped.append(code)
+				continue
+
+			coupon = frappe.copy_doc(template_doc)
+			coupon.update(
+				{"code": code, "generated_from": template, "times_used": 0, "free_tickets_claimed": 0}
+			)
+			coupon.set_new_name()
+			coupon.set_user_and_timestamp()
+			coupon.creation = coupon.modified = timestamp
+			coupon.set_parent_in_children()
+			coupons.append(coupon)
+
+		if coupons:
+			bulk_insert_documents(coupons, ignore_duplicates=True)
+			inserted = set(
+				frappe.get_all(
+					"Buzz Coupon Code",
+					filters={
+						"name": ("in", [coupon.name for coupon in coupons]),
+						"generated_from": template,
+						"creation": timestamp,
+					},
+					pluck="name",
+				)
+			)
+			skipped += [coupon.code for coupon in coupons if coupon.name not in inserted]
+			bulk_insert_documents(
+				[
+					child
+					for coupon in coupons
+					if coupon.name in inserted
+					for child in coupon.get_all_children()
+				]
+			)
+
+		frappe.db.commit()
+		done = min((i + 1) * BULK_CODES_CHUNK_SIZE, len(codes))
+		publish_bulk_codes_progress(user, template, done * 100 // len(codes))
+
+	return skipped
+
+
+def bulk_insert_documents(docs: list, ignore_duplicates: bool = False):
+	rows_by_doctype = {}
+	for doc in docs:
+		rows_by_doctype.setdefault(doc.doctype, []).append(doc.get_valid_dict(convert_dates_to_str=True))
+
+	for doctype, rows in rows_by_doctype.items():
+		fields = list(rows[0])
+		frappe.db.bulk_insert(
+			doctype,
+			fields,
+			[[row.get(field) for field in fields] for row in rows],
+			ignore_duplicates=ignore_duplicates,
+		)
+
+
+def publish_bulk_codes_progress(
+	user: str,
+	coupon: str,
+	progress: int,
+	message: str | None = None,
+	file_url: str | None = None,
+	failed: bool = False,
+):
+	frappe.publish_realtime(
+		"bulk_coupon_codes_progress",
+		{"coupon": coupon, "progress": progress, "message": message, "file_url": file_url, "failed": failed},
+		user=user,
+	)
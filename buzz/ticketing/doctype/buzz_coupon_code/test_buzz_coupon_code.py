@@ -1,6 +1,8 @@
 # Copyright (c) 2025, BWH Studios and Contributors
 # See license.txt
 
+from unittest.mock import patch
+
 import frappe
 from frappe.tests import IntegrationTestCase
 
@@ -247,6 +249,7 @@ class IntegrationTestBuzzCouponCode(IntegrationTestCase):
 			booking.submit()
 
 		# Verify all 5 bookings were created
+		coupon.reload()
 		self.assertEqual(coupon.times_used, 5)
 
 	# ==================== MAX DISCOUNT CAP TESTS ====================
@@ -572,6 +575,7 @@ class IntegrationTestBuzzCouponCode(IntegrationTestCase):
 		booking1.submit()
 
 		# Verify 2 claimed
+		coupon.reload()
 		self.assertEqual(coupon.free_tickets_claimed, 2)
 
 		# Second booking: claim 2 more (4 total, 1 remaining)
@@ -598,6 +602,7 @@ class IntegrationTestBuzzCouponCode(IntegrationTestCase):
 		booking2.submit()
 
 		# Verify 4 claimed
+		coupon.reload()
 		self.assertEqual(coupon.free_tickets_claimed, 4)
 
 		# Third booking: try to claim 3, but only 1 remaining
@@ -1081,6 +1086,204 @@ class IntegrationTestBuzzCouponCode(IntegrationTestCase):
 		# Coupon should be tracked in booking
 		self.assertEqual(booking.coupon_code, "TESTTRACK")
 
+	# ==================== USAGE COUNTER TESTS ====================
+
+	def test_cancelled_booking_releases_coupon_usage(self):
+		"""Test that usage counters follow booking submit and cancel."""
+		coupon = frappe.get_doc(
+			{
+				"doctype": "Buzz Coupon Code",
+				"coupon_type": "Free Tickets",
+				"applies_to": "Event",
+				"event": self.test_event.name,
+				"ticket_type": self.test_ticket_type.name,
+				"number_of_free_tickets": 2,
+				"is_active": True,
+			}
+		).insert()
+
+		booking = frappe.get_doc(
+			{
+				"doctype": "Event Booking",
+				"event": self.test_event.name,
+				"user": "Administrator",
+				"coupon_code": coupon.name,
+				"attendees": [
+					{
+						"ticket_type": self.test_ticket_type.name,
+						"first_name": f"User {i}",
+						"email": f"counter{i}@test.com",
+					}
+					for i in range(2)
+				],
+			}
+		).insert()
+		booking.submit()
+
+		coupon.reload()
+		self.assertEqual((coupon.times_used, coupon.free_tickets_claimed), (1, 2))
+
+		booking.cancel()
+
+		coupon.reload()
+		self.assertEqual((coupon.times_used, coupon.free_tickets_claimed), (0, 0))
+
+	def test_reconcile_coupon_usage_repairs_drift(self):
+		"""Test that reconciliation recounts usage from submitted bookings."""
+		from buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code import reconcile_coupon_usage
+
+		coupon = frappe.get_doc(
+			{
+				"doctype": "Buzz Coupon Code",
+				"coupon_type": "Discount",
+				"discount_type": "Percentage",
+				"discount_value": 10,
+				"is_active": True,
+			}
+		).insert()
+		frappe.db.set_value("Buzz Coupon Code", coupon.name, "times_used", 7)
+
+		self.assertIn(coupon.name, reconcile_coupon_usage())
+		self.assertEqual(frappe.db.get_value("Buzz Coupon Code", coupon.name, "times_used"), 0)
+
+	def test_saving_stale_coupon_keeps_usage_counters(self):
+		"""Test that saving a coupon loaded before a booking doesn't write its old counters back."""
+		from buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code import update_coupon_usage
+
+		coupon = frappe.get_doc(
+			{
+				"doctype": "Buzz Coupon Code",
+				"coupon_type": "Discount",
+				"discount_type": "Flat Amount",
+				"discount_value": 50,
+				"is_active": True,
+			}
+		).insert()
+		# what bookings do, see `update_coupon_usage`
+		update_coupon_usage(coupon.name, times_used=3, free_tickets_claimed=2)
+
+		coupon.discount_value = 60
+		coupon.save()
+
+		self.assertEqual(
+			frappe.db.get_value("Buzz Coupon Code", coupon.name, ["times_used", "free_tickets_claimed"]),
+			(3, 2),
+		)
+
+	# ==================== BULK CODE TESTS ====================
+
+	def make_template_coupon(self):
+		return frappe.get_doc(
+			{
+				"doctype": "Buzz Coupon Code",
+				"coupon_type": "Discount",
+				"discount_type": "Flat Amount",
+				"discount_value": 50,
+				"max_usage_count": 1,
+				"is_active": True,
+			}
+		).insert()
+
+	def test_generate_coupon_codes_from_template(self):
+		"""Test that generated coupons are unique copies of the template."""
+		from buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code import generate_coupon_codes
+
+		template = self.make_template_coupon()
+		generate_coupon_codes(template.name, count=25, prefix="PARTNER-", length=6, user="Administrator")
+
+		coupons = frappe.get_all(
+			"Buzz Coupon Code",
+			filters={"generated_from": template.name},
+			fields=["name", "code", "discount_value", "max_usage_count"],
+		)
+		self.assertEqual(len(coupons), 25)
+		self.assertEqual(len({c.code for c in coupons}), 25)
+		for coupon in coupons:
+			self.assertEqual(coupon.name, coupon.code)
+			self.assertTrue(coupon.code.startswith("PARTNER-"))
+			self.assertEqual(len(coupon.code), len("PARTNER-") + 6)
+			self.assertEqual((coupon.discount_value, coupon.max_usage_count), (50, 1))
+
+	def test_import_coupon_codes_skips_invalid_and_existing(self):
+		"""Test that imported codes are validated before they are inserted."""
+		from buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code import import_coupon_codes
+
+		template = self.make_template_coupon()
+		csv_file = frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": f"partner-codes-{frappe.generate_hash(length=6)}.csv",
+				"content": f"code\nPARTNERA1\nPARTNERA1\nbad code!\n{template.name}\nPARTNERB2\n",
+				"is_private": 1,
+			}
+		).insert()
+
+		import_coupon_codes(template.name, csv_file.file_url, user="Administrator")
+
+		imported = frappe.get_all("Buzz Coupon Code", filters={"generated_from": template.name}, pluck="name")
+		self.assertEqual(sorted(imported), ["PARTNERA1", "PARTNERB2"])
+
+	def test_failed_bulk_codes_job_notifies_user(self):
+		"""Test that a failing job reports back to the user who started it."""
+		from buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code import generate_coupon_codes
+
+		template = self.make_template_coupon()
+		module = "buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code"
+		with (
+			patch(f"{module}.insert_coupon_codes", side_effect=frappe.ValidationError),
+			patch(f"{module}.publish_bulk_codes_progress") as publish,
+			patch.object(frappe.db, "rollback"),
+			patch("frappe.log_error"),
+		):
+			generate_coupon_codes(template.name, count=5, prefix="", length=8, user="Administrator")
+
+		self.assertTrue(publish.call_args.kwargs["failed"])
+
+	def test_running_bulk_codes_action_is_not_enqueued_again(self):
+		"""Test that each action has its own job and a running one is reported instead of dropped."""
+		template = self.make_template_coupon()
+		module = "buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code"
+
+		with patch(f"{module}.is_job_enqueued", return_value=False), patch("frappe.enqueue") as mock_enqueue:
+			template.export_codes()
+		self.assertEqual(
+			mock_enqueue.call_args.kwargs["job_id"], f"buzz:bulk_coupon_codes:{template.name}:export"
+		)
+
+		with patch(f"{module}.is_job_enqueued", return_value=True), patch("frappe.enqueue") as mock_enqueue:
+			self.assertRaises(frappe.ValidationError, template.export_codes)
+		mock_enqueue.assert_not_called()
+
+	def test_insert_coupon_codes_skips_codes_that_already_exist(self):
+		"""Test that an existing code is reported instead of failing the whole chunk."""
+		from buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code import insert_coupon_codes
+
+		template = self.make_template_coupon()
+		skipped = insert_coupon_codes(template.name, ["PARTNERC3", template.name], user="Administrator")
+
+		self.assertEqual(skipped, [template.name])
+		imported = frappe.get_all("Buzz Coupon Code", filters={"generated_from": template.name}, pluck="name")
+		self.assertEqual(imported, ["PARTNERC3"])
+
+	def test_import_codes_needs_read_access_to_the_file(self):
+		"""Test that a coupon manager can't import from a private file they can't read."""
+		template = self.make_template_coupon()
+		csv_file = frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": f"private-{frappe.generate_hash(length=6)}.csv",
+				"content": "code\nPARTNERD4\n",
+				"is_private": 1,
+			}
+		).insert()
+
+		with (
+			patch("frappe.enqueue") as mock_enqueue,
+			patch.object(type(csv_file), "check_permission", side_effect=frappe.PermissionError),
+		):
+			self.assertRaises(frappe.PermissionError, template.import_codes, csv_file.file_url)
+		mock_enqueue.assert_not_called()
+
 
 class TestValidateCouponAPI(IntegrationTestCase):
 	"""Test the validate_coupon API endpoint."""
@@ -5,9 +5,26 @@ import json
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.utils import add_to_date, cint, now_datetime
 
 from buzz.api import OFFLINE_PAYMENT_METHOD
-from buzz.payments import mark_payment_as_received
+from buzz.payments import record_payment_authorization
+from buzz.ticketing.doctype.buzz_coupon_code.buzz_coupon_code import update_coupon_usage
+from buzz.ticketing.doctype.event_payment.event_payment import enqueue_payment_processing
+from buzz.ticketing.doctype.event_ticket.event_ticket import enqueue_bulk_ticket_fulfillment
+from buzz.ticketing.doctype.event_ticket_type.event_ticket_type import (
+	release_tickets,
+	reserve_tickets,
+	update_tickets_sold,
+)
+
+DEFAULT_TICKET_HOLD_MINUTES = 15
+# group bookings of this size skip the per-ticket insert/submit and are written with batched inserts
+BULK_TICKET_GENERATION_THRESHOLD = 20
+DEFAULT_ABANDONED_BOOKING_RETENTION_DAYS = 30
+ABANDONED_BOOKINGS_BATCH_SIZE = 500
+# bounds a single cleanup run, whatever is left is picked up by the next one
+MAX_ABANDONED_BOOKING_BATCHES = 20
 
 
 class EventBooking(Document):
@@ -31,13 +48,15 @@ class EventBooking(Document):
 		currency: DF.Link
 		discount_amount: DF.Currency
 		event: DF.Link
+		holds_tickets: DF.Check
 		invoice_requested: DF.Check
 		naming_series: DF.Literal["B.###"]
 		net_amount: DF.Currency
 		offline_payment_method: DF.Data | None
 		payment_method: DF.Data | None
 		payment_status: DF.Literal["Unpaid", "Paid", "Verification Pending"]
-		status: DF.Literal["Confirmed", "Approval Pending", "Approved", "Rejected"]
+		reserved_until: DF.Datetime | None
+		status: DF.Literal["Confirmed", "Approval Pending", "Approved", "Rejected", "Expired"]
 		tax_amount: DF.Currency
 		tax_id: DF.Data | None
 		tax_label: DF.Data | None
@@ -113,25 +132,61 @@ class EventBooking(Document):
 				self.tax_amount = self.total_amount * (self.tax_percentage / 100)
 				self.total_amount += self.tax_amount
 
-	def validate_ticket_availability(self):
+	def get_tickets_by_type(self) -> dict:
 		num_tickets_by_type = {}
 		for attendee in self.attendees:
 			if attendee.ticket_type not in num_tickets_by_type:
 				num_tickets_by_type[attendee.ticket_type] = 0
 			num_tickets_by_type[attendee.ticket_type] += 1
+		return num_tickets_by_type
+
+	def validate_ticket_availability(self):
+		# tickets already held by this booking are part of the reserved count, add them back
+		held_by_self = {}
+		previous = self.get_doc_before_save()
+		if self.holds_tickets and previous:
+			held_by_self = previous.get_tickets_by_type()
 
-		for ticket_type, num_tickets in num_tickets_by_type.items():
+		for ticket_type, num_tickets in self.get_tickets_by_type().items():
 			ticket_type_doc = frappe.get_cached_doc("Event Ticket Type", ticket_type)
 			if not ticket_type_doc.is_published:
 				frappe.throw(frappe._(f"{ticket_type_doc.title} tickets no longer available!"))
 
-			if not ticket_type_doc.are_tickets_available(num_tickets):
+			if not ticket_type_doc.are_tickets_available(num_tickets - held_by_self.get(ticket_type, 0)):
 				frappe.throw(
 					frappe._(
 						f"Only {ticket_type_doc.remaining_tickets} tickets available for {ticket_type_doc.title}, you are trying to book {num_tickets}!"
 					)
 				)
 
+	def after_insert(self):
+		self.reserve_tickets()
+
+	def on_update(self):
+		if not self.holds_tickets or self.docstatus != 0:
+			return
+
+		previous = self.get_doc_before_save()
+		if previous and previous.get_tickets_by_type() != self.get_tickets_by_type():
+			release_tickets(previous.get_tickets_by_type())
+			reserve_tickets(self.get_tickets_by_type())
+
+	def reserve_tickets(self):
+		"""Hold this booking's tickets against the inventory until it is submitted or the hold expires."""
+		reserve_tickets(self.get_tickets_by_type())
+
+		hold_minutes = (
+			cint(frappe.get_cached_doc("Buzz Settings").ticket_hold_minutes) or DEFAULT_TICKET_HOLD_MINUTES
+		)
+		self.db_set({"holds_tickets": 1, "reserved_until": add_to_date(now_datetime(), minutes=hold_minutes)})
+
+	def release_reserved_tickets(self):
+		if not self.holds_tickets:
+			return
+
+		release_tickets(self.get_tickets_by_type())
+		self.db_set({"holds_tickets": 0, "reserved_until": None})
+
 	def fetch_amounts_from_ticket_types(self):
 		for attendee in self.attendees:
 			price, currency = frappe.get_cached_value(
@@ -144,20 +199,26 @@ class EventBooking(Document):
 
 	def on_submit(self):
 		self.validate_coupon_availability()
+		# the hold turns into sold tickets, which are counted as they are generated below
+		self.release_reserved_tickets()
 		self.generate_tickets()
 
 	def validate_coupon_availability(self):
-		"""Re-validate coupon with lock to prevent race condition."""
+		"""Re-validate coupon with lock to prevent race condition and count the redemption."""
 		if not self.coupon_code:
 			return
 
-		# Lock coupon row to prevent concurrent over-allocation
+		# Lock coupon row to prevent concurrent over-allocation, the usage counters on it exclude
+		# this booking until they are incremented below
 		coupon = frappe.get_doc("Buzz Coupon Code", self.coupon_code, for_update=True)
 
+		is_available, error_msg = coupon.is_usage_available()
+		if not is_available:
+			frappe.throw(error_msg)
+
+		coupon_tickets = self.get_coupon_ticket_count(coupon.coupon_type, coupon.ticket_type)
 		if coupon.coupon_type == "Free Tickets":
-			# Count claimed tickets excluding current booking (since it's already docstatus=1 during on_submit)
-			claimed = self.get_free_tickets_claimed_excluding_self(coupon)
-			remaining = coupon.number_of_free_tickets - claimed
+			remaining = coupon.number_of_free_tickets - coupon.free_tickets_claimed
 
 			# Count only attendees that were actually discounted (amount == 0)
 			# This supports partial allocation where user books more tickets than remaining free
@@ -169,92 +230,112 @@ class EventBooking(Document):
 			if remaining < tickets_discounted:
 				frappe.throw(_("Only {0} free tickets remaining").format(remaining))
 
-	def get_free_tickets_claimed_excluding_self(self, coupon):
-		"""Get free tickets claimed excluding current booking."""
-		from frappe.query_builder.functions import Count
+		update_coupon_usage(coupon.name, 1, coupon_tickets)
+
+	def release_coupon_usage(self):
+		if not self.coupon_code:
+			return
 
-		EventBooking = frappe.qb.DocType("Event Booking")
-		EventBookingAttendee = frappe.qb.DocType("Event Booking Attendee")
+		coupon_type, ticket_type = frappe.db.get_value(
+			"Buzz Coupon Code", self.coupon_code, ["coupon_type", "ticket_type"]
+		)
+		update_coupon_usage(self.coupon_code, -1, -self.get_coupon_ticket_count(coupon_type, ticket_type))
 
-		count = (
-			frappe.qb.from_(EventBookingAttendee)
-			.join(EventBooking)
-			.on(EventBooking.name == EventBookingAttendee.parent)
-			.where(EventBooking.coupon_code == coupon.name)
-			.where(EventBooking.docstatus == 1)
-			.where(EventBooking.name != self.name)
-			.where(EventBookingAttendee.ticket_type == coupon.ticket_type)
-			.select(Count(EventBookingAttendee.name))
-		).run()[0][0]
+	def get_coupon_ticket_count(self, coupon_type: str, ticket_type: str | int | None) -> int:
+		"""Attendees that count towards the free tickets of the coupon."""
+		if coupon_type != "Free Tickets" or not ticket_type:
+			return 0
 
-		return count or 0
+		return len([a for a in self.attendees if str(a.ticket_type) == str(ticket_type)])
 
 	def generate_tickets(self):
-		for attendee in self.attendees:
-			ticket = frappe.new_doc("Event Ticket")
-			ticket.event = self.event
-			ticket.booking = self.name
-			ticket.ticket_type = attendee.ticket_type
-			ticket.first_name = attendee.first_name
-			ticket.last_name = attendee.last_name
-			ticket.attendee_email = attendee.email
+		custom_field_map = self.get_ticket_custom_field_map()
+		add_ons_by_parent = get_attendee_add_on_values([a.add_ons for a in self.attendees if a.add_ons])
 
-			if attendee.add_ons:
-				add_ons_list = frappe.get_cached_doc("Attendee Ticket Add-on", attendee.add_ons).add_ons
-				ticket.add_ons = add_ons_list
-
-			# Add custom fields from attendee to ticket
-			if attendee.custom_fields:
-				custom_fields_data = attendee.custom_fields
-				if isinstance(custom_fields_data, str):
-					try:
-						custom_fields_data = json.loads(custom_fields_data)
-					except (json.JSONDecodeError, TypeError):
-						custom_fields_data = {}
-
-				# Get custom field definitions for this event to get proper labels and types
-				custom_field_defs = frappe.db.get_all(
-					"Buzz Custom Field",
-					filters={"event": self.event, "enabled": 1, "applied_to": "Ticket"},
-					fields=["fieldname", "label", "fieldtype"],
-				)
-				custom_field_map = {cf["fieldname"]: cf for cf in custom_field_defs}
-
-				for field_name, field_value in custom_fields_data.items():
-					if field_value and field_name in custom_field_map:
-						field_def = custom_field_map[field_name]
-						ticket.append(
-							"additional_fields",
-							{
-								"fieldname": field_name,
-								"value": str(field_value),
-								"label": field_def["label"],
-								"fieldtype": field_def["fieldtype"],
-							},
-						)
+		tickets = [
+			self.build_ticket(attendee, custom_field_map, add_ons_by_parent) for attendee in self.attendees
+		]
+
+		if len(tickets) >= BULK_TICKET_GENERATION_THRESHOLD:
+			insert_tickets_in_bulk(tickets)
+			return
 
+		for ticket in tickets:
 			ticket.flags.ignore_permissions = 1
 			ticket.insert().submit()
 
+	def get_ticket_custom_field_map(self) -> dict:
+		if not any(attendee.custom_fields for attendee in self.attendees):
+			return {}
+
+		# Get custom field definitions for this event to get proper labels and types
+		custom_field_defs = frappe.db.get_all(
+			"Buzz Custom Field",
+			filters={"event": self.event, "enabled": 1, "applied_to": "Ticket"},
+			fields=["fieldname", "label", "fieldtype"],
+		)
+		return {cf["fieldname"]: cf for cf in custom_field_defs}
+
+	def build_ticket(self, attendee, custom_field_map: dict, add_ons_by_parent: dict) -> Document:
+		ticket = frappe.new_doc("Event Ticket")
+		ticket.event = self.event
+		ticket.booking = self.name
+		ticket.ticket_type = attendee.ticket_type
+		ticket.first_name = attendee.first_name
+		ticket.last_name = attendee.last_name
+		ticket.attendee_email = attendee.email
+
+		for add_on in add_ons_by_parent.get(attendee.add_ons, []):
+			ticket.append("add_ons", add_on)
+
+		# Add custom fields from attendee to ticket
+		if attendee.custom_fields:
+			custom_fields_data = attendee.custom_fields
+			if isinstance(custom_fields_data, str):
+				try:
+					custom_fields_data = json.loads(custom_fields_data)
+				except (json.JSONDecodeError, TypeError):
+					custom_fields_data = {}
+
+			for field_name, field_value in custom_fields_data.items():
+				if field_value and field_name in custom_field_map:
+					field_def = custom_field_map[field_name]
+					ticket.append(
+						"additional_fields",
+						{
+							"fieldname": field_name,
+							"value": str(field_value),
+							"label": field_def["label"],
+							"fieldtype": field_def["fieldtype"],
+						},
+					)
+
+		return ticket
+
 	def on_payment_authorized(self, payment_status: str):
-		if payment_status in ("Authorized", "Completed"):
-			# payment success, submit the booking
-			self.payment_status = "Paid"
-			self.status = "Confirmed"
-			self.update_payment_record()
+		if payment_status not in ("Authorized", "Completed"):
+			return
 
-	def update_payment_record(self):
-		try:
-			mark_payment_as_received(self.doctype, self.name)
-			self.flags.ignore_permissions = 1
-			self.submit()
-		except Exception:
-			frappe.log_error(frappe.get_traceback(), _("Booking Failed"))
-			frappe.throw(frappe._("Booking Failed! Please contact support."))
+		# gateways repeat their callbacks, only the first one for a payment queues the booking
+		payment = record_payment_authorization(self.doctype, self.name)
+		if payment:
+			frappe.db.set_value("Event Payment", payment, "processing_status", "Pending")
+			enqueue_payment_processing(payment)
+			frappe.db.commit()
+
+	def submit_paid_booking(self):
+		self.payment_status = "Paid"
+		self.status = "Confirmed"
+		self.flags.ignore_permissions = 1
+		self.submit()
+
+	def on_trash(self):
+		self.release_reserved_tickets()
 
 	def on_cancel(self):
 		self.ignore_linked_doctypes = ["Ticket Cancellation Request"]
 		self.cancel_all_tickets()
+		self.release_coupon_usage()
 
 	def cancel_all_tickets(self):
 		tickets = frappe.db.get_all("Event Ticket", filters={"booking": self.name}, pluck="name")
@@ -280,6 +361,7 @@ class EventBooking(Document):
 		frappe.only_for("Event Manager")
 
 		self.flags.ignore_permissions = True
+		self.release_reserved_tickets()
 		self.discard()
 		self.db_set("status", "Rejected")
 		frappe.msgprint(_("Booking has been rejected!"))
@@ -350,3 +432,178 @@ class EventBooking(Document):
 				frappe.throw(_("No attendees with eligible ticket type for this coupon"))
 
 			self.total_amount = self.net_amount - self.discount_amount
+
+
+def get_attendee_add_on_values(attendee_add_ons: list[str]) -> dict[str, list[dict]]:
+	"""Add-on values of many `Attendee Ticket Add-on` docs in one query, keyed by parent."""
+	if not attendee_add_ons:
+		return {}
+
+	values = frappe.get_all(
+		"Ticket Add-on Value",
+		filters={"parenttype": "Attendee Ticket Add-on", "parent": ("in", attendee_add_ons)},
+		fields=["parent", "add_on", "value", "price", "currency"],
+		order_by="idx asc",
+	)
+
+	add_ons_by_parent = {}
+	for row in values:
+		add_ons_by_parent.setdefault(row.pop("parent"), []).append(row)
+	return add_ons_by_parent
+
+
+def insert_tickets_in_bulk(tickets: list[Document]) -> None:
+	"""Write submitted tickets and their child rows with batched inserts.
+
+	Every ticket goes through the checks of `insert().submit()` in memory first, only the writes and
+	`on_submit` (inventory counter, fulfillment) are done here in bulk.
+	"""
+	rows_by_doctype = {}
+	tickets_by_type = {}
+
+	for ticket in tickets:
+		validate_ticket_for_bulk_insert(ticket)
+
+		for doc in [ticket, *ticket.get_all_children()]:
+			rows_by_doctype.setdefault(doc.doctype, []).append(doc.get_valid_dict(convert_dates_to_str=True))
+
+		tickets_by_type[ticket.ticket_type] = tickets_by_type.get(ticket.ticket_type, 0) + 1
+
+	for doctype, rows in rows_by_doctype.items():
+		fields = list(rows[0])
+		frappe.db.bulk_insert(doctype, fields, [[row.get(field) for field in fields] for row in rows])
+
+	for ticket_type, count in tickets_by_type.items():
+		update_tickets_sold(ticket_type, count)
+
+	# one job renders and queues the ticket emails of the whole booking in batches
+	enqueue_bulk_ticket_fulfillment(tickets[0].booking, [ticket.name for ticket in tickets])
+
+
+def validate_ticket_for_bulk_insert(ticket: Document) -> None:
+	"""Run the steps of `Document.insert` for a ticket inserted as submitted, up to the write.
+
+	The order follows `Document.insert`. Permission checks are left out as tickets are generated by the
+	system, `db_insert` and `on_submit` are replaced by the batched writes of `insert_tickets_in_bulk`.
+	`_set_defaults`, `_validate_links` and `_validate` (mandatory, length, select and data type checks)
+	have no public counterpart. `test_bulk_ticket_validation_matches_insert` compares both paths.
+	"""
+	ticket.flags.ignore_permissions = 1
+	ticket.docstatus = 1
+	ticket._set_defaults()
+	ticket.set_user_and_timestamp()
+	ticket.set_docstatus()
+	# a new document gets its action ("submit") from the docstatus here
+	ticket.check_if_latest()
+	ticket._validate_links()
+	ticket.run_method("before_insert")
+	ticket.set_new_name()
+	ticket.set_parent_in_children()
+	ticket.flags.in_insert = True
+	ticket.run_before_save_methods()
+	ticket._validate()
+	ticket.set_docstatus()
+	ticket.flags.in_insert = False
+
+
+def delete_abandoned_bookings(retention_days: int) -> dict:
+	"""Delete unpaid draft bookings untouched for `retention_days`, with their payment records and
+	`Attendee Ticket Add-on` docs, plus add-on docs whose booking was never created.
+
+	Rows are deleted in batches without loading the documents, with a commit after every batch.
+	Returns the number of deleted documents by type.
+	"""
+	cutoff = add_to_date(now_datetime(), days=-retention_days)
+	deleted = frappe._dict(bookings=0, payments=0, attendee_add_ons=0)
+
+	for _batch in range(MAX_ABANDONED_BOOKING_BATCHES):
+		bookings = get_abandoned_bookings(cutoff)
+		if not bookings:
+			break
+
+		payments = frappe.get_all(
+			"Event Payment",
+			filters={"reference_doctype": "Event Booking", "reference_docname": ("in", bookings)},
+			pluck="name",
+		)
+		add_ons = frappe.get_all(
+			"Event Booking Attendee",
+			filters={"parenttype": "Event Booking", "parent": ("in", bookings), "add_ons": ("is", "set")},
+			pluck="add_ons",
+		)
+
+		delete_documents("Event Booking", bookings)
+		delete_documents("Event Payment", payments)
+		delete_documents("Attendee Ticket Add-on", add_ons)
+		frappe.db.commit()
+
+		deleted.bookings += len(bookings)
+		deleted.payments += len(payments)
+		deleted.attendee_add_ons += len(add_ons)
+
+	for _batch in range(MAX_ABANDONED_BOOKING_BATCHES):
+		add_ons = get_orphaned_attendee_add_ons(cutoff)
+		if not add_ons:
+			break
+
+		delete_documents("Attendee Ticket Add-on", add_ons)
+		frappe.db.commit()
+		deleted.attendee_add_ons += len(add_ons)
+
+	return deleted
+
+
+def get_abandoned_bookings(cutoff) -> list[str]:
+	EventBooking = frappe.qb.DocType("Event Booking")
+	EventPayment = frappe.qb.DocType("Event Payment")
+
+	# a received payment means the booking is still being processed, however old it is
+	received_payments = (
+		frappe.qb.from_(EventPayment)
+		.select(EventPayment.reference_docname)
+		.where(EventPayment.reference_doctype == "Event Booking")
+		.where(EventPayment.reference_docname.isnotnull())
+		.where(EventPayment.payment_received == 1)
+	)
+	return (
+		frappe.qb.from_(EventBooking)
+		.select(EventBooking.name)
+		.where(EventBooking.docstatus == 0)
+		.where(EventBooking.payment_status == "Unpaid")
+		# held tickets are released by `release_expired_ticket_holds` first
+		.where(EventBooking.holds_tickets == 0)
+		.where(EventBooking.modified < cutoff)
+		.where(EventBooking.name.notin(received_payments))
+		.orderby(EventBooking.modified)
+		.limit(ABANDONED_BOOKINGS_BATCH_SIZE)
+	).run(pluck=True)
+
+
+def get_orphaned_attendee_add_ons(cutoff) -> list[str]:
+	AttendeeTicketAddOn = frappe.qb.DocType("Attendee Ticket Add-on")
+	EventBookingAttendee = frappe.qb.DocType("Event Booking Attendee")
+
+	return (
+		frappe.qb.from_(AttendeeTicketAddOn)
+		.select(AttendeeTicketAddOn.name)
+		.where(AttendeeTicketAddOn.modified < cutoff)
+		.where(
+			AttendeeTicketAddOn.name.notin(
+				frappe.qb.from_(EventBookingAttendee)
+				.select(EventBookingAttendee.add_ons)
+				.where(EventBookingAttendee.add_ons.isnotnull())
+			)
+		)
+		.orderby(AttendeeTicketAddOn.modified)
+		.limit(ABANDONED_BOOKINGS_BATCH_SIZE)
+	).run(pluck=True)
+
+
+def delete_documents(doctype: str, names: list[str]):
+	"""Delete documents with their child rows, skipping the controller hooks and link checks."""
+	if not names:
+		return
+
+	for table_field in frappe.get_meta(doctype).get_table_fields():
+		frappe.db.delete(table_field.options, {"parenttype": doctype, "parent": ("in", names)})
+	frappe.db.delete(doctype, {"name": ("in", names)})
@@ -1,9 +1,16 @@
 # Copyright (c) 2025, BWH Studios and Contributors
 # See license.txt
 
+from unittest.mock import patch
+
 import frappe
 from frappe.tests import IntegrationTestCase
 
+from buzz.ticketing.doctype.event_booking.event_booking import (
+	BULK_TICKET_GENERATION_THRESHOLD,
+	validate_ticket_for_bulk_insert,
+)
+
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
 # Use these module variables to add/remove to/from that list
@@ -463,6 +470,182 @@ class IntegrationTestEventBooking(IntegrationTestCase):
 		self.assertIsNotNone(custom_param)
 		self.assertEqual(custom_param.value, "special_offer")
 
+	def test_large_group_booking_generates_tickets_in_bulk(self):
+		test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		test_ticket_add_on = frappe.get_doc(
+			{"doctype": "Ticket Add-on", "event": test_event.name, "title": "Lanyard", "price": 10}
+		).insert()
+		test_ticket_type = frappe.get_doc(
+			{"doctype": "Event Ticket Type", "event": test_event.name, "title": "Corporate", "price": 0}
+		).insert()
+		test_attendee_add_on = frappe.get_doc(
+			{
+				"doctype": "Attendee Ticket Add-on",
+				"add_ons": [{"add_on": test_ticket_add_on.name, "value": "1"}],
+			}
+		).insert()
+
+		num_attendees = BULK_TICKET_GENERATION_THRESHOLD + 5
+		attendees = [
+			{
+				"ticket_type": test_ticket_type.name,
+				"first_name": f"Employee {i}",
+				"last_name": "Corp",
+				"email": f"employee{i}@example.com",
+			}
+			for i in range(num_attendees)
+		]
+		attendees[0]["add_ons"] = test_attendee_add_on.name
+
+		test_booking = frappe.get_doc(
+			{
+				"doctype": "Event Booking",
+				"event": test_event.name,
+				"user": "Administrator",
+				"attendees": attendees,
+			}
+		).insert()
+		test_booking.submit()
+
+		tickets = frappe.get_all(
+			"Event Ticket",
+			filters={"booking": test_booking.name},
+			fields=["name", "docstatus", "attendee_name", "fulfillment_status"],
+		)
+		self.assertEqual(len(tickets), num_attendees)
+		self.assertTrue(all(ticket.docstatus == 1 for ticket in tickets))
+		self.assertTrue(all(ticket.fulfillment_status == "Pending" for ticket in tickets))
+		self.assertIn("Employee 0 Corp", {ticket.attendee_name for ticket in tickets})
+		self.assertEqual(
+			frappe.db.count(
+				"Ticket Add-on Value",
+				{"parenttype": "Event Ticket", "parent": ("in", [ticket.name for ticket in tickets])},
+			),
+			1,
+		)
+		self.assertEqual(
+			frappe.db.get_value("Event Ticket Type", test_ticket_type.name, "tickets_sold"), num_attendees
+		)
+
+	def test_bulk_and_per_document_tickets_match(self):
+		test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		test_ticket_add_on = frappe.get_doc(
+			{"doctype": "Ticket Add-on", "event": test_event.name, "title": "T-Shirt", "price": 0}
+		).insert()
+		test_ticket_type = frappe.get_doc(
+			{"doctype": "Event Ticket Type", "event": test_event.name, "title": "Team", "price": 0}
+		).insert()
+		if not frappe.db.exists("Buzz Custom Field", {"event": test_event.name, "fieldname": "company"}):
+			frappe.get_doc(
+				{
+					"doctype": "Buzz Custom Field",
+					"event": test_event.name,
+					"label": "Company",
+					"fieldname": "company",
+					"fieldtype": "Data",
+					"applied_to": "Ticket",
+					"enabled": 1,
+				}
+			).insert()
+
+		def book_and_get_tickets(bulk: bool) -> list[dict]:
+			attendees = []
+			for i in range(3):
+				add_ons = frappe.get_doc(
+					{
+						"doctype": "Attendee Ticket Add-on",
+						"add_ons": [{"add_on": test_ticket_add_on.name, "value": "L"}],
+					}
+				).insert()
+				attendees.append(
+					{
+						"ticket_type": test_ticket_type.name,
+						"first_name": f"Member {i}",
+						"last_name": "Team",
+						"email": f"member{i}@example.com",
+						"add_ons": add_ons.name,
+						"custom_fields": {"company": "Acme"},
+					}
+				)
+
+			booking = frappe.get_doc(
+				{
+					"doctype": "Event Booking",
+					"event": test_event.name,
+					"user": "Administrator",
+					"attendees": attendees,
+				}
+			).insert()
+			with patch(
+				"buzz.ticketing.doctype.event_booking.event_booking.BULK_TICKET_GENERATION_THRESHOLD",
+				1 if bulk else 100,
+			):
+				booking.submit()
+
+			tickets = []
+			for name in frappe.get_all(
+				"Event Ticket", filters={"booking": booking.name}, pluck="name", order_by="attendee_email"
+			):
+				ticket = frappe.get_doc("Event Ticket", name).as_dict(no_default_fields=True)
+				tickets.append(
+					{
+						**{key: value for key, value in ticket.items() if not isinstance(value, list)},
+						"booking": None,
+						"add_ons": [(row.add_on, row.value) for row in ticket.add_ons],
+						"additional_fields": [(row.fieldname, row.value) for row in ticket.additional_fields],
+					}
+				)
+			return tickets
+
+		self.assertEqual(book_and_get_tickets(bulk=True), book_and_get_tickets(bulk=False))
+
+	def test_bulk_ticket_validation_matches_insert(self):
+		test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		test_ticket_add_on = frappe.get_doc(
+			{"doctype": "Ticket Add-on", "event": test_event.name, "title": "Cap", "price": 0}
+		).insert()
+		test_ticket_type = frappe.get_doc(
+			{"doctype": "Event Ticket Type", "event": test_event.name, "title": "Crew", "price": 0}
+		).insert()
+
+		def make_ticket(**values):
+			return frappe.get_doc(
+				{
+					"doctype": "Event Ticket",
+					"event": test_event.name,
+					"ticket_type": test_ticket_type.name,
+					"first_name": "Crew",
+					"last_name": "Member",
+					"attendee_email": "crew@example.com",
+					"add_ons": [{"add_on": test_ticket_add_on.name, "value": "M"}],
+					"docstatus": 1,
+					**values,
+				}
+			)
+
+		for values, exception in (
+			({"first_name": None, "attendee_name": None}, frappe.MandatoryError),
+			({"ticket_type": "Missing Ticket Type"}, frappe.LinkValidationError),
+			({"attendee_email": "not an email"}, frappe.InvalidEmailAddressError),
+		):
+			with self.subTest(values=values):
+				with self.assertRaises(exception):
+					make_ticket(**values).insert()
+				with self.assertRaises(exception):
+					validate_ticket_for_bulk_insert(make_ticket(**values))
+
+		ticket = make_ticket()
+		validate_ticket_for_bulk_insert(ticket)
+		self.assertTrue(ticket.name)
+		self.assertTrue(ticket.creation and ticket.owner)
+		self.assertEqual(ticket.attendee_name, "Crew Member")
+		self.assertEqual(ticket.fulfillment_status, "Pending")
+		self.assertEqual(
+			[(row.parent, row.parenttype, row.docstatus) for row in ticket.add_ons],
+			[(ticket.name, "Event Ticket", 1)],
+		)
+		self.assertFalse(frappe.db.exists("Event Ticket", ticket.name))
+
 
 class TestProcessBookingAPI(IntegrationTestCase):
 	"""Test the process_booking API endpoint for UTM parameter handling."""
@@ -1,14 +1,22 @@
 # Copyright (c) 2025, BWH Studios and Contributors
 # See license.txt
 
+import json
 import uuid
 from base64 import b32encode
+from unittest.mock import patch
 
 import frappe
 import pyotp
 from frappe.tests import IntegrationTestCase
 
-from buzz.api import process_booking
+from buzz.api import (
+	GUEST_OTP_SINK_KEY,
+	deliver_guest_booking_otp,
+	get_guest_booking_otp_status,
+	process_booking,
+	set_guest_otp_delivery_status,
+)
 
 
 class TestGuestBooking(IntegrationTestCase):
@@ -205,3 +213,51 @@ class TestGuestBooking(IntegrationTestCase):
 				otp="000000",
 			)
 		self.assertIn("Too many failed attempts", str(ctx.exception))
+
+	def _queue_otp_delivery(self, email, delivery_id):
+		otp_secret = b32encode(b"TESTSECRET").decode("utf-8")
+		frappe.cache.set_value(f"guest_booking_otp:email:{email}", otp_secret, expires_in_sec=600)
+		frappe.cache.set_value(f"guest_booking_otp_delivery:email:{email}", delivery_id, expires_in_sec=600)
+		set_guest_otp_delivery_status(delivery_id, "Queued")
+		return pyotp.HOTP(otp_secret).at(0)
+
+	def test_otp_delivery_to_sink(self):
+		email = self._generate_test_email()
+		otp_code = self._queue_otp_delivery(email, "delivery-sink")
+
+		with patch.dict(frappe.conf, {"buzz_otp_sink": 1}):
+			deliver_guest_booking_otp("email", email, "delivery-sink")
+
+		self.assertEqual(get_guest_booking_otp_status("delivery-sink")["status"], "Sent")
+		message = json.loads(frappe.cache.lrange(GUEST_OTP_SINK_KEY, 0, 0)[0])
+		self.assertEqual((message["to"], message["otp"]), (email, otp_code))
+
+	def test_otp_delivery_failure_is_retried_then_reported(self):
+		email = self._generate_test_email()
+		self._queue_otp_delivery(email, "delivery-failing")
+
+		with (
+			patch("buzz.api.send_guest_otp_message", side_effect=TimeoutError),
+			patch("buzz.api.has_retries_left", return_value=True),
+			self.assertRaises(TimeoutError),
+		):
+			# RQ retries the job later
+			deliver_guest_booking_otp("email", email, "delivery-failing")
+		self.assertEqual(get_guest_booking_otp_status("delivery-failing")["status"], "Queued")
+
+		with (
+			patch("buzz.api.send_guest_otp_message", side_effect=TimeoutError),
+			patch("buzz.api.has_retries_left", return_value=False),
+		):
+			deliver_guest_booking_otp("email", email, "delivery-failing")
+		self.assertEqual(get_guest_booking_otp_status("delivery-failing")["status"], "Failed")
+
+	def test_superseded_otp_is_not_sent(self):
+		email = self._generate_test_email()
+		self._queue_otp_delivery(email, "delivery-old")
+		self._queue_otp_delivery(email, "delivery-new")
+
+		with patch("buzz.api.send_guest_otp_message") as mock_send:
+			deliver_guest_booking_otp("email", email, "delivery-old")
+
+		mock_send.assert_not_called()
@@ -0,0 +1,237 @@
+# Copyright (c) 2025, BWH Studios and Contributors
+# See license.txt
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from buzz.payments import record_payment
+from buzz.tasks import release_expired_ticket_holds
+from buzz.ticketing.doctype.event_booking.event_booking import delete_abandoned_bookings
+
+
+class TestTicketReservation(IntegrationTestCase):
+	def setUp(self):
+		self.test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		self.ticket_type = frappe.get_doc(
+			{
+				"doctype": "Event Ticket Type",
+				"event": self.test_event.name,
+				"title": "Limited (Hold Test)",
+				"price": 100,
+				"is_published": True,
+				"max_tickets_available": 2,
+			}
+		).insert()
+
+	def make_booking(self, num_attendees=1):
+		return frappe.get_doc(
+			{
+				"doctype": "Event Booking",
+				"event": self.test_event.name,
+				"user": "Administrator",
+				"attendees": [
+					{
+						"ticket_type": self.ticket_type.name,
+						"first_name": f"Attendee {i}",
+						"email": "a@example.com",
+					}
+					for i in range(num_attendees)
+				],
+			}
+		).insert()
+
+	def get_counters(self):
+		return frappe.db.get_value(
+			"Event Ticket Type", self.ticket_type.name, ["tickets_sold", "tickets_reserved"], as_dict=True
+		)
+
+	def test_draft_booking_holds_tickets(self):
+		booking = self.make_booking(2)
+
+		self.assertTrue(booking.holds_tickets)
+		self.assertIsNotNone(booking.reserved_until)
+		self.assertEqual(self.get_counters().tickets_reserved, 2)
+
+		# capacity is fully held, nobody else can book
+		with self.assertRaises(frappe.ValidationError):
+			self.make_booking(1)
+
+	def test_submit_converts_hold_into_sold_tickets(self):
+		booking = self.make_booking(2)
+		booking.payment_status = "Paid"
+		booking.submit()
+
+		counters = self.get_counters()
+		self.assertEqual(counters.tickets_reserved, 0)
+		self.assertEqual(counters.tickets_sold, 2)
+		self.assertFalse(frappe.db.get_value("Event Booking", booking.name, "holds_tickets"))
+
+	def test_expired_holds_are_released(self):
+		booking = self.make_booking(2)
+		booking.db_set("reserved_until", add_to_date(now_datetime(), minutes=-1))
+
+		with patch.object(frappe.db, "commit"):
+			release_expired_ticket_holds()
+
+		self.assertEqual(self.get_counters().tickets_reserved, 0)
+		self.assertFalse(frappe.db.get_value("Event Booking", booking.name, "holds_tickets"))
+		self.make_booking(2)
+
+	def test_paid_holds_do_not_block_expired_ones(self):
+		paid = self.make_booking(1)
+		# older than any other hold, so both are at the head of the batch
+		paid.db_set("reserved_until", add_to_date(now_datetime(), years=-10, minutes=-1))
+		record_payment("Event Booking", paid.name, 100, paid.currency).db_set("payment_received", 1)
+		expired = self.make_booking(1)
+		expired.db_set("reserved_until", add_to_date(now_datetime(), years=-10))
+
+		with (
+			patch("buzz.tasks.EXPIRED_HOLDS_BATCH_SIZE", 1),
+			patch.object(frappe.db, "commit"),
+		):
+			release_expired_ticket_holds()
+
+		self.assertTrue(frappe.db.get_value("Event Booking", paid.name, "holds_tickets"))
+		self.assertFalse(frappe.db.get_value("Event Booking", expired.name, "holds_tickets"))
+
+	def test_deleting_draft_releases_hold(self):
+		booking = self.make_booking(1)
+		booking.delete()
+
+		self.assertEqual(self.get_counters().tickets_reserved, 0)
+
+	def test_abandoned_bookings_are_deleted(self):
+		add_on = frappe.get_doc(
+			{"doctype": "Ticket Add-on", "event": self.test_event.name, "title": "Cap", "price": 10}
+		).insert()
+
+		def make_attendee_add_on():
+			return frappe.get_doc(
+				{"doctype": "Attendee Ticket Add-on", "add_ons": [{"add_on": add_on.name, "value": "L"}]}
+			).insert()
+
+		abandoned = self.make_booking(1)
+		abandoned.attendees[0].add_ons = make_attendee_add_on().name
+		abandoned.save()
+		abandoned.release_reserved_tickets()
+		abandoned_payment = record_payment("Event Booking", abandoned.name, 100, abandoned.currency)
+		orphaned_add_on = make_attendee_add_on()
+
+		paid = self.make_booking(1)
+		paid.release_reserved_tickets()
+		record_payment("Event Booking", paid.name, 100, paid.currency).db_set("payment_received", 1)
+
+		long_ago = add_to_date(now_datetime(), days=-31)
+		for doctype, name in (
+			("Event Booking", abandoned.name),
+			("Event Booking", paid.name),
+			("Attendee Ticket Add-on", orphaned_add_on.name),
+		):
+			frappe.db.set_value(doctype, name, "modified", long_ago, update_modified=False)
+
+		with patch.object(frappe.db, "commit"):
+			deleted = delete_abandoned_bookings(30)
+
+		self.assertGreaterEqual(deleted.bookings, 1)
+		self.assertFalse(frappe.db.exists("Event Booking", abandoned.name))
+		self.assertFalse(frappe.db.exists("Event Booking Attendee", {"parent": abandoned.name}))
+		self.assertFalse(frappe.db.exists("Event Payment", abandoned_payment.name))
+		self.assertFalse(frappe.db.exists("Attendee Ticket Add-on", abandoned.attendees[0].add_ons))
+		self.assertFalse(frappe.db.exists("Attendee Ticket Add-on", orphaned_add_on.name))
+		# the booking with a received payment is still waiting to be processed
+		self.assertTrue(frappe.db.exists("Event Booking", paid.name))
+
+
+def book_ticket_in_new_connection(
+	site: str, sites_path: str, event: str, ticket_type: str, index: int
+) -> bool:
+	"""Runs in a worker thread with its own site connection, like a separate web request would."""
+	frappe.init(site=site, sites_path=sites_path)
+	frappe.connect()
+	frappe.set_user("Administrator")
+	try:
+		frappe.get_doc(
+			{
+				"doctype": "Event Booking",
+				"event": event,
+				"user": "Administrator",
+				"attendees": [
+					{"ticket_type": ticket_type, "first_name": f"Rush {index}", "email": "rush@example.com"}
+				],
+			}
+		).insert(ignore_permissions=True)
+		frappe.db.commit()
+		return True
+	except (frappe.ValidationError, frappe.QueryDeadlockError, frappe.QueryTimeoutError):
+		frappe.db.rollback()
+		return False
+	finally:
+		frappe.destroy()
+
+
+class TestConcurrentTicketReservation(IntegrationTestCase):
+	"""Flash-sale harness: many parallel bookings racing for a low-capacity ticket type.
+
+	Worker threads use their own database connections, so the fixtures are committed here and
+	removed again in `tearDownClass`.
+	"""
+
+	CAPACITY = 5
+	ATTEMPTS = 200
+	WORKERS = 20
+
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		cls.ticket_type = frappe.get_doc(
+			{
+				"doctype": "Event Ticket Type",
+				"event": cls.test_event.name,
+				"title": "Flash Sale (Concurrency Test)",
+				"price": 100,
+				"is_published": True,
+				"max_tickets_available": cls.CAPACITY,
+			}
+		).insert()
+		frappe.db.commit()
+
+	@classmethod
+	def tearDownClass(cls):
+		bookings = frappe.get_all(
+			"Event Booking Attendee", filters={"ticket_type": cls.ticket_type.name}, pluck="parent"
+		)
+		for booking in set(bookings):
+			frappe.delete_doc("Event Booking", booking, force=True, ignore_permissions=True)
+		frappe.delete_doc("Event Ticket Type", cls.ticket_type.name, force=True, ignore_permissions=True)
+		frappe.db.commit()
+		super().tearDownClass()
+
+	def test_parallel_bookings_never_oversell(self):
+		site, sites_path = frappe.local.site, frappe.local.sites_path
+		with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
+			results = list(
+				executor.map(
+					lambda index: book_ticket_in_new_connection(
+						site, sites_path, self.test_event.name, str(self.ticket_type.name), index
+					),
+					range(self.ATTEMPTS),
+				)
+			)
+
+		self.assertEqual(sum(results), self.CAPACITY)
+		self.assertEqual(
+			frappe.db.get_value("Event Ticket Type", self.ticket_type.name, "tickets_reserved"),
+			self.CAPACITY,
+		)
+		self.assertEqual(
+			frappe.db.count(
+				"Event Booking Attendee",
+				{"ticket_type": self.ticket_type.name, "parenttype": "Event Booking"},
+			),
+			self.CAPACITY,
+		)
@@ -1,8 +1,15 @@
 // Copyright (c) 2025, BWH Studios and contributors
 // For license information, please see license.txt
 
-// frappe.ui.form.on("Event Payment", {
-// 	refresh(frm) {
-
-// 	},
-// });
+frappe.ui.form.on("Event Payment", {
+	refresh(frm) {
+		if (frm.doc.processing_status === "Dead Letter") {
+			frm.add_custom_button(__("Retry Processing"), () => {
+				frm.call("retry_processing").then(() => {
+					frappe.show_alert({ message: __("Payment queued for processing"), indicator: "green" });
+					frm.reload_doc();
+				});
+			});
+		}
+	},
+});
@@ -1,8 +1,27 @@
 # Copyright (c) 2025, BWH Studios and contributors
 # For license information, please see license.txt
 
-# import frappe
+import time
+
+import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.query_builder import DocType
+from frappe.utils import add_to_date, now_datetime
+
+from buzz.payments import get_controller, get_integration_request_data
+
+MAX_PROCESSING_ATTEMPTS = 5
+PROCESSING_RETRY_BATCH_SIZE = 500
+# a processing job that hasn't finished after this long is considered lost
+PROCESSING_RETRY_AFTER_MINUTES = 10
+
+RECONCILIATION_BATCH_SIZE = 200
+# unpaid bookings are checked with the gateway once their callback is this late
+RECONCILE_AFTER_MINUTES = 30
+# and expired when the gateway still has no payment for them after this long
+EXPIRE_UNPAID_BOOKINGS_AFTER_HOURS = 24
+PAID_STATUSES = ("Authorized", "Completed")
 
 
 class EventPayment(Document):
@@ -16,14 +35,282 @@ class EventPayment(Document):
 
 		amount: DF.Currency
 		currency: DF.Link | None
+		idempotency_key: DF.Data | None
 		name: DF.Int | None
 		order_id: DF.Data | None
 		payment_gateway: DF.Link | None
 		payment_id: DF.Data | None
 		payment_received: DF.Check
+		processing_attempts: DF.Int
+		processing_status: DF.Literal["", "Pending", "In Progress", "Completed", "Failed", "Dead Letter"]
 		reference_docname: DF.DynamicLink | None
 		reference_doctype: DF.Link | None
 		user: DF.Link
 	# end: auto-generated types
 
-	pass
+	@frappe.whitelist()
+	def retry_processing(self):
+		"""Queue a payment that ran out of attempts again, e.g. after fixing what made it fail."""
+		self.check_permission("write")
+		if self.processing_status != "Dead Letter":
+			frappe.throw(_("Only payments in the dead letter state can be retried"))
+
+		self.db_set({"processing_status": "Pending", "processing_attempts": 0})
+		enqueue_payment_processing(self.name)
+
+
+def enqueue_payment_processing(payment: str | int):
+	# the payment name doubles as idempotency key, a payment never has two processing jobs in flight
+	frappe.enqueue(
+		process_payment,
+		queue="default",
+		job_id=f"buzz:process_payment:{payment}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		payment=payment,
+	)
+
+
+def process_payment(payment: str | int):
+	"""Submit the booking of a received payment.
+
+	Failed attempts are retried by `retry_payment_processing`, after `MAX_PROCESSING_ATTEMPTS` the
+	payment is moved to the dead letter state and waits for someone to retry it from the form.
+	"""
+	payment_doc = frappe.get_doc("Event Payment", payment, for_update=True)
+	if not payment_doc.payment_received or payment_doc.processing_status in ("Completed", "Dead Letter"):
+		return
+
+	attempts = payment_doc.processing_attempts + 1
+	payment_doc.db_set({"processing_status": "In Progress", "processing_attempts": attempts})
+	frappe.db.commit()
+
+	try:
+		# lock the booking, the expired holds task may be looking at it
+		booking = frappe.get_doc(
+			payment_doc.reference_doctype, payment_doc.reference_docname, for_update=True
+		)
+		if booking.docstatus == 0:
+			booking.submit_paid_booking()
+	except Exception:
+		frappe.db.rollback()
+		dead_letter = attempts >= MAX_PROCESSING_ATTEMPTS
+		frappe.log_error(
+			title="Payment moved to dead letter" if dead_letter else "Payment processing failed",
+			reference_doctype="Event Payment",
+			reference_name=payment,
+		)
+		payment_doc.db_set("processing_status", "Dead Letter" if dead_letter else "Failed")
+		frappe.db.commit()
+		return
+
+	if booking.docstatus == 2:
+		# retrying cannot submit a cancelled booking, the payment needs a refund or a new booking
+		frappe.db.rollback()
+		frappe.log_error(
+			title="Payment moved to dead letter",
+			message=_("Booking {0} was cancelled before its payment was processed").format(booking.name),
+			reference_doctype="Event Payment",
+			reference_name=payment,
+		)
+		payment_doc.db_set("processing_status", "Dead Letter")
+		frappe.db.commit()
+		return
+
+	payment_doc.db_set("processing_status", "Completed")
+	frappe.db.commit()
+
+
+def retry_payment_processing():
+	"""Re-enqueue failed payments and payments whose processing job never finished."""
+	payments = frappe.get_all(
+		"Event Payment",
+		filters={
+			"payment_received": 1,
+			"processing_status": ("in", ["Pending", "In Progress", "Failed"]),
+			"processing_attempts": ("<", MAX_PROCESSING_ATTEMPTS),
+			"modified": ("<", add_to_date(now_datetime(), minutes=-PROCESSING_RETRY_AFTER_MINUTES)),
+		},
+		pluck="name",
+		limit=PROCESSING_RETRY_BATCH_SIZE,
+	)
+
+	for payment in payments:
+		enqueue_payment_processing(payment)
+
+
+def reconcile_payments() -> dict:
+	"""Settle draft bookings whose payment callback never arrived or never went through.
+
+	Integration Requests that the gateway marked paid are applied to their draft booking, stale unpaid
+	drafts are checked with the gateway and paid or expired. Both are scanned in keyset order, so each
+	batch is a cheap index range. Returns counts and timings of the run.
+	"""
+	summary = frappe._dict()
+
+	started = time.monotonic()
+	summary.unmatched_requests = 0
+	for batch in iter_keyset_batches(get_unmatched_integration_requests):
+		for request in batch:
+			summary.unmatched_requests += reconcile_booking(request.reference_docname, request.status)
+	summary.unmatched_requests_seconds = round(time.monotonic() - started, 3)
+
+	started = time.monotonic()
+	summary.stale_bookings = summary.paid_bookings = summary.expired_bookings = 0
+	expiry_cutoff = add_to_date(now_datetime(), hours=-EXPIRE_UNPAID_BOOKINGS_AFTER_HOURS)
+	for batch in iter_keyset_batches(get_stale_unpaid_bookings):
+		for booking in batch:
+			summary.stale_bookings += 1
+			try:
+				payment_status = get_gateway_payment_status("Event Booking", booking.name)
+			except Exception:
+				frappe.log_error(
+					title="Payment status check failed",
+					reference_doctype="Event Booking",
+					reference_name=booking.name,
+				)
+				continue
+
+			if payment_status in PAID_STATUSES:
+				summary.paid_bookings += reconcile_booking(booking.name, payment_status)
+			elif booking.creation < expiry_cutoff:
+				summary.expired_bookings += expire_booking(booking.name)
+	summary.stale_bookings_seconds = round(time.monotonic() - started, 3)
+
+	return summary
+
+
+def iter_keyset_batches(get_batch):
+	after = ""
+	while batch := get_batch(after):
+		yield batch
+		if len(batch) < RECONCILIATION_BATCH_SIZE:
+			return
+		after = batch[-1].name
+
+
+def get_unmatched_integration_requests(after: str) -> list[dict]:
+	"""Paid Integration Requests whose booking is still a draft without a received payment."""
+	IntegrationRequest = DocType("Integration Request")
+	EventBooking = DocType("Event Booking")
+
+	return (
+		frappe.qb.from_(IntegrationRequest)
+		.join(EventBooking)
+		.on(EventBooking.name == IntegrationRequest.reference_docname)
+		.select(IntegrationRequest.name, IntegrationRequest.reference_docname, IntegrationRequest.status)
+		.where(IntegrationRequest.reference_doctype == "Event Booking")
+		.where(IntegrationRequest.status.isin(PAID_STATUSES))
+		.where(IntegrationRequest.name > after)
+		.where(EventBooking.docstatus == 0)
+		.where(EventBooking.name.notin(get_received_payments_query()))
+		.orderby(IntegrationRequest.name)
+		.limit(RECONCILIATION_BATCH_SIZE)
+	).run(as_dict=True)
+
+
+def get_stale_unpaid_bookings(after: str) -> list[dict]:
+	EventBooking = DocType("Event Booking")
+
+	return (
+		frappe.qb.from_(EventBooking)
+		.select(EventBooking.name, EventBooking.creation)
+		.where(EventBooking.docstatus == 0)
+		.where(EventBooking.payment_status == "Unpaid")
+		.where(EventBooking.status != "Expired")
+		.where(EventBooking.total_amount > 0)
+		.where(EventBooking.creation < add_to_date(now_datetime(), minutes=-RECONCILE_AFTER_MINUTES))
+		.where(EventBooking.name > after)
+		.where(EventBooking.name.notin(get_received_payments_query()))
+		.orderby(EventBooking.name)
+		.limit(RECONCILIATION_BATCH_SIZE)
+	).run(as_dict=True)
+
+
+def get_received_payments_query():
+	# received payments are already handled by `process_payment`
+	EventPayment = DocType("Event Payment")
+	return (
+		frappe.qb.from_(EventPayment)
+		.select(EventPayment.reference_docname)
+		.where(EventPayment.reference_doctype == "Event Booking")
+		.where(EventPayment.reference_docname.isnotnull())
+		.where(EventPayment.payment_received == 1)
+	)
+
+
+def get_gateway_payment_status(reference_doctype: str, reference_docname: str) -> str | None:
+	"""Status of the latest payment attempt of a document, asking the gateway when it can tell.
+
+	Gateway controllers that implement `get_payment_status(integration_request_data)` are queried,
+	for the others the status the Payments app recorded on the Integration Request is used.
+	"""
+	request = frappe.get_all(
+		"Integration Request",
+		filters={"reference_doctype": reference_doctype, "reference_docname": reference_docname},
+		fields=["status"],
+		order_by="creation desc",
+		limit=1,
+	)
+	if request and request[0].status in PAID_STATUSES:
+		return request[0].status
+
+	payment_gateway = frappe.db.get_value(
+		"Event Payment",
+		{"reference_doctype": reference_doctype, "reference_docname": reference_docname},
+		"payment_gateway",
+		order_by="creation desc",
+	)
+	if not payment_gateway:
+		return request[0].status if request else None
+
+	controller = get_controller(payment_gateway)
+	if not hasattr(controller, "get_payment_status"):
+		return request[0].status if request else None
+
+	return controller.get_payment_status(get_integration_request_data(reference_doctype, reference_docname))
+
+
+def reconcile_booking(booking: str, payment_status: str) -> bool:
+	"""Record the payment of a draft booking the gateway reported as paid."""
+	try:
+		booking_doc = frappe.get_doc("Event Booking", booking)
+		if booking_doc.docstatus != 0:
+			return False
+		# idempotent, a payment recorded in the meantime is left alone
+		booking_doc.on_payment_authorized(payment_status)
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(
+			title="Payment reconciliation failed", reference_doctype="Event Booking", reference_name=booking
+		)
+		return False
+
+	frappe.db.commit()
+	return True
+
+
+def expire_booking(booking: str) -> bool:
+	"""Release the holds of a draft booking that was never paid and mark it expired."""
+	try:
+		# lock the booking, a late payment callback may be recording its payment right now
+		booking_doc = frappe.get_doc("Event Booking", booking, for_update=True)
+		if (
+			booking_doc.docstatus != 0
+			or booking_doc.payment_status != "Unpaid"
+			or booking_doc.status == "Expired"
+		):
+			frappe.db.commit()
+			return False
+
+		booking_doc.release_reserved_tickets()
+		booking_doc.db_set("status", "Expired")
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(
+			title="Booking expiry failed", reference_doctype="Event Booking", reference_name=booking
+		)
+		return False
+
+	frappe.db.commit()
+	return True
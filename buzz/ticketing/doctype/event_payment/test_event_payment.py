@@ -1,8 +1,20 @@
 # Copyright (c) 2025, BWH Studios and Contributors
 # See license.txt
 
-# import frappe
+import json
+from unittest.mock import patch
+
+import frappe
 from frappe.tests import IntegrationTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from buzz.payments import record_payment
+from buzz.ticketing.doctype.event_payment.event_payment import (
+	EXPIRE_UNPAID_BOOKINGS_AFTER_HOURS,
+	MAX_PROCESSING_ATTEMPTS,
+	process_payment,
+	reconcile_payments,
+)
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -11,10 +23,195 @@ EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
 
-class IntegrationTestEventPayment(IntegrationTestCase):
+class EventPaymentTestCase(IntegrationTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		ticket_type = frappe.get_doc(
+			{
+				"doctype": "Event Ticket Type",
+				"event": test_event.name,
+				"title": "Paid (Test)",
+				"price": 500,
+			}
+		).insert()
+		self.booking = frappe.get_doc(
+			{
+				"doctype": "Event Booking",
+				"event": test_event.name,
+				"user": "Administrator",
+				"attendees": [
+					{"ticket_type": ticket_type.name, "first_name": "John", "email": "john@email.com"}
+				],
+			}
+		).insert()
+		self.payment = record_payment(
+			"Event Booking", self.booking.name, self.booking.total_amount, self.booking.currency
+		)
+
+
+class IntegrationTestEventPayment(EventPaymentTestCase):
 	"""
 	Integration tests for EventPayment.
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	@patch("frappe.enqueue")
+	def test_repeated_callbacks_queue_booking_once(self, mock_enqueue):
+		self.booking.on_payment_authorized("Authorized")
+		self.booking.on_payment_authorized("Completed")
+
+		mock_enqueue.assert_called_once()
+		self.payment.reload()
+		self.assertEqual(self.payment.payment_received, 1)
+		self.assertEqual(self.payment.processing_status, "Pending")
+
+	@patch("frappe.enqueue")
+	def test_processing_submits_booking_once(self, mock_enqueue):
+		self.booking.on_payment_authorized("Completed")
+
+		process_payment(self.payment.name)
+		process_payment(self.payment.name)
+
+		self.booking.reload()
+		self.payment.reload()
+		self.assertEqual(self.booking.docstatus, 1)
+		self.assertEqual(self.booking.payment_status, "Paid")
+		self.assertEqual(self.payment.processing_status, "Completed")
+		self.assertEqual(self.payment.processing_attempts, 1)
+		self.assertEqual(frappe.db.count("Event Ticket", {"booking": self.booking.name}), 1)
+
+	@patch("frappe.enqueue")
+	def test_failing_payment_moves_to_dead_letter(self, mock_enqueue):
+		self.booking.on_payment_authorized("Completed")
+
+		with patch(
+			"buzz.ticketing.doctype.event_booking.event_booking.EventBooking.submit_paid_booking",
+			side_effect=frappe.ValidationError,
+		):
+			process_payment(self.payment.name)
+			self.assertEqual(
+				frappe.db.get_value("Event Payment", self.payment.name, "processing_status"), "Failed"
+			)
+
+			for _attempt in range(MAX_PROCESSING_ATTEMPTS - 1):
+				process_payment(self.payment.name)
+
+		self.payment.reload()
+		self.assertEqual(self.payment.processing_status, "Dead Letter")
+		self.assertEqual(self.payment.processing_attempts, MAX_PROCESSING_ATTEMPTS)
+
+		self.payment.retry_processing()
+		process_payment(self.payment.name)
+
+		self.booking.reload()
+		self.assertEqual(self.booking.docstatus, 1)
+
+	@patch("frappe.enqueue")
+	def test_payment_of_cancelled_booking_moves_to_dead_letter(self, mock_enqueue):
+		self.booking.on_payment_authorized("Completed")
+		frappe.db.set_value("Event Booking", self.booking.name, "docstatus", 2)
+
+		process_payment(self.payment.name)
+
+		self.payment.reload()
+		self.assertEqual(self.payment.processing_status, "Dead Letter")
+		self.assertEqual(self.payment.processing_attempts, 1)
+
+
+class StandInGatewayController:
+	"""Answers payment status queries the way a gateway controller would."""
+
+	def __init__(self, payment_status=None):
+		self.payment_status = payment_status
+
+	def get_payment_status(self, integration_request_data):
+		return self.payment_status
+
+
+@patch("frappe.enqueue")
+class TestPaymentReconciliation(EventPaymentTestCase):
+	def setUp(self):
+		super().setUp()
+		if not frappe.db.exists("Payment Gateway", "Stand-in"):
+			frappe.get_doc({"doctype": "Payment Gateway", "gateway": "Stand-in"}).insert()
+		self.payment.db_set("payment_gateway", "Stand-in")
+
+	def make_stale(self, hours):
+		frappe.db.set_value(
+			"Event Booking",
+			self.booking.name,
+			"creation",
+			add_to_date(now_datetime(), hours=-hours),
+			update_modified=False,
+		)
+
+	def reconcile(self, payment_status=None):
+		with patch(
+			"buzz.ticketing.doctype.event_payment.event_payment.get_controller",
+			return_value=StandInGatewayController(payment_status),
+		):
+			return reconcile_payments()
+
+	def test_stale_booking_paid_at_gateway_is_recorded(self, mock_enqueue):
+		self.make_stale(1)
+
+		summary = self.reconcile("Completed")
+
+		self.assertGreaterEqual(summary.paid_bookings, 1)
+		self.assertEqual(frappe.db.get_value("Event Payment", self.payment.name, "payment_received"), 1)
+		mock_enqueue.assert_called()
+
+		# the next run leaves the recorded payment to the processing job
+		mock_enqueue.reset_mock()
+		self.reconcile("Completed")
+		mock_enqueue.assert_not_called()
+
+	def test_unpaid_booking_expires(self, mock_enqueue):
+		self.make_stale(1)
+		self.reconcile()
+		self.assertEqual(
+			frappe.db.get_value("Event Booking", self.booking.name, "status"), "Approval Pending"
+		)
+
+		self.make_stale(EXPIRE_UNPAID_BOOKINGS_AFTER_HOURS + 1)
+		summary = self.reconcile()
+
+		self.assertGreaterEqual(summary.expired_bookings, 1)
+		self.booking.reload()
+		self.assertEqual(self.booking.status, "Expired")
+		self.assertEqual(self.booking.holds_tickets, 0)
+
+	def test_unmatched_integration_request_is_applied(self, mock_enqueue):
+		frappe.get_doc(
+			{
+				"doctype": "Integration Request",
+				"reference_doctype": "Event Booking",
+				"reference_docname": self.booking.name,
+				"status": "Completed",
+				"data": json.dumps({"payment": self.payment.name, "payment_gateway": "Stand-in"}),
+			}
+		).insert(ignore_permissions=True)
+
+		summary = self.reconcile()
+
+		self.assertGreaterEqual(summary.unmatched_requests, 1)
+		self.assertEqual(frappe.db.get_value("Event Payment", self.payment.name, "payment_received"), 1)
+
+	def test_failing_expiry_does_not_stop_the_run(self, mock_enqueue):
+		self.make_stale(EXPIRE_UNPAID_BOOKINGS_AFTER_HOURS + 1)
+
+		with (
+			patch(
+				"buzz.ticketing.doctype.event_booking.event_booking.EventBooking.release_reserved_tickets",
+				side_effect=frappe.ValidationError,
+			),
+			patch("frappe.log_error") as mock_log_error,
+			patch.object(frappe.db, "rollback"),
+		):
+			summary = self.reconcile()
+
+		self.assertEqual(summary.expired_bookings, 0)
+		self.assertIn("stale_bookings_seconds", summary)
+		self.assertEqual(mock_log_error.call_args.kwargs["reference_name"], self.booking.name)
+		self.assertNotEqual(frappe.db.get_value("Event Booking", self.booking.name, "status"), "Expired")
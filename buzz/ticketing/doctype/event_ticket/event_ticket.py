@@ -1,11 +1,32 @@
 # Copyright (c) 2025, BWH Studios and contributors
 # For license information, please see license.txt
 
+import re
+
 import frappe
 from frappe.core.api.user_invitation import invite_by_email
 from frappe.model.document import Document
-
-from buzz.utils import generate_ics_file, generate_qr_code_file, only_if_app_installed
+from frappe.utils import add_to_date, create_batch, now_datetime
+from frappe.utils.html_utils import sanitize_html
+
+from buzz.ticketing.doctype.event_ticket_type.event_ticket_type import update_tickets_sold
+from buzz.utils import (
+	generate_ics_file,
+	generate_qr_code_file,
+	get_qr_data_uri,
+	only_if_app_installed,
+	render_cached_template,
+)
+
+MAX_FULFILLMENT_ATTEMPTS = 5
+FULFILLMENT_RETRY_BATCH_SIZE = 500
+# a ticket stuck in a non-final state for this long lost its job (killed worker, failed attempt)
+FULFILLMENT_RETRY_AFTER_MINUTES = 10
+# ticket emails rendered and queued per transaction by the bulk paths
+TICKET_EMAIL_BATCH_SIZE = 200
+# tickets rendered by one run of the PDF generator
+TICKET_PDF_BATCH_SIZE = 50
+PRINT_BODY_PATTERN = re.compile(r"<body[^>]*>(.*)</body>", re.DOTALL | re.IGNORECASE)
 
 
 class EventTicket(Document):
@@ -29,8 +50,12 @@ class EventTicket(Document):
 		coupon_used: DF.Link | None
 		event: DF.Link | None
 		first_name: DF.Data
+		fulfillment_attempts: DF.Int
+		fulfillment_status: DF.Literal["", "Pending", "In Progress", "Completed", "Failed"]
 		last_name: DF.Data | None
 		qr_code: DF.AttachImage | None
+		ticket_email_sent: DF.Check
+		ticket_pdf: DF.Attach | None
 		ticket_type: DF.Link
 	# end: auto-generated types
 
@@ -47,41 +72,73 @@ class EventTicket(Document):
 
 	def before_submit(self):
 		self.validate_coupon_usage()
-		self.generate_qr_code()
+		self.fulfillment_status = "Pending"
 
 	def on_submit(self):
-		try:
-			self.send_ticket_email()
-		except Exception as e:
-			frappe.log_error("Error sending ticket email: " + str(e))
+		if self.ticket_type:
+			update_tickets_sold(self.ticket_type, 1)
+
+		# QR code, email (with print format PDF and calendar invite) and Zoom registration are slow,
+		# they are produced by a background job once the booking transaction has committed
+		self.enqueue_fulfillment()
+
+	def enqueue_fulfillment(self):
+		enqueue_ticket_fulfillment(self.name)
+
+	def fulfill(self):
+		"""Produce the ticket artifacts, every step is skipped if an earlier attempt already did it."""
+		if not self.qr_code and not self.defer_qr_code_until_viewed():
+			self.ensure_qr_code()
+			frappe.db.commit()
+
+		if not self.ticket_email_sent:
+			if self.emails_ticket_pdf():
+				self.ensure_ticket_pdf()
+				frappe.db.commit()
+
+			if self.send_ticket_email():
+				self.db_set("ticket_email_sent", 1)
+				frappe.db.commit()
 
 		# TODO: bring back after we have templates
 		# try:
 		# 	self.send_user_invitation()
 		# except Exception as e:
 		# 	frappe.log_error("Error sending user invitation: " + str(e))
-		self.create_zoom_registration_if_applicable()
+		if not self.get("zoom_webinar_registration"):
+			self.create_zoom_registration_if_applicable()
 
 	@only_if_app_installed("zoom_integration")
 	def create_zoom_registration_if_applicable(self):
 		event_doc = frappe.get_cached_doc("Buzz Event", self.event)
 
-		if event_doc.zoom_webinar:
-			doc = {
-				"doctype": "Zoom Webinar Registration",
-				"webinar": event_doc.zoom_webinar,
-				"email": self.attendee_email,
-				"first_name": self.first_name,
-				"last_name": self.last_name or "-",
-			}
-			registration = frappe.get_doc(doc).insert(ignore_permissions=True)
+		if not event_doc.zoom_webinar:
+			return
 
-			try:
-				registration.submit()
-				# Store the registration reference on the ticket
-				self.db_set("zoom_webinar_registration", registration.name)
-			except Exception:
-				frappe.log_error("Failed to create registration on Zoom")
+		# reuse the registration of an earlier attempt or ticket of the same attendee
+		registration = frappe.db.get_value(
+			"Zoom Webinar Registration",
+			{"webinar": event_doc.zoom_webinar, "email": self.attendee_email, "docstatus": ("<", 2)},
+			order_by="docstatus desc, creation desc",
+		)
+		if registration:
+			registration = frappe.get_doc("Zoom Webinar Registration", registration)
+		else:
+			registration = frappe.get_doc(
+				{
+					"doctype": "Zoom Webinar Registration",
+					"webinar": event_doc.zoom_webinar,
+					"email": self.attendee_email,
+					"first_name": self.first_name,
+					"last_name": self.last_name or "-",
+				}
+			).insert(ignore_permissions=True)
+
+		# a failure on Zoom's side fails the fulfillment, which rolls back the draft and retries the ticket
+		if registration.docstatus == 0:
+			registration.submit()
+
+		self.db_set("zoom_webinar_registration", registration.name)
 
 	def send_user_invitation(self):
 		invite_by_email(
@@ -91,47 +148,49 @@ class EventTicket(Document):
 			app_name="buzz",
 		)
 
-	def send_ticket_email(self, now: bool = False):
-		send_ticket_email = frappe.get_cached_value("Buzz Event", self.event, "send_ticket_email")
+	def send_ticket_email(self, now: bool = False, email_context: frappe._dict | None = None) -> bool:
+		"""Queue the ticket email, returns False if the event doesn't send ticket emails."""
+		email_context = email_context or get_ticket_email_context(self.event)
+		if not email_context:
+			return False
 
-		if not send_ticket_email:
-			return
-
-		event_title, ticket_template, ticket_print_format, venue = frappe.get_cached_value(
-			"Buzz Event", self.event, ["title", "ticket_email_template", "ticket_print_format", "venue"]
-		)
+		frappe.sendmail(**self.get_ticket_email_args(email_context), now=now)
+		return True
 
-		# Fallback to global setting if event-level not set
-		if not ticket_template:
-			ticket_template = frappe.db.get_single_value("Buzz Settings", "default_ticket_email_template")
-
-		subject = frappe._("Your ticket to {0} 🎟️").format(event_title)
-		event_doc = frappe.get_cached_doc("Buzz Event", self.event)
+	def get_ticket_email_args(self, email_context: frappe._dict) -> dict:
+		event_doc = email_context.event_doc
 		args = {
 			"doc": self,
 			"event_doc": event_doc,
-			"event_title": event_title,
-			"venue": venue,
+			"event_title": event_doc.title,
+			"venue": event_doc.venue,
 		}
 
-		if ticket_template:
-			from frappe.email.doctype.email_template.email_template import get_email_template
-
-			email_template = get_email_template(ticket_template, args)
-			subject = email_template.get("subject")
-			content = email_template.get("message")
+		subject = frappe._("Your ticket to {0} 🎟️").format(event_doc.title)
+		content = None
+		if email_context.email_template:
+			email_template = email_context.email_template
+			# same as `EmailTemplate.get_formatted_email`, with compiled templates
+			subject = sanitize_html(render_cached_template(email_template.subject, args))
+			content = render_cached_template(
+				email_template.response_html if email_template.use_html else email_template.response_, args
+			)
 
 		attachments = []
 
 		if event_doc.attach_email_ticket:
-			attachments.append(
-				{
-					"print_format_attachment": 1,
-					"doctype": self.doctype,
-					"name": self.name,
-					"print_format": ticket_print_format or "Standard Ticket",
-				}
-			)
+			ticket_pdf_file = self.get_ticket_pdf_file()
+			if ticket_pdf_file:
+				attachments.append({"fid": ticket_pdf_file})
+			else:
+				attachments.append(
+					{
+						"print_format_attachment": 1,
+						"doctype": self.doctype,
+						"name": self.name,
+						"print_format": get_ticket_print_format(self.event),
+					}
+				)
 
 		if event_doc.attach_calendar_invite:
 			ics_content = generate_ics_file(event_doc, self.attendee_email)
@@ -142,17 +201,16 @@ class EventTicket(Document):
 				}
 			)
 
-		frappe.sendmail(
-			recipients=[self.attendee_email],
-			subject=subject,
-			content=content if ticket_template else None,
-			template="ticket" if not ticket_template else None,
-			args=args,
-			reference_doctype=self.doctype,
-			reference_name=self.name,
-			now=now,
-			attachments=attachments,
-		)
+		return {
+			"recipients": [self.attendee_email],
+			"subject": subject,
+			"content": content,
+			"template": "ticket" if not email_context.email_template else None,
+			"args": args,
+			"reference_doctype": self.doctype,
+			"reference_name": self.name,
+			"attachments": attachments,
+		}
 
 	def validate_coupon_usage(self):
 		if not self.coupon_used:
@@ -162,6 +220,91 @@ class EventTicket(Document):
 		if coupon.is_used_up():
 			frappe.throw(frappe._("Coupon has been already used up maximum number of times!"))
 
+	def defer_qr_code_until_viewed(self) -> bool:
+		# the ticket email and its print format attachment embed the QR code
+		return bool(
+			frappe.get_cached_doc("Buzz Settings").render_ticket_qr_code_on_view
+			and not frappe.get_cached_value("Buzz Event", self.event, "send_ticket_email")
+		)
+
+	def ensure_qr_code(self) -> str | None:
+		if not self.qr_code and self.docstatus == 1:
+			self.generate_qr_code()
+			self.db_set("qr_code", self.qr_code)
+		return self.qr_code
+
+	def get_qr_code_for_view(self) -> str | None:
+		"""QR code to show to the attendee without writing anything in the request.
+
+		A code deferred until viewed is served from the render cache while a background job stores it.
+		"""
+		if self.qr_code or self.docstatus != 1:
+			return self.qr_code
+
+		enqueue_ticket_qr_code(self.name)
+		return get_qr_data_uri(self.name)
+
+	def emails_ticket_pdf(self) -> bool:
+		return bool(
+			frappe.get_cached_value("Buzz Event", self.event, "send_ticket_email")
+			and frappe.get_cached_value("Buzz Event", self.event, "attach_email_ticket")
+		)
+
+	def ensure_ticket_pdf(self) -> str | None:
+		"""URL of the stored ticket PDF, rendered if the ticket doesn't have one (yet)."""
+		if not self.ticket_pdf and self.docstatus == 1:
+			render_ticket_pdfs([self])
+		return self.ticket_pdf
+
+	def get_ticket_pdf_file(self) -> str | None:
+		if not self.ticket_pdf:
+			return None
+
+		return frappe.db.get_value(
+			"File",
+			{"file_url": self.ticket_pdf, "attached_to_doctype": self.doctype, "attached_to_name": self.name},
+		)
+
+	def store_ticket_pdf(self, pdf: bytes):
+		ticket_pdf_file = frappe.get_doc(
+			{
+				"doctype": "File",
+				"content": pdf,
+				"attached_to_doctype": self.doctype,
+				"attached_to_name": self.name,
+				"attached_to_field": "ticket_pdf",
+				"file_name": f"ticket-{self.name}.pdf",
+				"is_private": 1,
+			}
+		).save(ignore_permissions=True)
+		self.db_set("ticket_pdf", ticket_pdf_file.file_url)
+
+	def clear_ticket_pdf(self):
+		"""Drop the stored PDF, it is rendered again the next time it is needed."""
+		if not self.ticket_pdf:
+			return
+
+		for ticket_pdf_file in frappe.get_all(
+			"File",
+			filters={
+				"attached_to_doctype": self.doctype,
+				"attached_to_name": self.name,
+				"attached_to_field": "ticket_pdf",
+			},
+			pluck="name",
+		):
+			frappe.delete_doc("File", ticket_pdf_file, ignore_permissions=True)
+
+		self.db_set("ticket_pdf", None, update_modified=False)
+
+	def before_update_after_submit(self):
+		# transfers and edits change what is printed on the ticket
+		if any(
+			self.has_value_changed(fieldname)
+			for fieldname in ("first_name", "last_name", "attendee_email", "ticket_type")
+		):
+			self.clear_ticket_pdf()
+
 	def generate_qr_code(self):
 		self.qr_code = generate_qr_code_file(
 			doc=self,
@@ -171,6 +314,8 @@ class EventTicket(Document):
 
 	def on_cancel(self):
 		self.ignore_linked_doctypes = ["Event Booking", "Ticket Cancellation Request"]
+		if self.ticket_type:
+			update_tickets_sold(self.ticket_type, -1)
 		self.send_cancellation_email()
 
 	def send_cancellation_email(self):
@@ -183,3 +328,265 @@ class EventTicket(Document):
 			delayed=False,
 			retry=2,
 		)
+
+
+def get_ticket_print_format(event: str) -> str:
+	return frappe.get_cached_value("Buzz Event", event, "ticket_print_format") or "Standard Ticket"
+
+
+def render_ticket_pdfs(tickets: list[EventTicket]) -> None:
+	"""Render and store the PDFs of the tickets.
+
+	Tickets with the same print format are rendered as one document per batch, which is a
+	single run of the PDF generator instead of one per ticket, and split into one PDF each.
+	"""
+	from frappe.utils.pdf import get_pdf
+
+	tickets_by_format = {}
+	for ticket in tickets:
+		if ticket.docstatus == 1:
+			# the print format shows the QR code
+			ticket.ensure_qr_code()
+			tickets_by_format.setdefault(get_ticket_print_format(ticket.event), []).append(ticket)
+
+	for print_format, format_tickets in tickets_by_format.items():
+		for batch in create_batch(format_tickets, TICKET_PDF_BATCH_SIZE):
+			html = [
+				frappe.get_print("Event Ticket", ticket.name, print_format, doc=ticket, no_letterhead=1)
+				for ticket in batch
+			]
+
+			pdfs = None
+			if len(batch) > 1:
+				combined_html = join_print_html(html)
+				if combined_html:
+					pdfs = split_pdf_pages(get_pdf(combined_html), len(batch))
+
+			# tickets that span several pages can't be told apart in the combined document
+			pdfs = pdfs or [get_pdf(ticket_html) for ticket_html in html]
+
+			for ticket, pdf in zip(batch, pdfs, strict=True):
+				ticket.store_ticket_pdf(pdf)
+
+
+def join_print_html(html: list[str]) -> str | None:
+	"""One HTML document with the bodies of the print views, each starting on a new page."""
+	bodies = [PRINT_BODY_PATTERN.search(page_html) for page_html in html]
+	if not all(bodies):
+		return None
+
+	first = bodies[0]
+	page_break = '<div style="page-break-before: always;"></div>'
+	return (
+		html[0][: first.start(1)]
+		+ page_break.join(body.group(1) for body in bodies)
+		+ html[0][first.end(1) :]
+	)
+
+
+def split_pdf_pages(pdf: bytes, count: int) -> list[bytes] | None:
+	"""One PDF per page, None unless the document has exactly `count` pages."""
+	from io import BytesIO
+
+	from pypdf import PdfReader, PdfWriter
+
+	reader = PdfReader(BytesIO(pdf))
+	if len(reader.pages) != count:
+		return None
+
+	pdfs = []
+	for page in reader.pages:
+		writer = PdfWriter()
+		writer.add_page(page)
+		output = BytesIO()
+		writer.write(output)
+		pdfs.append(output.getvalue())
+
+	return pdfs
+
+
+def get_ticket_email_context(event: str) -> frappe._dict | None:
+	"""What all ticket emails of an event share, None if the event doesn't send ticket emails.
+
+	Documents come from the document cache, which is cleared when they change, and template
+	sources are compiled once per request or job by `render_cached_template`.
+	"""
+	event_doc = frappe.get_cached_doc("Buzz Event", event)
+	if not event_doc.send_ticket_email:
+		return None
+
+	# Fallback to global setting if event-level not set
+	template_name = (
+		event_doc.ticket_email_template
+		or frappe.get_cached_doc("Buzz Settings").default_ticket_email_template
+	)
+
+	return frappe._dict(
+		event_doc=event_doc,
+		email_template=frappe.get_cached_doc("Email Template", template_name) if template_name else None,
+	)
+
+
+def send_ticket_emails(tickets: list[EventTicket], force: bool = False) -> list[str]:
+	"""Render and queue the emails of many tickets in one pass, returns the tickets that got one.
+
+	Tickets that already got their email are skipped unless `force` is set.
+	"""
+	email_contexts = {}
+	sent = []
+	for ticket in tickets:
+		if ticket.docstatus != 1 or (ticket.ticket_email_sent and not force):
+			continue
+
+		if ticket.event not in email_contexts:
+			email_contexts[ticket.event] = get_ticket_email_context(ticket.event)
+
+		if ticket.send_ticket_email(email_context=email_contexts[ticket.event]):
+			sent.append(ticket.name)
+
+	if sent:
+		EventTicket = frappe.qb.DocType("Event Ticket")
+		frappe.qb.update(EventTicket).set(EventTicket.ticket_email_sent, 1).where(
+			EventTicket.name.isin(sent)
+		).run()
+
+	return sent
+
+
+def enqueue_bulk_ticket_fulfillment(booking: str, tickets: list[str]):
+	frappe.enqueue(
+		fulfill_tickets,
+		queue="long",
+		job_id=f"buzz:fulfill_tickets:{booking}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		tickets=tickets,
+	)
+
+
+def fulfill_tickets(tickets: list[str]):
+	"""Fulfill the tickets of a large booking, PDFs and emails are rendered in batches.
+
+	Whatever is left (failed batches, Zoom registrations, statuses) is done per ticket by
+	`fulfill_ticket`, which skips the steps that already happened here.
+	"""
+	for batch in create_batch(tickets, TICKET_EMAIL_BATCH_SIZE):
+		try:
+			ticket_docs = [frappe.get_doc("Event Ticket", ticket) for ticket in batch]
+			for ticket_doc in ticket_docs:
+				if not ticket_doc.qr_code and not ticket_doc.defer_qr_code_until_viewed():
+					ticket_doc.ensure_qr_code()
+			render_ticket_pdfs(
+				[
+					ticket_doc
+					for ticket_doc in ticket_docs
+					if not ticket_doc.ticket_pdf
+					and not ticket_doc.ticket_email_sent
+					and ticket_doc.emails_ticket_pdf()
+				]
+			)
+			send_ticket_emails(ticket_docs)
+			frappe.db.commit()
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(title="Bulk ticket fulfillment failed")
+
+	for ticket in tickets:
+		fulfill_ticket(ticket)
+
+
+def send_event_ticket_emails(event: str):
+	"""Send the ticket email again to every attendee of the event."""
+	tickets = frappe.get_all("Event Ticket", filters={"event": event, "docstatus": 1}, pluck="name")
+	for batch in create_batch(tickets, TICKET_EMAIL_BATCH_SIZE):
+		send_ticket_emails([frappe.get_doc("Event Ticket", ticket) for ticket in batch], force=True)
+		frappe.db.commit()
+
+
+def enqueue_ticket_pdf(ticket: str):
+	frappe.enqueue(
+		store_ticket_pdf,
+		queue="short",
+		job_id=f"buzz:ticket_pdf:{ticket}",
+		deduplicate=True,
+		ticket=ticket,
+	)
+
+
+def store_ticket_pdf(ticket: str):
+	ticket_doc = frappe.get_doc("Event Ticket", ticket)
+	if ticket_doc.ticket_pdf and not ticket_doc.get_ticket_pdf_file():
+		# the file went missing, render it again
+		ticket_doc.clear_ticket_pdf()
+	ticket_doc.ensure_ticket_pdf()
+
+
+def enqueue_ticket_qr_code(ticket: str):
+	frappe.enqueue(
+		store_ticket_qr_code,
+		queue="short",
+		job_id=f"buzz:ticket_qr_code:{ticket}",
+		deduplicate=True,
+		ticket=ticket,
+	)
+
+
+def store_ticket_qr_code(ticket: str):
+	frappe.get_doc("Event Ticket", ticket).ensure_qr_code()
+
+
+def enqueue_ticket_fulfillment(ticket: str):
+	# the ticket name doubles as idempotency key, a ticket never has two fulfillment jobs in flight
+	frappe.enqueue(
+		fulfill_ticket,
+		queue="default",
+		job_id=f"buzz:fulfill_ticket:{ticket}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		ticket=ticket,
+	)
+
+
+def fulfill_ticket(ticket: str):
+	ticket_doc = frappe.get_doc("Event Ticket", ticket, for_update=True)
+	if ticket_doc.docstatus != 1 or ticket_doc.fulfillment_status == "Completed":
+		return
+
+	ticket_doc.db_set(
+		{"fulfillment_status": "In Progress", "fulfillment_attempts": ticket_doc.fulfillment_attempts + 1}
+	)
+	frappe.db.commit()
+
+	try:
+		ticket_doc.fulfill()
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(
+			title="Ticket fulfillment failed",
+			reference_doctype="Event Ticket",
+			reference_name=ticket,
+		)
+		ticket_doc.db_set("fulfillment_status", "Failed")
+		frappe.db.commit()
+		return
+
+	ticket_doc.db_set("fulfillment_status", "Completed")
+	frappe.db.commit()
+
+
+def retry_ticket_fulfillment():
+	"""Re-enqueue failed tickets and tickets whose fulfillment job never finished."""
+	tickets = frappe.get_all(
+		"Event Ticket",
+		filters={
+			"docstatus": 1,
+			"fulfillment_status": ("in", ["Pending", "In Progress", "Failed"]),
+			"fulfillment_attempts": ("<", MAX_FULFILLMENT_ATTEMPTS),
+			"modified": ("<", add_to_date(now_datetime(), minutes=-FULFILLMENT_RETRY_AFTER_MINUTES)),
+		},
+		pluck="name",
+		limit=FULFILLMENT_RETRY_BATCH_SIZE,
+	)
+
+	for ticket in tickets:
+		enqueue_ticket_fulfillment(ticket)
@@ -6,6 +6,13 @@ from unittest.mock import patch
 import frappe
 from frappe.tests import IntegrationTestCase
 
+from buzz.ticketing.doctype.event_ticket.event_ticket import (
+	fulfill_ticket,
+	render_ticket_pdfs,
+	send_ticket_emails,
+	store_ticket_pdf,
+	store_ticket_qr_code,
+)
 from buzz.utils import generate_qr_code_file, make_qr_image
 
 EXTRA_TEST_RECORD_DEPENDENCIES = []
@@ -174,3 +181,210 @@ class TestQRCodeGeneration(IntegrationTestCase):
 
 		# Cleanup
 		file_doc.delete()
+
+	def test_fast_render_modes(self):
+		self.assertTrue(make_qr_image("test-data-123", "Plain").startswith(b"\x89PNG"))
+		self.assertIn(b"<svg", make_qr_image("test-data-123", "SVG"))
+
+	def test_regenerating_identical_qr_code_reuses_file(self):
+		file_url = generate_qr_code_file(doc=self.test_event, data="same-data", file_prefix="test-qr")
+		files_before = frappe.db.count("File", {"attached_to_name": self.test_event.name})
+
+		self.assertEqual(
+			generate_qr_code_file(doc=self.test_event, data="same-data", file_prefix="test-qr"), file_url
+		)
+		self.assertEqual(frappe.db.count("File", {"attached_to_name": self.test_event.name}), files_before)
+
+		frappe.get_doc("File", {"file_url": file_url}).delete()
+
+
+class TestTicketFulfillment(IntegrationTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		cls.test_event.send_ticket_email = 1
+		cls.test_event.save()
+
+	def setUp(self):
+		self.test_ticket_type = frappe.get_doc(
+			{
+				"doctype": "Event Ticket Type",
+				"event": self.test_event.name,
+				"title": "Fulfillment Test Ticket",
+				"price": 100,
+			}
+		).insert()
+		self.test_ticket = frappe.get_doc(
+			{
+				"doctype": "Event Ticket",
+				"event": self.test_event.name,
+				"ticket_type": self.test_ticket_type.name,
+				"attendee_name": "Test Attendee",
+				"attendee_email": "test@example.com",
+			}
+		).insert()
+
+	def fulfill(self):
+		with patch.object(frappe.db, "commit"), patch.object(frappe.db, "rollback"):
+			fulfill_ticket(self.test_ticket.name)
+		self.test_ticket.reload()
+
+	def test_submit_defers_artifacts(self):
+		with patch("frappe.sendmail") as mock_sendmail:
+			self.test_ticket.submit()
+
+		mock_sendmail.assert_not_called()
+		self.assertEqual(self.test_ticket.fulfillment_status, "Pending")
+		self.assertFalse(self.test_ticket.qr_code)
+
+	@patch("frappe.sendmail")
+	def test_fulfillment_is_idempotent(self, mock_sendmail):
+		self.test_ticket.submit()
+
+		self.fulfill()
+		self.assertEqual(self.test_ticket.fulfillment_status, "Completed")
+		self.assertTrue(self.test_ticket.qr_code)
+		self.assertTrue(self.test_ticket.ticket_email_sent)
+
+		self.fulfill()
+		mock_sendmail.assert_called_once()
+		self.assertEqual(self.test_ticket.fulfillment_attempts, 1)
+
+	@patch("frappe.sendmail")
+	def test_lazy_qr_code_rendered_on_first_view(self, mock_sendmail):
+		self.test_event.send_ticket_email = 0
+		self.test_event.save()
+		settings = frappe.get_doc("Buzz Settings")
+		settings.render_ticket_qr_code_on_view = 1
+		settings.save()
+		try:
+			self.test_ticket.submit()
+			self.fulfill()
+			self.assertEqual(self.test_ticket.fulfillment_status, "Completed")
+			self.assertFalse(self.test_ticket.qr_code)
+
+			with patch("frappe.enqueue") as mock_enqueue:
+				qr_code = self.test_ticket.get_qr_code_for_view()
+
+			# served from the render cache, stored by a background job
+			self.assertTrue(qr_code.startswith("data:image/"))
+			self.assertEqual(mock_enqueue.call_args.kwargs["ticket"], self.test_ticket.name)
+			self.assertFalse(frappe.db.get_value("Event Ticket", self.test_ticket.name, "qr_code"))
+
+			store_ticket_qr_code(self.test_ticket.name)
+			self.assertTrue(frappe.db.get_value("Event Ticket", self.test_ticket.name, "qr_code"))
+		finally:
+			settings.render_ticket_qr_code_on_view = 0
+			settings.save()
+			self.test_event.send_ticket_email = 1
+			self.test_event.save()
+
+	def test_failed_fulfillment_is_recorded(self):
+		self.test_ticket.submit()
+
+		with patch("frappe.sendmail", side_effect=frappe.OutgoingEmailError):
+			self.fulfill()
+
+		self.assertEqual(self.test_ticket.fulfillment_status, "Failed")
+		self.assertEqual(self.test_ticket.fulfillment_attempts, 1)
+		self.assertFalse(self.test_ticket.ticket_email_sent)
+
+	@patch("frappe.sendmail")
+	def test_bulk_send_marks_emails_sent(self, mock_sendmail):
+		self.test_ticket.submit()
+		other_ticket = (
+			frappe.get_doc(
+				{
+					"doctype": "Event Ticket",
+					"event": self.test_event.name,
+					"ticket_type": self.test_ticket_type.name,
+					"attendee_name": "Other Attendee",
+					"attendee_email": "other@example.com",
+				}
+			)
+			.insert()
+			.submit()
+		)
+
+		sent = send_ticket_emails([self.test_ticket, other_ticket])
+
+		self.assertEqual(sorted(sent), sorted([self.test_ticket.name, other_ticket.name]))
+		self.assertEqual(mock_sendmail.call_count, 2)
+		self.assertTrue(frappe.db.get_value("Event Ticket", other_ticket.name, "ticket_email_sent"))
+
+		self.test_ticket.reload()
+		self.assertEqual(send_ticket_emails([self.test_ticket]), [])
+
+	def make_blank_pdf(self, pages):
+		from io import BytesIO
+
+		from pypdf import PdfWriter
+
+		writer = PdfWriter()
+		for _i in range(pages):
+			writer.add_blank_page(width=200, height=200)
+		output = BytesIO()
+		writer.write(output)
+		return output.getvalue()
+
+	def test_ticket_pdfs_rendered_in_one_pass(self):
+		self.test_ticket.submit()
+		other_ticket = (
+			frappe.get_doc(
+				{
+					"doctype": "Event Ticket",
+					"event": self.test_event.name,
+					"ticket_type": self.test_ticket_type.name,
+					"attendee_name": "PDF Attendee",
+					"attendee_email": "pdf@example.com",
+				}
+			)
+			.insert()
+			.submit()
+		)
+
+		with patch("frappe.utils.pdf.get_pdf", return_value=self.make_blank_pdf(2)) as mock_get_pdf:
+			render_ticket_pdfs([self.test_ticket, other_ticket])
+
+		mock_get_pdf.assert_called_once()
+		self.assertTrue(self.test_ticket.ticket_pdf)
+		self.assertTrue(other_ticket.ticket_pdf)
+		self.assertNotEqual(self.test_ticket.ticket_pdf, other_ticket.ticket_pdf)
+
+	def test_download_without_rendered_pdf_enqueues_it(self):
+		from buzz.api import download_ticket
+
+		self.test_ticket.submit()
+
+		with (
+			patch("frappe.enqueue") as mock_enqueue,
+			patch("buzz.ticketing.doctype.event_ticket.event_ticket.render_ticket_pdfs") as mock_render,
+		):
+			download_ticket(self.test_ticket.name)
+
+		# nothing is rendered or written in the request
+		mock_render.assert_not_called()
+		self.assertEqual(mock_enqueue.call_args.kwargs["ticket"], self.test_ticket.name)
+		self.assertEqual(frappe.local.response.http_status_code, 202)
+		self.assertFalse(frappe.db.get_value("Event Ticket", self.test_ticket.name, "ticket_pdf"))
+
+		with patch("frappe.utils.pdf.get_pdf", return_value=self.make_blank_pdf(1)):
+			store_ticket_pdf(self.test_ticket.name)
+		self.assertTrue(frappe.db.get_value("Event Ticket", self.test_ticket.name, "ticket_pdf"))
+
+	def test_transfer_clears_ticket_pdf(self):
+		self.test_ticket.submit()
+		self.test_ticket.store_ticket_pdf(self.make_blank_pdf(1))
+		self.assertTrue(self.test_ticket.ticket_pdf)
+
+		self.test_ticket.first_name = "New Attendee"
+		self.test_ticket.save()
+
+		self.test_ticket.reload()
+		self.assertFalse(self.test_ticket.ticket_pdf)
+		self.assertFalse(
+			frappe.db.exists(
+				"File", {"attached_to_name": self.test_ticket.name, "attached_to_field": "ticket_pdf"}
+			)
+		)
@@ -2,7 +2,9 @@
 # For license information, please see license.txt
 
 import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils import cint
 
 
 class EventTicketType(Document):
@@ -21,22 +23,196 @@ class EventTicketType(Document):
 		max_tickets_available: DF.Int
 		name: DF.Int | None
 		price: DF.Currency
+		tickets_reserved: DF.Int
+		tickets_sold: DF.Int
 		title: DF.Data
 	# end: auto-generated types
 
+	def validate(self):
+		self.load_inventory_counters()
+
+	def load_inventory_counters(self):
+		"""Counters are maintained by tickets and bookings, never trust the (possibly stale) value from the form."""
+		if self.is_new():
+			self.tickets_sold = 0
+			self.tickets_reserved = 0
+			return
+
+		# lock the row so that concurrent ticket submissions and reservations wait for this save
+		tickets_sold, tickets_reserved = frappe.db.get_value(
+			self.doctype, self.name, ["tickets_sold", "tickets_reserved"], for_update=True
+		)
+		self.tickets_sold = cint(tickets_sold)
+		self.tickets_reserved = cint(tickets_reserved)
+
 	def are_tickets_available(self, num_tickets: int) -> bool:
 		if self.remaining_tickets != -1 and self.remaining_tickets < num_tickets:
 			return False
 		return True
 
-	@property
-	def tickets_sold(self) -> int:
-		"""Returns the number of tickets sold for this ticket type."""
-		return frappe.db.count("Event Ticket", {"ticket_type": self.name, "docstatus": 1})
-
 	@property
 	def remaining_tickets(self) -> int:
 		"""Returns -1 if no limit, otherwise the number of remaining tickets."""
 		if not self.max_tickets_available:
 			return -1
-		return self.max_tickets_available - self.tickets_sold
+		return self.max_tickets_available - cint(self.tickets_sold) - cint(self.tickets_reserved)
+
+
+def reserve_tickets(tickets_by_type: dict) -> None:
+	"""Move tickets from available to reserved, throws if any ticket type cannot cover its request.
+
+	`tickets_by_type` maps ticket type name to the number of tickets requested. Rows are locked
+	with `SELECT ... FOR UPDATE` in name order, so concurrent bookings for the same ticket types
+	queue up behind each other instead of deadlocking or overselling.
+	"""
+	if not tickets_by_type:
+		return
+
+	TicketType = frappe.qb.DocType("Event Ticket Type")
+	rows = (
+		frappe.qb.from_(TicketType)
+		.select(
+			TicketType.name,
+			TicketType.title,
+			TicketType.max_tickets_available,
+			TicketType.tickets_sold,
+			TicketType.tickets_reserved,
+		)
+		.where(TicketType.name.isin(list(tickets_by_type)))
+		.orderby(TicketType.name)
+		.for_update()
+	).run(as_dict=True)
+
+	requested_by_type = {str(ticket_type): count for ticket_type, count in tickets_by_type.items()}
+	for row in rows:
+		if not row.max_tickets_available:
+			continue
+
+		requested = requested_by_type[str(row.name)]
+		available = row.max_tickets_available - cint(row.tickets_sold) - cint(row.tickets_reserved)
+		if available < requested:
+			frappe.throw(
+				_("Only {0} tickets available for {1}, you are trying to book {2}!").format(
+					max(available, 0), row.title, requested
+				)
+			)
+
+	for row in rows:
+		update_tickets_reserved(row.name, requested_by_type[str(row.name)])
+
+
+def release_tickets(tickets_by_type: dict) -> None:
+	"""Return previously reserved tickets to the available pool."""
+	for ticket_type, count in tickets_by_type.items():
+		update_tickets_reserved(ticket_type, -count)
+
+
+def update_tickets_reserved(ticket_type: str | int, delta: int):
+	frappe.db.sql(
+		"""
+		UPDATE `tabEvent Ticket Type`
+		SET tickets_reserved = GREATEST(tickets_reserved + %(delta)s, 0)
+		WHERE name = %(ticket_type)s
+		""",
+		{"delta": delta, "ticket_type": ticket_type},
+	)
+	frappe.clear_document_cache("Event Ticket Type", ticket_type)
+
+
+def update_tickets_sold(ticket_type: str | int, delta: int):
+	"""Atomically adjust the materialized sold counter of a ticket type by `delta`."""
+	TicketType = frappe.qb.DocType("Event Ticket Type")
+	(
+		frappe.qb.update(TicketType)
+		.set(TicketType.tickets_sold, TicketType.tickets_sold + delta)
+		.where(TicketType.name == ticket_type)
+	).run()
+	frappe.clear_document_cache("Event Ticket Type", ticket_type)
+
+
+def get_submitted_ticket_counts(ticket_type: str | int | None = None) -> dict[str, int]:
+	"""Count submitted tickets per ticket type, straight from the `Event Ticket` table."""
+	from frappe.query_builder.functions import Count
+
+	EventTicket = frappe.qb.DocType("Event Ticket")
+
+	query = (
+		frappe.qb.from_(EventTicket)
+		.select(EventTicket.ticket_type, Count(EventTicket.name))
+		.where(EventTicket.docstatus == 1)
+		.where(EventTicket.ticket_type.isnotnull())
+		.groupby(EventTicket.ticket_type)
+	)
+	if ticket_type:
+		query = query.where(EventTicket.ticket_type == ticket_type)
+
+	# ticket type names are autoincrement ints, the link column stores them as strings
+	return {str(row[0]): row[1] for row in query.run()}
+
+
+def reconcile_tickets_sold() -> list[str]:
+	"""Repair drift between materialized `tickets_sold` counters and the submitted tickets.
+
+	Returns the names of the ticket types whose counter had to be corrected.
+	"""
+	actual_counts = get_submitted_ticket_counts()
+	ticket_types = frappe.get_all("Event Ticket Type", fields=["name", "tickets_sold"])
+
+	repaired = []
+	for ticket_type in ticket_types:
+		if cint(ticket_type.tickets_sold) == actual_counts.get(str(ticket_type.name), 0):
+			continue
+
+		# recount under a row lock, tickets may have been submitted since the grouped count above
+		frappe.db.get_value("Event Ticket Type", ticket_type.name, "name", for_update=True)
+		actual = get_submitted_ticket_counts(ticket_type.name).get(str(ticket_type.name), 0)
+		frappe.db.set_value(
+			"Event Ticket Type", ticket_type.name, "tickets_sold", actual, update_modified=False
+		)
+		frappe.clear_document_cache("Event Ticket Type", ticket_type.name)
+		repaired.append(ticket_type.name)
+
+	return repaired
+
+
+def get_held_ticket_counts(ticket_type: str | int | None = None) -> dict[str, int]:
+	"""Count attendees of draft bookings that currently hold tickets, per ticket type."""
+	from frappe.query_builder.functions import Count
+
+	EventBooking = frappe.qb.DocType("Event Booking")
+	EventBookingAttendee = frappe.qb.DocType("Event Booking Attendee")
+
+	query = (
+		frappe.qb.from_(EventBookingAttendee)
+		.join(EventBooking)
+		.on(EventBooking.name == EventBookingAttendee.parent)
+		.select(EventBookingAttendee.ticket_type, Count(EventBookingAttendee.name))
+		.where(EventBooking.docstatus == 0)
+		.where(EventBooking.holds_tickets == 1)
+		.groupby(EventBookingAttendee.ticket_type)
+	)
+	if ticket_type:
+		query = query.where(EventBookingAttendee.ticket_type == ticket_type)
+
+	return {str(row[0]): row[1] for row in query.run()}
+
+
+def reconcile_tickets_reserved() -> list[str]:
+	"""Recompute `tickets_reserved` from the draft bookings that currently hold tickets."""
+	held_counts = get_held_ticket_counts()
+	ticket_types = frappe.get_all("Event Ticket Type", fields=["name", "tickets_reserved"])
+
+	repaired = []
+	for ticket_type in ticket_types:
+		if cint(ticket_type.tickets_reserved) == held_counts.get(str(ticket_type.name), 0):
+			continue
+
+		frappe.db.get_value("Event Ticket Type", ticket_type.name, "name", for_update=True)
+		actual = get_held_ticket_counts(ticket_type.name).get(str(ticket_type.name), 0)
+		frappe.db.set_value(
+			"Event Ticket Type", ticket_type.name, "tickets_reserved", actual, update_modified=False
+		)
+		frappe.clear_document_cache("Event Ticket Type", ticket_type.name)
+		repaired.append(ticket_type.name)
+
+	return repaired
@@ -1,9 +1,11 @@
 # Copyright (c) 2025, BWH Studios and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests import IntegrationTestCase
 
+from buzz.ticketing.doctype.event_ticket_type.event_ticket_type import reconcile_tickets_sold
+
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
 # Use these module variables to add/remove to/from that list
@@ -17,4 +19,60 @@ class IntegrationTestEventTicketType(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	def setUp(self):
+		self.test_event = frappe.get_doc("Buzz Event", {"route": "test-route"})
+		self.ticket_type = frappe.get_doc(
+			{
+				"doctype": "Event Ticket Type",
+				"event": self.test_event.name,
+				"title": "Counter Test",
+				"price": 0,
+				"max_tickets_available": 3,
+			}
+		).insert()
+
+	def make_ticket(self):
+		return (
+			frappe.get_doc(
+				{
+					"doctype": "Event Ticket",
+					"ticket_type": self.ticket_type.name,
+					"attendee_name": "John Doe",
+					"attendee_email": "john@email.com",
+				}
+			)
+			.insert()
+			.submit()
+		)
+
+	def test_tickets_sold_counter_follows_submit_and_cancel(self):
+		first = self.make_ticket()
+		self.make_ticket()
+
+		ticket_type = frappe.get_cached_doc("Event Ticket Type", self.ticket_type.name)
+		self.assertEqual(ticket_type.tickets_sold, 2)
+		self.assertEqual(ticket_type.remaining_tickets, 1)
+		self.assertFalse(ticket_type.are_tickets_available(2))
+
+		first.cancel()
+		ticket_type = frappe.get_cached_doc("Event Ticket Type", self.ticket_type.name)
+		self.assertEqual(ticket_type.tickets_sold, 1)
+		self.assertTrue(ticket_type.are_tickets_available(2))
+
+	def test_saving_ticket_type_does_not_overwrite_counter(self):
+		stale = frappe.get_doc("Event Ticket Type", self.ticket_type.name)
+		self.make_ticket()
+
+		stale.title = "Counter Test (renamed)"
+		stale.save()
+
+		self.assertEqual(frappe.db.get_value("Event Ticket Type", self.ticket_type.name, "tickets_sold"), 1)
+
+	def test_reconcile_repairs_drift(self):
+		self.make_ticket()
+		frappe.db.set_value("Event Ticket Type", self.ticket_type.name, "tickets_sold", 42)
+
+		repaired = reconcile_tickets_sold()
+
+		self.assertIn(self.ticket_type.name, repaired)
+		self.assertEqual(frappe.db.get_value("Event Ticket Type", self.ticket_type.name, "tickets_sold"), 1)
@@ -11,4 +11,100 @@ frappe.query_reports["Detailed Event Registrations"] = {
 			reqd: 1,
 		},
 	],
+
+	onload(report) {
+		report.page.add_inner_button(__("Load More"), () => {
+			const event = report.get_filter_value("event");
+			const rows = report.data || [];
+			if (!event || !rows.length) {
+				return;
+			}
+
+			frappe.call({
+				method: "buzz.ticketing.report.detailed_event_registrations.detailed_event_registrations.get_registrations_page",
+				args: { event, after: rows[rows.length - 1].ticket_id },
+				freeze: true,
+				callback: ({ message }) => {
+					if (!message.rows.length) {
+						frappe.show_alert(__("All registrations are loaded"));
+						return;
+					}
+
+					report.data = rows.concat(message.rows);
+					report.datatable.refresh(report.data);
+				},
+			});
+		});
+
+		report.page.add_inner_button(__("Export in Background"), () => export_in_background(report));
+
+		// the report only holds the pages loaded so far, the standard export would silently cut the rest
+		const export_loaded_rows = report.export_report.bind(report);
+		report.export_report = () => {
+			frappe.confirm(
+				__(
+					"Export only includes the {0} registrations loaded on screen. Export all registrations in the background instead?",
+					[(report.data || []).length],
+				),
+				() => export_in_background(report),
+				() => export_loaded_rows(),
+			);
+		};
+
+		frappe.realtime.off("detailed_event_registrations_export");
+		frappe.realtime.on("detailed_event_registrations_export", (data) => {
+			if (data.failed) {
+				frappe.hide_progress();
+				frappe.msgprint({
+					title: __("Export Failed"),
+					indicator: "red",
+					message: __("Registrations of {0} could not be exported, please try again.", [data.event]),
+				});
+				return;
+			}
+
+			if (!data.file_url) {
+				frappe.show_progress(__("Exporting Registrations"), data.progress, 100);
+				return;
+			}
+
+			frappe.hide_progress();
+			frappe.msgprint({
+				title: __("Export Ready"),
+				indicator: "green",
+				message: __("Registrations of {0} are ready: {1}", [
+					data.event,
+					`<a href="${data.file_url}" target="_blank">${__("Download")}</a>`,
+				]),
+			});
+		});
+	},
 };
+
+function export_in_background(report) {
+	const event = report.get_filter_value("event");
+	if (!event) {
+		frappe.throw(__("Please select an event"));
+	}
+
+	frappe.prompt(
+		{
+			fieldname: "file_format",
+			label: __("File Format"),
+			fieldtype: "Select",
+			options: ["CSV", "Excel"],
+			default: "CSV",
+		},
+		({ file_format }) => {
+			frappe.call({
+				method: "buzz.ticketing.report.detailed_event_registrations.detailed_event_registrations.export_registrations",
+				args: { event, file_format },
+				callback: () => {
+					frappe.show_alert(__("Export started, you will be notified when it is ready"));
+				},
+			});
+		},
+		__("Export Registrations"),
+		__("Export"),
+	);
+}
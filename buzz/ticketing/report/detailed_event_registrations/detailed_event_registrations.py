@@ -1,8 +1,17 @@
 # Copyright (c) 2025, BWH Studios and contributors
 # For license information, please see license.txt
 
+import os
+
 import frappe
 from frappe import _
+from frappe.utils import cint
+
+# tickets per query, keeps IN (...) lists of the child table lookups and memory bounded
+CHUNK_SIZE = 1000
+# rows shown in the report view, the rest are loaded page by page or exported in the background
+REPORT_PAGE_LENGTH = 500
+MAX_PAGE_LENGTH = 5000
 
 
 def execute(filters=None):
@@ -14,7 +23,14 @@ def execute(filters=None):
 
 	columns = get_columns(filters)
 	data = get_data(filters, columns)
-	return columns, data
+
+	if len(data) < REPORT_PAGE_LENGTH:
+		return columns, data
+
+	message = _(
+		"Showing the first {0} registrations. Use Load More or Export in Background for the rest."
+	).format(REPORT_PAGE_LENGTH)
+	return columns, data, message
 
 
 def get_columns(filters):
@@ -109,36 +125,209 @@ def get_columns(filters):
 
 
 def get_data(filters, columns):
+	"""First page of rows, the report view loads the next ones with `get_registrations_page`."""
 	event = filters.get("event")
+	tickets = get_ticket_chunk(event, limit=REPORT_PAGE_LENGTH)
+	return build_rows(tickets, get_row_context(event))
+
+
+@frappe.whitelist()
+def get_registrations_page(event: str, after: str | None = None, page_length: int = 500) -> dict:
+	"""One page of report rows, in registration order.
+
+	Pass the returned `next_cursor` as `after` to get the next page, it is None on the last one.
+	"""
+	frappe.only_for("Event Manager")
+
+	page_length = min(cint(page_length) or 500, MAX_PAGE_LENGTH)
+	tickets = get_ticket_chunk(event, after=after, limit=page_length)
+
+	return {
+		"columns": get_columns({"event": event}),
+		"rows": build_rows(tickets, get_row_context(event)),
+		"next_cursor": tickets[-1].name if len(tickets) == page_length else None,
+	}
+
+
+@frappe.whitelist()
+def export_registrations(event: str, file_format: str = "CSV") -> None:
+	"""Export every registration of the event to a private file in the background.
+
+	Progress and the final file URL are sent to the user as `detailed_event_registrations_export`.
+	"""
+	frappe.only_for("Event Manager")
 
-	# Get all submitted tickets for the event
-	tickets = frappe.get_all(
-		"Event Ticket",
-		filters={"event": event, "docstatus": 1},
-		fields=["name", "attendee_name", "attendee_email", "booking", "ticket_type", "creation"],
+	if file_format not in ("CSV", "Excel"):
+		frappe.throw(_("File format must be CSV or Excel"))
+
+	frappe.enqueue(
+		write_registrations_export,
+		queue="long",
+		job_id=f"buzz:export_registrations:{event}:{file_format}:{frappe.session.user}",
+		deduplicate=True,
+		event=event,
+		file_format=file_format,
+		user=frappe.session.user,
 	)
 
+
+def write_registrations_export(event: str, file_format: str, user: str) -> None:
+	"""Walk the tickets chunk by chunk and append the pivoted rows to the export file."""
+	file_name = f"registrations-{frappe.scrub(str(event))}-{frappe.generate_hash(length=8)}"
+	file_name += ".csv" if file_format == "CSV" else ".xlsx"
+	file_path = frappe.get_site_path("private", "files", file_name)
+
+	try:
+		write_registrations_file(event, file_format, file_path, user)
+		export_file = frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": file_name,
+				"file_url": f"/private/files/{file_name}",
+				"is_private": 1,
+				"attached_to_doctype": "Buzz Event",
+				"attached_to_name": event,
+			}
+		).insert(ignore_permissions=True)
+	except Exception:
+		frappe.db.rollback()
+		if os.path.exists(file_path):
+			os.remove(file_path)
+
+		frappe.log_error(
+			title="Registrations Export Failed",
+			reference_doctype="Buzz Event",
+			reference_name=event,
+		)
+		publish_export_progress(user, event, progress=100, failed=True)
+		return
+
+	publish_export_progress(user, event, progress=100, file_url=export_file.file_url)
+
+
+def write_registrations_file(event: str, file_format: str, file_path: str, user: str) -> None:
+	columns = get_columns({"event": event})
+	context = get_row_context(event)
+	total = frappe.db.count("Event Ticket", {"event": event, "docstatus": 1})
+
+	writer = RegistrationsExportWriter(file_path, file_format)
+	try:
+		writer.write([column["label"] for column in columns])
+
+		done = 0
+		for tickets in iter_ticket_chunks(event):
+			for row in build_rows(tickets, context):
+				writer.write([row.get(column["fieldname"]) for column in columns])
+
+			done += len(tickets)
+			publish_export_progress(user, event, progress=done * 100 // max(total, 1))
+	finally:
+		writer.close()
+
+
+def publish_export_progress(
+	user: str, event: str, progress: int, file_url: str | None = None, failed: bool = False
+) -> None:
+	frappe.publish_realtime(
+		"detailed_event_registrations_export",
+		{"event": event, "progress": progress, "file_url": file_url, "failed": failed},
+		user=user,
+	)
+
+
+class RegistrationsExportWriter:
+	"""Row by row writer for CSV and (write-only, constant memory) XLSX files."""
+
+	def __init__(self, file_path: str, file_format: str):
+		self.file_format = file_format
+		if file_format == "CSV":
+			import csv
+
+			self.file = open(file_path, "w", newline="", encoding="utf-8")
+			self.csv_writer = csv.writer(self.file)
+		else:
+			from openpyxl import Workbook
+
+			self.file_path = file_path
+			self.workbook = Workbook(write_only=True)
+			self.sheet = self.workbook.create_sheet("Registrations")
+
+	def write(self, row: list) -> None:
+		row = ["" if value is None else value for value in row]
+		if self.file_format == "CSV":
+			self.csv_writer.writerow(row)
+		else:
+			self.sheet.append(row)
+
+	def close(self) -> None:
+		if self.file_format == "CSV":
+			self.file.close()
+		else:
+			self.workbook.save(self.file_path)
+
+
+def get_row_context(event) -> frappe._dict:
+	"""Per event lookups shared by every chunk of tickets."""
+	return frappe._dict(
+		ticket_type_map=get_ticket_type_map(event),
+		custom_field_names=[cf.fieldname for cf in get_custom_fields_for_event(event)],
+		add_on_names=[addon.name for addon in get_add_ons_for_event(event)],
+		utm_params=get_utm_params_for_event(event),
+	)
+
+
+def get_ticket_chunk(event, after: str | None = None, limit: int = CHUNK_SIZE) -> list:
+	"""Submitted tickets in registration order, `after` is the name of the last ticket of the previous chunk.
+
+	Ticket names are hashes, so the keyset is (creation, name) with the name as tie breaker.
+	"""
+	EventTicket = frappe.qb.DocType("Event Ticket")
+	query = (
+		frappe.qb.from_(EventTicket)
+		.select(
+			EventTicket.name,
+			EventTicket.attendee_name,
+			EventTicket.attendee_email,
+			EventTicket.booking,
+			EventTicket.ticket_type,
+			EventTicket.creation,
+		)
+		.where(EventTicket.event == event)
+		.where(EventTicket.docstatus == 1)
+		.orderby(EventTicket.creation)
+		.orderby(EventTicket.name)
+		.limit(limit)
+	)
+	if after:
+		after_creation = frappe.db.get_value("Event Ticket", after, "creation")
+		query = query.where(
+			(EventTicket.creation > after_creation)
+			| ((EventTicket.creation == after_creation) & (EventTicket.name > after))
+		)
+
+	return query.run(as_dict=True)
+
+
+def iter_ticket_chunks(event, chunk_size: int = CHUNK_SIZE):
+	"""Submitted tickets of the event in chunks, using keyset pagination on (creation, name)."""
+	after = None
+	while True:
+		tickets = get_ticket_chunk(event, after=after, limit=chunk_size)
+		if tickets:
+			yield tickets
+		if len(tickets) < chunk_size:
+			break
+		after = tickets[-1].name
+
+
+def build_rows(tickets, context) -> list[dict]:
 	if not tickets:
 		return []
 
-	# Get ticket type titles
-	ticket_type_map = get_ticket_type_map(event)
-
 	# Get booking details
 	booking_ids = list(set([t.booking for t in tickets if t.booking]))
 	booking_map = get_booking_map(booking_ids)
 
-	# Get custom fields configuration
-	custom_fields = get_custom_fields_for_event(event)
-	custom_field_names = [cf.fieldname for cf in custom_fields]
-
-	# Get add-ons configuration
-	add_ons = get_add_ons_for_event(event)
-	add_on_names = [addon.name for addon in add_ons]
-
-	# Get UTM params
-	utm_params = get_utm_params_for_event(event)
-
 	# Get ticket additional fields
 	ticket_ids = [t.name for t in tickets]
 	ticket_additional_fields = get_ticket_additional_fields(ticket_ids)
@@ -160,24 +349,24 @@ def get_data(filters, columns):
 			"attendee_name": ticket.attendee_name,
 			"attendee_email": ticket.attendee_email,
 			"booking_id": ticket.booking,
-			"ticket_type": ticket_type_map.get(str(ticket.ticket_type), ticket.ticket_type),
+			"ticket_type": context.ticket_type_map.get(str(ticket.ticket_type), ticket.ticket_type),
 			"booking_user": booking_map.get(ticket.booking, {}).get("user", ""),
 			"booked_at": ticket.creation,
 		}
 
 		# Add custom field values (ticket takes priority over booking)
-		for cf_name in custom_field_names:
+		for cf_name in context.custom_field_names:
 			ticket_cf_value = ticket_additional_fields.get(ticket.name, {}).get(cf_name)
 			booking_cf_value = booking_additional_fields.get(ticket.booking, {}).get(cf_name)
 			row[f"cf_{cf_name}"] = ticket_cf_value or booking_cf_value or ""
 
 		# Add add-on values
-		for addon_name in add_on_names:
+		for addon_name in context.add_on_names:
 			addon_value = ticket_add_ons.get(ticket.name, {}).get(addon_name)
 			row[f"addon_{addon_name}"] = addon_value or ""
 
 		# Add UTM parameter values
-		for utm in utm_params:
+		for utm in context.utm_params:
 			utm_value = booking_utm_params.get(ticket.booking, {}).get(utm)
 			row[f"utm_{utm}"] = utm_value or ""
 
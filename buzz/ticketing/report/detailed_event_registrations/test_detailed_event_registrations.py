@@ -1,6 +1,9 @@
 # Copyright (c) 2025, BWH Studios and Contributors
 # See license.txt
 
+import os
+from unittest.mock import patch
+
 import frappe
 from frappe.tests import IntegrationTestCase
 
@@ -13,10 +16,13 @@ from buzz.ticketing.report.detailed_event_registrations.detailed_event_registrat
 	get_columns,
 	get_custom_fields_for_event,
 	get_data,
+	get_registrations_page,
 	get_ticket_add_ons,
 	get_ticket_additional_fields,
 	get_ticket_type_map,
 	get_utm_params_for_event,
+	iter_ticket_chunks,
+	write_registrations_export,
 )
 
 
@@ -826,3 +832,101 @@ class TestDetailedEventRegistrationsReport(IntegrationTestCase):
 		# Clean up
 		custom_field.delete()
 		add_on.delete()
+
+	def test_ticket_chunks_cover_all_tickets_once(self):
+		"""Test that keyset pagination walks every submitted ticket exactly once."""
+		self._create_booking_with_tickets(
+			attendees_data=[
+				{
+					"first_name": f"Chunk {i}",
+					"email": f"chunk{i}@test.com",
+					"ticket_type": self.test_ticket_type.name,
+				}
+				for i in range(5)
+			]
+		)
+
+		expected = frappe.get_all(
+			"Event Ticket", filters={"event": self.test_event.name, "docstatus": 1}, pluck="name"
+		)
+		chunks = list(iter_ticket_chunks(self.test_event.name, chunk_size=2))
+		names = [ticket.name for chunk in chunks for ticket in chunk]
+
+		self.assertTrue(all(len(chunk) <= 2 for chunk in chunks))
+		self.assertEqual(sorted(names), sorted(expected))
+		self.assertEqual(len(names), len(set(names)))
+
+	def test_get_registrations_page_returns_cursor(self):
+		"""Test that pages can be fetched one after another with the returned cursor."""
+		self._create_booking_with_tickets(
+			attendees_data=[
+				{
+					"first_name": f"Page {i}",
+					"email": f"page{i}@test.com",
+					"ticket_type": self.test_ticket_type.name,
+				}
+				for i in range(3)
+			]
+		)
+
+		rows, cursor = [], None
+		while True:
+			page = get_registrations_page(self.test_event.name, after=cursor, page_length=2)
+			rows.extend(page["rows"])
+			cursor = page["next_cursor"]
+			if not cursor:
+				break
+
+		columns = get_columns({"event": self.test_event.name})
+		all_rows = get_data({"event": self.test_event.name}, columns)
+		self.assertEqual([row["ticket_id"] for row in rows], [row["ticket_id"] for row in all_rows])
+
+	def test_export_writes_private_csv_file(self):
+		"""Test that the background export attaches a private CSV with a row per ticket."""
+		self._create_booking_with_tickets(
+			attendees_data=[
+				{
+					"first_name": "Export User",
+					"email": "export@test.com",
+					"ticket_type": self.test_ticket_type.name,
+				}
+			]
+		)
+
+		write_registrations_export(self.test_event.name, "CSV", "Administrator")
+
+		export_file = frappe.get_last_doc(
+			"File", filters={"attached_to_doctype": "Buzz Event", "attached_to_name": self.test_event.name}
+		)
+		self.assertTrue(export_file.is_private)
+
+		with open(export_file.get_full_path(), encoding="utf-8") as f:
+			content = f.read()
+
+		ticket_count = frappe.db.count("Event Ticket", {"event": self.test_event.name, "docstatus": 1})
+		self.assertEqual(len(content.splitlines()), ticket_count + 1)
+		self.assertIn("Export User", content)
+
+	def test_failed_export_removes_partial_file(self):
+		"""Test that a failing export leaves no file behind and tells the user."""
+		self._create_booking_with_tickets(
+			attendees_data=[
+				{
+					"first_name": "Failed Export",
+					"email": "failed-export@test.com",
+					"ticket_type": self.test_ticket_type.name,
+				}
+			]
+		)
+		files_before = set(os.listdir(frappe.get_site_path("private", "files")))
+
+		module = "buzz.ticketing.report.detailed_event_registrations.detailed_event_registrations"
+		with (
+			patch(f"{module}.build_rows", side_effect=Exception("boom")),
+			patch(f"{module}.publish_export_progress") as publish,
+			patch("frappe.log_error"),
+		):
+			write_registrations_export(self.test_event.name, "CSV", "Administrator")
+
+		self.assertEqual(set(os.listdir(frappe.get_site_path("private", "files"))), files_before)
+		self.assertTrue(publish.call_args.kwargs["failed"])
@@ -4,6 +4,17 @@ from collections.abc import Callable
 import frappe
 from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 
+QR_IMAGE_CACHE_TTL = 7 * 24 * 60 * 60
+# also bounds how long a changed outgoing email account takes to show up as organizer
+ICS_CACHE_TTL = 24 * 60 * 60
+ICS_CALENDAR_HEADER = (
+	"BEGIN:VCALENDAR",
+	"VERSION:2.0",
+	"PRODID:-//Buzz Events//EN",
+	"CALSCALE:GREGORIAN",
+	"METHOD:PUBLISH",
+)
+
 
 def is_app_installed(app_name: str) -> bool:
 	"""Check if a specified app is installed."""
@@ -85,45 +96,110 @@ def delete_custom_fields(custom_fields):
 			frappe.clear_cache(doctype=doctype)
 
 
-def make_qr_image(data: str) -> bytes:
+def make_qr_image(data: str, style: str = "Styled") -> bytes:
 	"""
 	Generate QR code image bytes from data string.
 
 	:param data: The data to encode in the QR code
-	:return: PNG image as bytes
+	:param style: "Styled" (rounded bars, high error correction), "Plain" (PNG) or "SVG"
+	:return: PNG image (SVG document for the "SVG" style) as bytes
 	"""
 	import io
 
 	import qrcode
-	from qrcode.image.styledpil import StyledPilImage
-	from qrcode.image.styles.moduledrawers.pil import HorizontalBarsDrawer
-
-	qr = qrcode.QRCode(
-		version=1,
-		error_correction=qrcode.constants.ERROR_CORRECT_H,
-		box_size=10,
-		border=4,
-	)
+
+	if style == "Styled":
+		from qrcode.image.styledpil import StyledPilImage
+		from qrcode.image.styles.moduledrawers.pil import HorizontalBarsDrawer
+
+		# the bar drawer eats into the modules, high error correction keeps the code scannable
+		qr = qrcode.QRCode(
+			version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=4
+		)
+		image_kwargs = {"image_factory": StyledPilImage, "module_drawer": HorizontalBarsDrawer()}
+	else:
+		qr = qrcode.QRCode(
+			version=1, error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=10, border=4
+		)
+		image_kwargs = {}
+		if style == "SVG":
+			from qrcode.image.svg import SvgPathImage
+
+			image_kwargs["image_factory"] = SvgPathImage
+
 	qr.add_data(data)
 	qr.make(fit=True)
 
-	img = qr.make_image(image_factory=StyledPilImage, module_drawer=HorizontalBarsDrawer())
+	img = qr.make_image(**image_kwargs)
 	output = io.BytesIO()
-	img.save(output, format="PNG")
+	if style == "SVG":
+		img.save(output)
+	else:
+		img.save(output, format="PNG")
 	return output.getvalue()
 
 
-def generate_qr_code_file(doc, data: str, field_name: str = "qr_code", file_prefix: str = "qr-code") -> str:
+def get_qr_code_style() -> str:
+	return frappe.get_cached_doc("Buzz Settings").qr_code_style or "Styled"
+
+
+def get_qr_image(data: str, style: str | None = None) -> bytes:
+	"""Like `make_qr_image`, but identical data is only rendered once per style."""
+	import hashlib
+
+	style = style or get_qr_code_style()
+	cache_key = f"buzz:qr_image:{style}:{hashlib.sha256(data.encode()).hexdigest()}"
+
+	image = frappe.cache.get_value(cache_key)
+	if image is None:
+		image = make_qr_image(data, style)
+		frappe.cache.set_value(cache_key, image, expires_in_sec=QR_IMAGE_CACHE_TTL)
+	return image
+
+
+def get_qr_data_uri(data: str, style: str | None = None) -> str:
+	"""QR code as a `data:` URI, for showing a code that is not stored as a file (yet)."""
+	import base64
+
+	style = style or get_qr_code_style()
+	mime_type = "image/svg+xml" if style == "SVG" else "image/png"
+	return f"data:{mime_type};base64,{base64.b64encode(get_qr_image(data, style)).decode()}"
+
+
+def generate_qr_code_file(
+	doc, data: str, field_name: str = "qr_code", file_prefix: str = "qr-code", style: str | None = None
+) -> str:
 	"""
 	Generate QR code image and attach as File to a document.
 
+	If the document already has an identical QR code attached, its URL is returned instead.
+
 	:param doc: The Frappe document to attach the QR code to
 	:param data: The data to encode in the QR code
 	:param field_name: The field name to attach the file to (default: "qr_code")
 	:param file_prefix: Prefix for the file name (default: "qr-code")
+	:param style: Render style, defaults to the one set in Buzz Settings
 	:return: The file URL of the created QR code image
 	"""
-	qr_data = make_qr_image(data)
+	from frappe.utils.file_manager import get_content_hash
+
+	style = style or get_qr_code_style()
+	qr_data = get_qr_image(data, style)
+
+	existing_file_url = frappe.db.get_value(
+		"File",
+		{
+			"attached_to_doctype": doc.doctype,
+			"attached_to_name": doc.name,
+			"attached_to_field": field_name,
+			"content_hash": get_content_hash(qr_data),
+		},
+		"file_url",
+	)
+	if existing_file_url:
+		return existing_file_url
+
+	extension = "svg" if style == "SVG" else "png"
 	qr_code_file = frappe.get_doc(
 		{
 			"doctype": "File",
@@ -131,12 +207,57 @@ def generate_qr_code_file(doc, data: str, field_name: str = "qr_code", file_pref
 			"attached_to_doctype": doc.doctype,
 			"attached_to_name": doc.name,
 			"attached_to_field": field_name,
-			"file_name": f"{file_prefix}-{doc.name}.png",
+			"file_name": f"{file_prefix}-{doc.name}.{extension}",
 		}
 	).save(ignore_permissions=True)
 	return qr_code_file.file_url
 
 
+def benchmark_qr_render_modes(iterations: int = 200) -> dict[str, float]:
+	"""
+	Average render time (ms) per QR code for every style, e.g. for picking a style for a large event.
+
+	`bench --site <site> execute buzz.utils.benchmark_qr_render_modes --kwargs "{'iterations': 500}"`
+	"""
+	from timeit import timeit
+
+	from frappe.utils import random_string
+
+	# typical ticket payload, a 10 character hash name
+	payloads = [random_string(10) for _ in range(iterations)]
+	results = {}
+	for style in ("Styled", "Plain", "SVG"):
+		payload = iter(payloads)
+		seconds = timeit(
+			lambda style=style, payload=payload: make_qr_image(next(payload), style), number=iterations
+		)
+		results[style] = round(seconds * 1000 / iterations, 3)
+
+	return results
+
+
+def render_cached_template(source: str, context: dict) -> str:
+	"""`frappe.render_template` for template strings, compiling each distinct source once per request or job.
+
+	Compiled templates are kept on `frappe.local` with the jinja environment they were compiled by,
+	and the source is their key, so editing a template never serves a stale compiled one.
+	"""
+	if not source:
+		return ""
+
+	if ".__" in source:
+		frappe.throw(frappe._("Illegal template"))
+
+	if not hasattr(frappe.local, "buzz_compiled_templates"):
+		frappe.local.buzz_compiled_templates = {}
+
+	compiled_templates = frappe.local.buzz_compiled_templates
+	if source not in compiled_templates:
+		compiled_templates[source] = frappe.get_jenv().from_string(source)
+
+	return compiled_templates[source].render(context)
+
+
 def build_event_datetimes(event_doc):
 	from datetime import datetime, timedelta
 
@@ -159,12 +280,45 @@ def build_event_datetimes(event_doc):
 
 
 def generate_ics_file(event_doc, attendee_email: str):
+	"""Calendar invite of the event for one attendee."""
 	from uuid import uuid4
 
+	return build_ics_calendar([build_ics_event(event_doc, uid=uuid4(), attendee_email=attendee_email)])
+
+
+def build_ics_calendar(events: list[str]) -> str:
+	return "\n".join([*ICS_CALENDAR_HEADER, *events, "END:VCALENDAR"])
+
+
+def build_ics_event(event_doc, uid, attendee_email: str | None = None) -> str:
+	"""One VEVENT, only the UID, timestamp and attendee are added to the cached event lines."""
 	from frappe.utils import now_datetime
 
+	lines = [
+		"BEGIN:VEVENT",
+		f"UID:{uid}@buzz",
+		f"DTSTAMP:{now_datetime().strftime('%Y%m%dT%H%M%S')}",
+		get_ics_event_lines(event_doc),
+	]
+	if attendee_email:
+		lines.append(f"ATTENDEE;CN=Attendee;RSVP=TRUE:mailto:{attendee_email}")
+	lines.append("END:VEVENT")
+
+	return "\n".join(lines)
+
+
+def get_ics_event_lines(event_doc) -> str:
+	"""The lines of a VEVENT that are the same for every attendee, cached per event."""
+	key = get_ics_cache_key(event_doc.name)
+	lines = frappe.cache.get_value(key)
+	if lines is None:
+		lines = render_ics_event_lines(event_doc)
+		frappe.cache.set_value(key, lines, expires_in_sec=ICS_CACHE_TTL)
+	return lines
+
+
+def render_ics_event_lines(event_doc) -> str:
 	start_dt, end_dt = build_event_datetimes(event_doc)
-	organizer_name = event_doc.host or event_doc.title
 	organizer_email = frappe.db.get_value(
 		"Email Account", {"default_outgoing": 1, "enable_outgoing": 1}, "email_id"
 	)
@@ -174,17 +328,25 @@ def generate_ics_file(event_doc, attendee_email: str):
 		venue_address = frappe.db.get_value("Event Venue", event_doc.venue, "address") or ""
 
 	context = {
-		"uid": uuid4(),
-		"now": now_datetime().strftime("%Y%m%dT%H%M%S"),
 		"timezone": event_doc.time_zone,
 		"start": start_dt.strftime("%Y%m%dT%H%M%S"),
 		"end": end_dt.strftime("%Y%m%dT%H%M%S"),
 		"title": event_doc.title,
-		"location": venue_address,
-		"attendee_email": attendee_email,
+		# ICS content lines can't span lines
+		"location": " ".join(venue_address.split()),
 		"description": f"Your ticket for {event_doc.title}",
-		"organizer_name": organizer_name,
+		"organizer_name": event_doc.host or event_doc.title,
 		"organizer_email": organizer_email,
 	}
 
-	return frappe.render_template("templates/ics/ics.jinja2", context, is_path=True)
+	return frappe.render_template("templates/ics/event.jinja2", context, is_path=True).strip()
+
+
+def get_ics_cache_key(event: str) -> str:
+	return f"buzz:ics_event:{event}"
+
+
+def clear_ics_cache(events) -> None:
+	for event in events:
+		if event:
+			frappe.cache.delete_value(get_ics_cache_key(event))
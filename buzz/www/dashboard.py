@@ -4,6 +4,8 @@
 import frappe
 from frappe.utils import get_system_timezone
 
+from buzz.api import get_translation_hash, get_translation_language
+
 no_cache = 1
 
 
@@ -24,11 +26,15 @@ def get_context_for_dev():
 
 
 def get_boot():
+	translations_lang = get_translation_language()
 	return frappe._dict(
 		{
 			"frappe_version": frappe.__version__,
 			"site_name": frappe.local.site,
 			"read_only_mode": frappe.flags.read_only,
 			"system_timezone": get_system_timezone(),
+			# the hash changes with the translations, so the bundle URL can be cached by the browser
+			"translations_lang": translations_lang,
+			"translations_hash": get_translation_hash(translations_lang),
 		}
 	)
@@ -0,0 +1,52 @@
+import { useSocket } from "@/socket"
+import { createResource } from "frappe-ui"
+import { type Ref, onBeforeUnmount, ref } from "vue"
+
+interface TicketTypeCheckinCount {
+	ticket_type: string
+	title: string
+	count: number
+}
+
+export interface CheckinCounts {
+	event: string
+	date: string
+	total: number
+	version: number
+	by_ticket_type: TicketTypeCheckinCount[]
+}
+
+/**
+ * Check-in totals of an event for today, kept up to date by `checkin_counts_updated` realtime messages.
+ */
+export function useLiveCheckinCounts(eventId: string): Ref<CheckinCounts | null> {
+	const counts = ref<CheckinCounts | null>(null)
+	const socket = useSocket()
+
+	createResource({
+		url: "buzz.api.checkin.get_live_checkin_counts",
+		params: { event: eventId },
+		auto: true,
+		onSuccess: (data: CheckinCounts) => {
+			counts.value = data
+		},
+	})
+
+	const onUpdate = (data: CheckinCounts) => {
+		// messages can overtake each other, never go back to an older version
+		if (data.event !== eventId) return
+		if (!counts.value || data.date !== counts.value.date || data.version >= counts.value.version) {
+			counts.value = data
+		}
+	}
+
+	socket?.emit("doc_subscribe", "Buzz Event", eventId)
+	socket?.on("checkin_counts_updated", onUpdate)
+
+	onBeforeUnmount(() => {
+		socket?.off("checkin_counts_updated", onUpdate)
+		socket?.emit("doc_unsubscribe", "Buzz Event", eventId)
+	})
+
+	return counts
+}
@@ -1,5 +1,3 @@
-import { createResource } from "frappe-ui";
-
 export default function translationPlugin(app) {
 	app.config.globalProperties.__ = translate;
 	window.__ = translate;
@@ -35,12 +33,16 @@ function translate(message, replace, context = null) {
 	return format(translatedMessage, replace);
 }
 
-function fetchTranslations(lang) {
-	createResource({
-		url: "buzz.api.get_translations",
-		auto: true,
-		transform: (data) => {
+function fetchTranslations() {
+	// language and content hash come from the boot, the hashed URL is cached by the browser
+	const lang = window.translations_lang;
+	const hash = window.translations_hash;
+	if (!lang) return;
+
+	const params = new URLSearchParams({ lang, v: hash || "" });
+	fetch(`/api/method/buzz.api.translations?${params}`)
+		.then((response) => (response.ok ? response.json() : {}))
+		.then((data) => {
 			window.translatedMessages = data;
-		},
-	});
+		});
 }